@@ -123,3 +123,109 @@ else:
         STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
     except Exception:
         STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+# Lexical scoring engine used by /api/query/ and /api/search_graph/ when no
+# `scorer=` parameter is given: 'legacy' (overlap score), 'bm25' or 'tfidf'.
+LEXICAL_SCORER = os.environ.get('LEXICAL_SCORER', 'legacy')
+
+# Query result cache for /api/query/ and /api/search_graph/. Defaults to an
+# in-process locmem cache; point QUERY_CACHE_BACKEND/QUERY_CACHE_LOCATION at a
+# file or database cache to share results between workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'query_results': {
+        'BACKEND': os.environ.get('QUERY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('QUERY_CACHE_LOCATION', 'query-results'),
+        'TIMEOUT': None,
+        # eviction is done by query_cache's own LRU; keep the backend's cull out of the way
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', 512)) * 2 + 16},
+    },
+}
+QUERY_CACHE_ALIAS = 'query_results'
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', 512))
+QUERY_CACHE_MAX_BYTES = int(os.environ.get('QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+QUERY_CACHE_TIMEOUT = int(os.environ.get('QUERY_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Semantic index bundles (see ontologies/index_bundle.py). Versions older than
+# the newest FAISS_BUNDLE_KEEP are pruned; FAISS_VERIFY_BUNDLE re-checks the
+# SHA-256 of every file on load at the cost of reading it all.
+FAISS_INDEX_DIR = os.environ.get('FAISS_INDEX_DIR', str(BASE_DIR / 'faiss_index'))
+FAISS_MODEL_NAME = os.environ.get('FAISS_MODEL_NAME', 'all-MiniLM-L6-v2')
+FAISS_BUNDLE_KEEP = int(os.environ.get('FAISS_BUNDLE_KEEP', 2))
+FAISS_VERIFY_BUNDLE = os.environ.get('FAISS_VERIFY_BUNDLE', '0').lower() in ('1', 'true', 'yes')
+# Nearest entities/relations used as traversal seeds by search_graph and /api/query/.
+ENTITY_SEED_K = int(os.environ.get('ENTITY_SEED_K', 20))
+# Embedding cache for index builds (see ontologies/embedding_cache.py); set
+# EMBEDDING_CACHE_MAX_ENTRIES=0 to disable it.
+EMBEDDING_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR', str(Path(FAISS_INDEX_DIR) / 'embedding_cache'))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', 200000))
+EMBEDDING_CACHE_MAX_BYTES = int(os.environ.get('EMBEDDING_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+# Index build pipeline: rows read per DB round trip, chunk length for long
+# texts (chunk embeddings are mean-pooled), chunks per encode call and the cap
+# on buffered text. Peak build memory is roughly the model plus one encode
+# batch plus the buffer, independent of corpus size (the index itself aside).
+FAISS_BUILD_CHUNK_SIZE = int(os.environ.get('FAISS_BUILD_CHUNK_SIZE', 200))
+FAISS_CHUNK_CHARS = int(os.environ.get('FAISS_CHUNK_CHARS', 2000))
+FAISS_ENCODE_BATCH_SIZE = int(os.environ.get('FAISS_ENCODE_BATCH_SIZE', 64))
+FAISS_BUILD_BUFFER_MB = int(os.environ.get('FAISS_BUILD_BUFFER_MB', 64))
+# FAISS index type (see ontologies/ann.py): 'flat', 'ivf', 'hnsw', 'ivfpq' or a
+# raw factory string. Changing it rebuilds the indexes on their next update.
+FAISS_INDEX_FACTORY = os.environ.get('FAISS_INDEX_FACTORY', 'flat')
+FAISS_TRAIN_SAMPLE = int(os.environ.get('FAISS_TRAIN_SAMPLE', 20000))
+FAISS_HNSW_M = int(os.environ.get('FAISS_HNSW_M', 32))
+FAISS_NPROBE = int(os.environ.get('FAISS_NPROBE', 16))
+FAISS_EF_SEARCH = int(os.environ.get('FAISS_EF_SEARCH', 64))
+# Index worker (`manage.py index_worker`, see ontologies/index_jobs.py): jobs
+# applied per batch, idle poll interval, and how long a claim is honoured
+# before another worker may take the job over.
+INDEX_WORKER_BATCH_SIZE = int(os.environ.get('INDEX_WORKER_BATCH_SIZE', 100))
+INDEX_WORKER_POLL_SECONDS = float(os.environ.get('INDEX_WORKER_POLL_SECONDS', 2.0))
+INDEX_JOB_LEASE_SECONDS = int(os.environ.get('INDEX_JOB_LEASE_SECONDS', 600))
+# Upload pipeline (see ontologies/uploads.py): generator base URL, pool size
+# and queue bound per web process, spool directory for files in flight, and
+# how long a running job may go without progress before it is reported as
+# interrupted (0 derives it from the GENERATOR_* timeouts and retries).
+HF_ONTOLOGY_GENERATOR_URL = os.environ.get('HF_ONTOLOGY_GENERATOR_URL', 'https://huggingface.co/spaces/VivanRajath/Ontology-Generator')
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 2))
+UPLOAD_MAX_PENDING = int(os.environ.get('UPLOAD_MAX_PENDING', 32))
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR', '')
+UPLOAD_JOB_TIMEOUT = int(os.environ.get('UPLOAD_JOB_TIMEOUT', 0))
+# Ontology-Generator client (see ontologies/generator_client.py): read and
+# connect timeouts, retries with exponential backoff for connection errors and
+# 502/503/504 answers, and kept-alive connections per host.
+GENERATOR_TIMEOUT = float(os.environ.get('GENERATOR_TIMEOUT', 30))
+GENERATOR_CONNECT_TIMEOUT = float(os.environ.get('GENERATOR_CONNECT_TIMEOUT', 5))
+GENERATOR_RETRIES = int(os.environ.get('GENERATOR_RETRIES', 2))
+GENERATOR_BACKOFF = float(os.environ.get('GENERATOR_BACKOFF', 0.5))
+GENERATOR_POOL_SIZE = int(os.environ.get('GENERATOR_POOL_SIZE', UPLOAD_WORKERS))
+# Uploads up to this size are spooled in memory, larger ones in UPLOAD_SPOOL_DIR.
+UPLOAD_SPOOL_MAX_MEMORY = int(os.environ.get('UPLOAD_SPOOL_MAX_MEMORY', 4 * 1024 * 1024))
+# Bulk import (`/api/ontologies/bulk/`, `manage.py import_ontologies`): rows
+# written per bulk_create batch and transaction.
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+# Ontology payload storage (see ontologies/payload_codec.py): 'json' keeps the
+# plain JSONField, 'compressed' stores zstd/zlib-compressed MessagePack/JSON in
+# Ontology.payload. Run `manage.py convert_payloads` after switching.
+ONTOLOGY_PAYLOAD_STORAGE = os.environ.get('ONTOLOGY_PAYLOAD_STORAGE', 'json')
+ONTOLOGY_PAYLOAD_CODEC = os.environ.get('ONTOLOGY_PAYLOAD_CODEC', 'auto')
+ONTOLOGY_PAYLOAD_FORMAT = os.environ.get('ONTOLOGY_PAYLOAD_FORMAT', 'auto')
+ONTOLOGY_PAYLOAD_LEVEL = int(os.environ.get('ONTOLOGY_PAYLOAD_LEVEL', 6))
+# Entity resolution at ingest (see ontologies/resolution.py): node ids of
+# different uploads that share a normalized label or token key, or whose
+# character 3-gram Jaccard similarity reaches the threshold, are merged into
+# one canonical entity. Bands x rows is the MinHash signature length; more
+# rows per band make the LSH candidates stricter. `manage.py
+# entity_merge_report` shows the clusters.
+ENTITY_RESOLUTION = os.environ.get('ENTITY_RESOLUTION', '1').lower() in ('1', 'true', 'yes')
+ENTITY_RESOLUTION_THRESHOLD = float(os.environ.get('ENTITY_RESOLUTION_THRESHOLD', 0.8))
+ENTITY_RESOLUTION_BANDS = int(os.environ.get('ENTITY_RESOLUTION_BANDS', 8))
+ENTITY_RESOLUTION_BAND_ROWS = int(os.environ.get('ENTITY_RESOLUTION_BAND_ROWS', 4))
+# LSH buckets larger than this are skipped by the batch clustering.
+ENTITY_RESOLUTION_MAX_BUCKET = int(os.environ.get('ENTITY_RESOLUTION_MAX_BUCKET', 200))
+# Graph centrality (see ontologies/centrality.py): the index worker refreshes
+# the PageRank and degree scores behind `?top=N&rank=...` at most this often
+# once the corpus changed.
+CENTRALITY_REFRESH_SECONDS = float(os.environ.get('CENTRALITY_REFRESH_SECONDS', 60))
+CENTRALITY_DAMPING = float(os.environ.get('CENTRALITY_DAMPING', 0.85))
@@ -0,0 +1,137 @@
+"""Index types for the FAISS indexes: exact flat search or approximate (ANN).
+
+`FAISS_INDEX_FACTORY` takes either a preset or a raw FAISS factory string:
+
+    flat    exact inner-product scan (`IndexFlatIP`), the default
+    ivf     `IVF<nlist>,Flat`  inverted lists over k-means cells
+    hnsw    `HNSW<M>`          graph search; updates that remove vectors rebuild
+    ivfpq   `IVF<nlist>,PQ<m>` inverted lists with product-quantized codes
+
+Presets size `nlist` from the corpus. Trained types are trained on a sample of
+the corpus when built. IVF probes `FAISS_NPROBE` cells and HNSW explores
+`FAISS_EF_SEARCH` candidates per query, unless a query passes its own values.
+
+IVF indexes store ids natively. Other types are wrapped in an `IndexIDMap`,
+so every index returns `Ontology`/entity vector ids.
+"""
+import math
+from typing import Optional
+
+from django.conf import settings
+
+PRESETS = ('flat', 'ivf', 'hnsw', 'ivfpq')
+
+
+def _ensure_faiss():
+    """Helper to import faiss and numpy lazily."""
+    try:
+        import faiss
+        import numpy as np
+        return faiss, np
+    except Exception:
+        return None, None
+
+
+def configured_spec() -> str:
+    return (getattr(settings, 'FAISS_INDEX_FACTORY', 'flat') or 'flat').strip()
+
+
+def default_nlist(n: int) -> int:
+    """About 4*sqrt(n) cells, with enough points per cell to train k-means."""
+    return max(1, min(int(4 * math.sqrt(max(n, 1))), max(n // 39, 1)))
+
+
+def pq_subquantizers(dim: int) -> int:
+    """Sub-quantizer count for PQ: 8 dimensions each when `dim` allows it."""
+    for m in range(max(dim // 8, 1), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def factory_string(spec: str, n: int, dim: int) -> str:
+    """Resolve a preset (or pass through a factory string) for `n` vectors of `dim`."""
+    preset = spec.strip().lower()
+    if preset == 'flat':
+        return 'Flat'
+    if preset == 'ivf':
+        return f'IVF{default_nlist(n)},Flat'
+    if preset == 'hnsw':
+        return f"HNSW{int(getattr(settings, 'FAISS_HNSW_M', 32))}"
+    if preset == 'ivfpq':
+        return f'IVF{default_nlist(n)},PQ{pq_subquantizers(dim)}'
+    return spec.strip()
+
+
+def make_index(dim: int, factory: str):
+    """An empty inner-product index for `factory` that accepts `add_with_ids`."""
+    faiss, _ = _ensure_faiss()
+    if factory == 'Flat':
+        return faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+    index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+    if faiss.try_extract_index_ivf(index) is not None:
+        return index
+    return faiss.IndexIDMap(index)
+
+
+def _inner(index):
+    faiss, _ = _ensure_faiss()
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+
+def is_id_index(index) -> bool:
+    """Whether `index` was made by `make_index` (carries external ids)."""
+    faiss, _ = _ensure_faiss()
+    return isinstance(index, faiss.IndexIDMap) or faiss.try_extract_index_ivf(index) is not None
+
+
+def stored_ids(index):
+    """Ids of every vector in `index`."""
+    faiss, np = _ensure_faiss()
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map)
+    invlists = faiss.extract_index_ivf(index).invlists
+    parts = [faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+             for i in range(invlists.nlist) if invlists.list_size(i)]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+
+def supports_remove(index) -> bool:
+    """Whether vectors can be removed in place (flat and IVF; not HNSW)."""
+    faiss, _ = _ensure_faiss()
+    if faiss.try_extract_index_ivf(index) is not None:
+        return True
+    return isinstance(_inner(index), faiss.IndexFlat)
+
+
+def min_training_points(index) -> int:
+    """Fewest training vectors FAISS accepts for `index` (0 if it needs no training)."""
+    faiss, _ = _ensure_faiss()
+    if index.is_trained:
+        return 0
+    ivf = faiss.try_extract_index_ivf(index)
+    points = ivf.nlist if ivf is not None else 1
+    pq = getattr(_inner(index), 'pq', None)
+    if pq is not None:
+        points = max(points, 1 << pq.nbits)
+    return points
+
+
+def training_sample_size(index, n: int) -> int:
+    """How many vectors to train `index` on, out of `n` in the corpus."""
+    if index.is_trained:
+        return 0
+    wanted = max(int(getattr(settings, 'FAISS_TRAIN_SAMPLE', 20000)), min_training_points(index))
+    return min(n, wanted)
+
+
+def search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Per-query `SearchParameters` for `index`, or None for exact indexes."""
+    faiss, _ = _ensure_faiss()
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=int(nprobe or getattr(settings, 'FAISS_NPROBE', 16)))
+    if isinstance(_inner(index), faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search or getattr(settings, 'FAISS_EF_SEARCH', 64)))
+    return None
@@ -0,0 +1,245 @@
+"""Bulk ontology import for `/api/ontologies/bulk/` and `manage.py import_ontologies`.
+
+Input is a byte stream of NDJSON (one record per line) or a JSON array,
+decoded incrementally so memory stays bounded by the batch size rather
+than the upload. Records take the same shape as `OntologyViewSet.create`:
+`{filename, source, ontology}` (or `json` instead of `ontology`).
+
+Valid records are written with `bulk_create` in batches of
+`IMPORT_BATCH_SIZE`; each batch loads its postings, entity rows and graph
+store entries in the same transaction. The per-save signal handlers are
+suppressed for the whole load. Instead the corpus generation is bumped
+once, the component index is invalidated and one index job per new
+ontology is queued at the end. Invalid records are rejected and reported
+with their line (or array position); they do not stop the load.
+"""
+import codecs
+import json
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from . import (components, entities, generation, graph_store, index_jobs, normalization, resolution,
+               search_index, signals)
+from .models import Ontology
+
+_READ_SIZE = 64 * 1024
+_MAX_REPORTED_ERRORS = 100
+_FIELD_MAX_LENGTH = {name: Ontology._meta.get_field(name).max_length for name in ('filename', 'source')}
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    rejected: int = 0
+    errors: List[dict] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+    finished: float = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.created / self.elapsed if self.elapsed > 0 else 0.0
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < _MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': error})
+
+    def as_dict(self) -> dict:
+        return {
+            'created': self.created,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'elapsed_s': round(self.elapsed, 3),
+            'rows_per_s': round(self.rows_per_s, 1),
+        }
+
+
+class _Invalid(Exception):
+    pass
+
+
+def _ndjson(stream: BinaryIO) -> Iterator[Tuple[int, object]]:
+    for line_no, raw in enumerate(stream, start=1):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as exc:
+            yield line_no, _Invalid(f'invalid JSON: {exc}')
+
+
+def _json_array(stream: BinaryIO, head: bytes) -> Iterator[Tuple[int, object]]:
+    """Elements of a top-level JSON array, decoded as the stream is read."""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buf = text.decode(head.lstrip()[1:])  # past the '['
+    eof = False
+    position = 0
+    read_size = _READ_SIZE
+
+    def more():
+        nonlocal buf, eof, read_size
+        chunk = stream.read(read_size)
+        if not chunk:
+            eof = True
+            buf += text.decode(b'', final=True)
+        else:
+            buf += text.decode(chunk)
+            # a huge element is re-decoded after every read; read more at once
+            read_size = min(read_size * 2, 16 * 1024 * 1024)
+
+    expect_value = True
+    while True:
+        buf = buf.lstrip()
+        if not buf:
+            if eof:
+                yield position + 1, _Invalid('unterminated JSON array')
+                return
+            more()
+            continue
+        if buf[0] == ']':
+            return
+        if not expect_value:
+            if buf[0] != ',':
+                yield position + 1, _Invalid(f'expected "," or "]" after element {position}')
+                return
+            buf = buf[1:]
+            expect_value = True
+            continue
+        try:
+            value, end = decoder.raw_decode(buf)
+        except ValueError as exc:
+            if eof:
+                yield position + 1, _Invalid(f'invalid JSON: {exc}')
+                return
+            more()
+            continue
+        if end == len(buf) and not eof:
+            # a number or literal may continue in the next chunk
+            more()
+            continue
+        buf = buf[end:]
+        position += 1
+        expect_value = False
+        read_size = _READ_SIZE
+        yield position, value
+
+
+def records(stream: BinaryIO, fmt: str = 'auto') -> Iterator[Tuple[int, object]]:
+    """`(line, record)` pairs; undecodable lines come as `_Invalid` records.
+
+    `fmt` is 'ndjson', 'json' (an array) or 'auto', which looks at the first
+    non-blank character.
+    """
+    head = b''
+    while not head.strip():
+        chunk = stream.read(1024)
+        if not chunk:
+            return
+        head += chunk
+    is_array = head.lstrip().startswith(b'[')
+    if fmt == 'json' and not is_array:
+        yield 1, _Invalid('expected a JSON array')
+    elif is_array and fmt != 'ndjson':
+        yield from _json_array(stream, head)
+    else:
+        yield from _ndjson(_Prefixed(head, stream))
+
+
+class _Prefixed:
+    """Line iterator over `head` followed by the rest of `stream`."""
+
+    def __init__(self, head: bytes, stream: BinaryIO):
+        self.head = head
+        self.stream = stream
+
+    def __iter__(self):
+        pending = self.head
+        while True:
+            chunk = self.stream.read(_READ_SIZE)
+            pending += chunk
+            lines = pending.split(b'\n')
+            pending = lines.pop()
+            yield from lines
+            if not chunk:
+                break
+        if pending:
+            yield pending
+
+
+def to_ontology(record, source: str = '') -> Ontology:
+    """The unsaved Ontology for one record; raises `_Invalid` if it cannot be stored."""
+    if isinstance(record, _Invalid):
+        raise record
+    if not isinstance(record, dict):
+        raise _Invalid('record must be a JSON object')
+    payload = record.get('ontology', record.get('json'))
+    if payload is None:
+        raise _Invalid('record has no "ontology" (or "json")')
+    values = {'filename': record.get('filename') or '', 'source': record.get('source') or source or ''}
+    for name, value in values.items():
+        if not isinstance(value, str):
+            raise _Invalid(f'"{name}" must be a string')
+        if len(value) > _FIELD_MAX_LENGTH[name]:
+            raise _Invalid(f'"{name}" is longer than {_FIELD_MAX_LENGTH[name]} characters')
+    return Ontology(json=payload, **values)
+
+
+def _write_batch(batch: List[Ontology]) -> List[int]:
+    with transaction.atomic(), resolution.memo():
+        # resolve the node ids of the whole batch with a few queries; each
+        # row's normalization then finds them in the memo
+        if resolution.enabled():
+            resolution.resolve_ids(i for o in batch for i in resolution.ids_of(normalization.canonical(o.json)))
+        created = Ontology.objects.bulk_create(batch)
+        search_index.index_many(created)
+        entities.add_many(created)
+        graph_store.add_many(created)
+    return [o.id for o in created]
+
+
+def load(stream: BinaryIO, fmt: str = 'auto', batch_size: int = None, source: str = '',
+         progress=None) -> ImportReport:
+    """Import every valid record of `stream`; `progress(report)` runs after each batch."""
+    batch_size = batch_size or int(getattr(settings, 'IMPORT_BATCH_SIZE', 500))
+    report = ImportReport()
+    created_ids: List[int] = []
+    batch: List[Ontology] = []
+    with signals.suppressed():
+        try:
+            for line, record in records(stream, fmt):
+                try:
+                    batch.append(to_ontology(record, source))
+                except _Invalid as exc:
+                    report.reject(line, str(exc))
+                    continue
+                if len(batch) >= batch_size:
+                    created_ids += _write_batch(batch)
+                    report.created += len(batch)
+                    batch = []
+                    if progress:
+                        progress(report)
+            if batch:
+                created_ids += _write_batch(batch)
+                report.created += len(batch)
+        finally:
+            if created_ids:
+                _settle(created_ids)
+    report.finished = time.perf_counter()
+    return report
+
+
+def _settle(created_ids: List[int]) -> None:
+    """What the signals would have done, once for the whole import."""
+    generation.bump()
+    components.invalidate()
+    index_jobs.enqueue_many(created_ids)
@@ -0,0 +1,161 @@
+"""PageRank and in/out-degree of the aggregated graph, stored on `GraphNode`.
+
+`/api/graph/` returns every node of the corpus, more than the D3 force
+layout of the frontend can draw. With `?top=N&rank=pagerank` (or
+`in_degree`/`out_degree`) it and `/api/search_graph/` return only the N
+highest-ranked nodes and the edges among them.
+
+Scores are computed over the compact adjacency of the whole store (see
+`compact_graph`) as a DiGraph would see it (parallel edges with different
+relations count once): PageRank by a vectorized power iteration on a sparse
+matrix (scipy.sparse when installed, `np.bincount` otherwise), degrees from
+the same edge arrays. `refresh()` writes them to `GraphNode` and records in
+`GraphCentrality` which corpus generation they describe. The index worker
+refreshes once the corpus moved on, at most every
+`CENTRALITY_REFRESH_SECONDS`; `manage.py refresh_centrality` does it on
+demand. Nodes added since the last refresh rank with score 0 until then.
+"""
+import time
+from datetime import timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import compact_graph, generation
+from .graph_store import _key
+from .models import GraphCentrality, GraphEdge, GraphNode
+from .scoring import _ensure_scipy
+
+RANKS = ('pagerank', 'in_degree', 'out_degree')
+_ROW_ID = 1
+_BATCH_SIZE = 1000
+
+
+def edges(graph: compact_graph.CompactGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct `(source, target)` index pairs of `graph`."""
+    n = len(graph.ids)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(graph.fwd_indptr))
+    pairs = np.unique(src * n + graph.fwd_indices.astype(np.int64))
+    return pairs // n, pairs % n
+
+
+def pagerank(src: np.ndarray, dst: np.ndarray, n: int, damping: float = 0.85,
+             tol: float = 1e-6, max_iter: int = 100) -> Tuple[np.ndarray, int]:
+    """PageRank of the `n`-node graph with edges `src[i] -> dst[i]`.
+
+    Same definition and stopping rule as `networkx.pagerank`: dangling nodes
+    spread their rank uniformly and iteration stops once the L1 change is
+    below `n * tol`. Returns the scores and the number of iterations.
+    """
+    if n == 0:
+        return np.zeros(0), 0
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    inv_out = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    _, sparse = _ensure_scipy()
+    if sparse is not None:
+        # column-stochastic transition matrix (times out-degree), target x source
+        matrix = sparse.csr_matrix((np.ones(len(src)), (dst, src)), shape=(n, n))
+
+        def spread(v):
+            return matrix @ v
+    else:
+        def spread(v):
+            return np.bincount(dst, weights=v[src], minlength=n)
+
+    x = np.full(n, 1.0 / n)
+    for iteration in range(1, max_iter + 1):
+        y = damping * spread(x * inv_out) + (damping * x[dangling].sum() + 1.0 - damping) / n
+        change = np.abs(y - x).sum()
+        x = y
+        if change < n * tol:
+            return x, iteration
+    return x, max_iter
+
+
+def compute(graph: compact_graph.CompactGraph) -> Tuple[Dict[str, np.ndarray], int]:
+    """`{rank: scores}` aligned with `graph.ids`, and the PageRank iterations."""
+    n = len(graph.ids)
+    src, dst = edges(graph)
+    ranks, iterations = pagerank(src, dst, n,
+                                 damping=float(getattr(settings, 'CENTRALITY_DAMPING', 0.85)))
+    return {
+        'pagerank': ranks,
+        'in_degree': np.bincount(dst, minlength=n),
+        'out_degree': np.bincount(src, minlength=n),
+    }, iterations
+
+
+def state() -> Optional[GraphCentrality]:
+    return GraphCentrality.objects.filter(pk=_ROW_ID).first()
+
+
+def due() -> bool:
+    """Whether the stored scores describe an older corpus and may be refreshed now."""
+    current = state()
+    if current is None:
+        return GraphNode.objects.exists()
+    if current.generation == generation.current():
+        return False
+    wait = timedelta(seconds=float(getattr(settings, 'CENTRALITY_REFRESH_SECONDS', 60)))
+    return current.computed_at is None or current.computed_at <= timezone.now() - wait
+
+
+def refresh() -> GraphCentrality:
+    """Recompute every score from the store and write them to `GraphNode`."""
+    started = time.perf_counter()
+    gen = generation.current()
+    graph = compact_graph.CompactGraph.from_store()
+    scores, iterations = compute(graph)
+    position = {_key(nid): i for i, nid in enumerate(graph.ids)}
+    rows = list(GraphNode.objects.only('pk', 'key'))
+    for row in rows:
+        i = position.get(row.key)
+        row.pagerank = float(scores['pagerank'][i]) if i is not None else 0.0
+        row.in_degree = int(scores['in_degree'][i]) if i is not None else 0
+        row.out_degree = int(scores['out_degree'][i]) if i is not None else 0
+    with transaction.atomic():
+        GraphNode.objects.bulk_update(rows, list(RANKS), batch_size=_BATCH_SIZE)
+        current, _ = GraphCentrality.objects.update_or_create(pk=_ROW_ID, defaults={
+            'generation': gen, 'computed_at': timezone.now(), 'nodes': len(graph.ids),
+            'iterations': iterations, 'elapsed': time.perf_counter() - started,
+        })
+    return current
+
+
+def stamp() -> str:
+    """Identifies the stored scores, for cache keys and ETags."""
+    current = state()
+    return f'{current.generation}@{current.computed_at.timestamp()}' if current and current.computed_at else '-'
+
+
+def top_subgraph(rank: str, top: int) -> Tuple[List[dict], List[dict]]:
+    """The `top` highest-ranked nodes of the store (with their score) and the edges among them."""
+    rows = list(GraphNode.objects.order_by(f'-{rank}', 'first_ontology_id', 'position')
+                .values_list('key', 'data', rank)[:top])
+    nodes = [dict(data, **{rank: score}) for _, data, score in rows]
+    keys = [key for key, _, _ in rows]
+    wanted = set(keys)
+    relations = []
+    for start in range(0, len(keys), _BATCH_SIZE):
+        found = GraphEdge.objects.filter(source_key__in=keys[start:start + _BATCH_SIZE])
+        if len(keys) <= _BATCH_SIZE:
+            found = found.filter(target_key__in=keys)
+        relations += [r for r in found.values_list('first_ontology_id', 'position', 'target_key', 'data')
+                      if r[2] in wanted]
+    relations.sort(key=lambda r: (r[0], r[1]))
+    return nodes, [data for _, _, _, data in relations]
+
+
+def scores_of(ids: Iterable[Hashable], rank: str) -> Dict[Hashable, float]:
+    """Stored `rank` score of each node id (0 for ids the store has not scored)."""
+    by_key = {_key(nid): nid for nid in ids}
+    keys = list(by_key)
+    found = {}
+    for start in range(0, len(keys), _BATCH_SIZE):
+        for key, score in GraphNode.objects.filter(key__in=keys[start:start + _BATCH_SIZE]).values_list('key', rank):
+            found[by_key[key]] = score
+    return {nid: found.get(nid, 0) for nid in by_key.values()}
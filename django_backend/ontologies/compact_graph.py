@@ -0,0 +1,132 @@
+"""Process-wide compact adjacency for graph traversal.
+
+`search_graph` and `remote_query` used to build a fresh `nx.DiGraph` per
+request. This module keeps one compact copy of the aggregated graph per
+process: node ids are interned to ints, forward and reverse adjacency are
+stored as CSR arrays in NumPy, and relation types live in a parallel array
+of codes. It is built from the materialized graph store and rebuilt when
+the corpus generation changes.
+
+The traversal helpers take the per-request subgraph (which nodes and which
+`(source, target)` pairs a request may use), so results are the same as
+traversing a DiGraph built from the request's own hits.
+"""
+import threading
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from . import generation, graph_store
+
+_CHUNK_SIZE = 5000
+
+
+class CompactGraph:
+    def __init__(self, ids: List[Hashable], src, dst, rel, relation_names: List[str]):
+        self.ids = ids
+        self.index: Dict[Hashable, int] = {nid: i for i, nid in enumerate(ids)}
+        self.relation_names = relation_names
+        n = len(ids)
+        self.fwd_indptr, self.fwd_indices, self.fwd_rel = self._csr(src, dst, rel, n)
+        self.rev_indptr, self.rev_indices, self.rev_rel = self._csr(dst, src, rel, n)
+
+    @staticmethod
+    def _csr(rows, cols, rel, n):
+        order = np.argsort(rows, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return indptr, cols[order].astype(np.int32), rel[order].astype(np.int32)
+
+    @classmethod
+    def from_edges(cls, node_ids: Iterable[Hashable], edges: Iterable[Tuple[Hashable, Hashable, str]]):
+        ids: List[Hashable] = []
+        index: Dict[Hashable, int] = {}
+
+        def intern(nid):
+            i = index.get(nid)
+            if i is None:
+                i = index[nid] = len(ids)
+                ids.append(nid)
+            return i
+
+        for nid in node_ids:
+            intern(nid)
+        rel_codes: Dict[str, int] = {}
+        src, dst, rel = [], [], []
+        for s, t, r in edges:
+            src.append(intern(s))
+            dst.append(intern(t))
+            rel.append(rel_codes.setdefault(r, len(rel_codes)))
+        names = [None] * len(rel_codes)
+        for name, code in rel_codes.items():
+            names[code] = name
+        return cls(ids, np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64),
+                   np.asarray(rel, dtype=np.int64), names)
+
+    @classmethod
+    def from_store(cls):
+        nodes = (n['id'] for n in graph_store.nodes(chunk_size=_CHUNK_SIZE))
+        edges = ((r['source'], r['target'], r['relation']) for r in graph_store.relations(chunk_size=_CHUNK_SIZE))
+        return cls.from_edges(nodes, edges)
+
+    def __contains__(self, nid) -> bool:
+        return nid in self.index
+
+    def successors(self, i: int):
+        return self.fwd_indices[self.fwd_indptr[i]:self.fwd_indptr[i + 1]]
+
+    def predecessors(self, i: int):
+        return self.rev_indices[self.rev_indptr[i]:self.rev_indptr[i + 1]]
+
+
+_lock = threading.Lock()
+_state = {'generation': None, 'graph': None}
+
+
+def get() -> CompactGraph:
+    """The shared graph for the current corpus generation."""
+    gen = generation.current()
+    with _lock:
+        if _state['graph'] is None or _state['generation'] != gen:
+            _state['graph'] = CompactGraph.from_store()
+            _state['generation'] = gen
+        return _state['graph']
+
+
+def expand(graph: CompactGraph, seeds: Iterable[Hashable], hops: int,
+           edge_relations: Dict[Tuple[Hashable, Hashable], str]):
+    """Undirected BFS up to `hops` from `seeds`, restricted to `edge_relations`.
+
+    `edge_relations` maps the `(source, target)` pairs the caller's subgraph
+    contains to the relation reported for them. Returns `(nodes, edges)` with
+    edges as `(source, target, relation)` tuples.
+    """
+    traversed_nodes: Set[Hashable] = set()
+    traversed_edges: Set[Tuple[Hashable, Hashable, Optional[str]]] = set()
+    frontier = [s for s in seeds if s in graph]
+    traversed_nodes.update(frontier)
+    visited = set(frontier)
+    for _ in range(max(hops, 0)):
+        nxt = []
+        for node in frontier:
+            i = graph.index[node]
+            for j in graph.successors(i):
+                nbr = graph.ids[j]
+                if (node, nbr) not in edge_relations:
+                    continue
+                traversed_nodes.add(nbr)
+                traversed_edges.add((node, nbr, edge_relations[(node, nbr)]))
+                if nbr not in visited:
+                    visited.add(nbr)
+                    nxt.append(nbr)
+            for j in graph.predecessors(i):
+                nbr = graph.ids[j]
+                if (nbr, node) not in edge_relations:
+                    continue
+                traversed_nodes.add(nbr)
+                traversed_edges.add((nbr, node, edge_relations[(nbr, node)]))
+                if nbr not in visited:
+                    visited.add(nbr)
+                    nxt.append(nbr)
+        frontier = nxt
+    return traversed_nodes, traversed_edges
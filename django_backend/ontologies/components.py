@@ -0,0 +1,129 @@
+"""Weakly connected component labels for the aggregated graph.
+
+`remote_query` used to start a BFS from every hit entity, re-walking the same
+component once per member. Instead every process keeps a union-find over
+the nodes and edges of the materialized graph store: expanding a result set
+is then a component-id lookup per entity and relationship, linear in the
+size of the output.
+
+Ingest only ever merges components, so a save that just adds nodes/edges is
+applied to the structure in place. Deletes and updates that retract edges
+cannot split a union-find; they mark it stale and it is rebuilt from the
+store on next use, as it is in any process that sees the corpus generation
+move under it.
+"""
+import threading
+from typing import Dict, Hashable, Iterable, Optional
+
+from . import generation, graph_store
+
+_CHUNK_SIZE = 5000
+
+
+class UnionFind:
+    """Union by size with path halving over arbitrary hashable node ids."""
+
+    def __init__(self):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+
+    def add(self, x: Hashable) -> None:
+        if x not in self.parent:
+            self.parent[x] = x
+            self.size[x] = 1
+
+    def find(self, x: Hashable) -> Hashable:
+        parent = self.parent
+        if x not in parent:
+            return x
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: Hashable, b: Hashable) -> None:
+        self.add(a)
+        self.add(b)
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def __contains__(self, x: Hashable) -> bool:
+        return x in self.parent
+
+
+class ComponentIndex:
+    def __init__(self):
+        self.uf = UnionFind()
+
+    @classmethod
+    def from_store(cls) -> 'ComponentIndex':
+        index = cls()
+        for n in graph_store.nodes(chunk_size=_CHUNK_SIZE):
+            index.uf.add(n['id'])
+        for r in graph_store.relations(chunk_size=_CHUNK_SIZE):
+            index.uf.union(r['source'], r['target'])
+        return index
+
+    def add_form(self, form) -> None:
+        """Merge the nodes and edges asserted by one ontology's normalized form."""
+        nodes, edges = graph_store.contributions(form)
+        for nn, _ in nodes.values():
+            self.uf.add(nn['id'])
+        for rr, _ in edges.values():
+            self.uf.union(rr['source'], rr['target'])
+
+    def component(self, node: Hashable) -> Hashable:
+        """Component label of `node`; unknown nodes form their own component."""
+        return self.uf.find(node)
+
+
+_lock = threading.Lock()
+_state = {'generation': None, 'index': None}
+
+
+def get() -> ComponentIndex:
+    """The component index for the current corpus generation."""
+    gen = generation.current()
+    with _lock:
+        if _state['index'] is None or _state['generation'] != gen:
+            _state['index'] = ComponentIndex.from_store()
+            _state['generation'] = gen
+        return _state['index']
+
+
+def ontology_changed(old_form, new_form, new_generation: Optional[int]) -> None:
+    """Keep this process's index current after an Ontology write.
+
+    Called from the signals once the generation was bumped to
+    `new_generation`. Only a pure addition on top of the previous generation
+    can be applied in place; anything else invalidates the index.
+    """
+    old_nodes, old_edges = graph_store.contributions(old_form)
+    new_nodes, new_edges = graph_store.contributions(new_form)
+    additive = set(old_nodes) <= set(new_nodes) and set(old_edges) <= set(new_edges)
+    with _lock:
+        index = _state['index']
+        if (index is not None and additive and new_generation is not None
+                and _state['generation'] == new_generation - 1):
+            index.add_form(new_form)
+            _state['generation'] = new_generation
+        else:
+            _state['index'] = None
+            _state['generation'] = None
+
+
+def invalidate() -> None:
+    """Drop this process's index; it is rebuilt from the store on next use."""
+    with _lock:
+        _state['index'] = None
+        _state['generation'] = None
+
+
+def components_of(index: ComponentIndex, entity_ids: Iterable[Hashable]) -> set:
+    """Component labels touched by `entity_ids`."""
+    return {index.component(e) for e in entity_ids}
@@ -0,0 +1,278 @@
+"""On-disk cache of text embeddings keyed by content hash.
+
+Index builds used to run `model.encode` over every document even when almost
+nothing changed since the last build. Embeddings are cached per model,
+keyed by SHA-256 of the exact text given to the encoder, so a rebuild only
+encodes new or changed content.
+
+Each model gets a directory under `EMBEDDING_CACHE_DIR` with:
+
+    vectors.f32     memory-mapped float32 matrix, one row per slot
+    keys.npy        SHA-256 digest per slot, 32 raw bytes (memory-mapped)
+    last_used.npy   LRU clock value per slot, 0 for a free slot (memory-mapped)
+    state.npy       change counter of the key map and the LRU clock
+    manifest.json   model name, dimension and capacity
+
+All of them are shared mappings, so every process sees the same cache and
+the files are always what the processes last wrote. A slot is never named
+by its old key once its row is being overwritten: eviction first marks the
+slot free, then the new row is written, and only then the new key. A build
+that is killed half-way leaves at worst free slots behind, never a key
+pointing at another text's vector. Processes (`rebuild_faiss`, the index
+worker) take an exclusive `flock` on `<directory>.lock` around opening,
+encoding and flushing, and re-read the slot map when another process
+changed it.
+
+The capacity is `EMBEDDING_CACHE_MAX_ENTRIES` rows, lowered to fit in
+`EMBEDDING_CACHE_MAX_BYTES`; when it is full the least recently used slots
+are overwritten. Set `EMBEDDING_CACHE_MAX_ENTRIES=0` to disable the cache.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the cache is then only safe within one process
+    fcntl = None
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 3
+DIGEST_SIZE = 32
+
+
+def _ensure_numpy():
+    """Helper to import numpy lazily."""
+    try:
+        import numpy as np
+        return np
+    except Exception:
+        return None
+
+
+def cache_dir() -> str:
+    base = getattr(settings, 'EMBEDDING_CACHE_DIR', None)
+    if not base:
+        base = os.path.join(getattr(settings, 'FAISS_INDEX_DIR', None) or os.path.join(settings.BASE_DIR, 'faiss_index'),
+                            'embedding_cache')
+    return os.path.abspath(base)
+
+
+def capacity_for(dim: int) -> int:
+    entries = int(getattr(settings, 'EMBEDDING_CACHE_MAX_ENTRIES', 200000))
+    max_bytes = int(getattr(settings, 'EMBEDDING_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    return max(min(entries, max_bytes // (dim * 4)), 0)
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str, model_name: str, dim: int, capacity: int):
+        self.directory = directory
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(directory) or '.', exist_ok=True)
+        self.lock_file = open(f'{directory}.lock', 'a+b')
+        try:
+            with self._exclusive():
+                self._open()
+        except Exception:
+            self.lock_file.close()
+            raise
+
+    def _open(self) -> None:
+        np = _ensure_numpy()
+        capacity = self.capacity
+        manifest = {'format': FORMAT_VERSION, 'model': self.model_name, 'dimension': self.dim, 'capacity': capacity}
+        if self._read_manifest() != manifest:
+            # another model, dimension or size: start over rather than reinterpret
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory)
+            self._write_json('manifest.json', manifest)
+        vectors_path = self._path('vectors.f32')
+        mode = 'r+' if os.path.exists(vectors_path) else 'w+'
+        self.vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self.keys = self._array('keys.npy', np.uint8, (capacity, DIGEST_SIZE))
+        self.last_used = self._array('last_used.npy', np.int64, (capacity,))
+        self.state = self._array('state.npy', np.int64, (2,))
+        self.epoch = None
+        self._sync()
+
+    def _array(self, name: str, dtype, shape):
+        """A shared memory-mapped `.npy` array, zeroed when missing or of another shape."""
+        np = _ensure_numpy()
+        path = self._path(name)
+        try:
+            array = np.lib.format.open_memmap(path, mode='r+')
+            if array.shape == shape and array.dtype == dtype:
+                return array
+        except (OSError, ValueError):
+            pass
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+    @contextmanager
+    def _exclusive(self):
+        """This process's lock and the cross-process file lock."""
+        with self.lock:
+            if fcntl is not None:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """Re-read the slot map if another process changed it since we last looked."""
+        np = _ensure_numpy()
+        epoch = int(self.state[0])
+        if epoch != self.epoch:
+            self.slots = {self.keys[i].tobytes(): int(i) for i in np.flatnonzero(self.last_used)}
+            self.epoch = epoch
+
+    def _changed(self) -> None:
+        self.state[0] += 1
+        self.epoch = int(self.state[0])
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path('manifest.json'), encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, name: str, value) -> None:
+        with open(self._path(name), 'w', encoding='utf-8') as fh:
+            json.dump(value, fh, sort_keys=True)
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f'{self.model_name}\x00{text}'.encode('utf-8')).digest()
+
+    def _allocate(self, n: int):
+        """`n` slots for new entries: free ones first, then the least recently used."""
+        np = _ensure_numpy()
+        free = np.flatnonzero(self.last_used == 0)
+        if free.size >= n:
+            return free[:n]
+        need = n - free.size
+        used = np.flatnonzero(self.last_used)
+        victims = used[np.argpartition(self.last_used[used], need - 1)[:need]]
+        for slot in victims:
+            self.slots.pop(self.keys[slot].tobytes(), None)
+        # free the victims before their rows are overwritten, so no key ever
+        # names a slot holding another text's vector
+        self.last_used[victims] = 0
+        self.keys[victims] = 0
+        self._changed()
+        return np.concatenate([free, victims])
+
+    def encode(self, model, texts: List[str]):
+        """Embeddings of `texts`, running `model.encode` only for the misses."""
+        with self._exclusive():
+            self._sync()
+            return self._encode(model, texts)
+
+    def _encode(self, model, texts: List[str]):
+        np = _ensure_numpy()
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        self.state[1] += 1
+        clock = int(self.state[1])
+        missing = {}
+        for i, text in enumerate(texts):
+            key = self.key(text)
+            slot = self.slots.get(key)
+            if slot is None:
+                missing.setdefault(key, []).append(i)
+                continue
+            out[i] = self.vectors[slot]
+            self.last_used[slot] = clock
+        self.hits += len(texts) - sum(len(v) for v in missing.values())
+        self.misses += sum(len(v) for v in missing.values())
+        if not missing:
+            return out
+
+        keys = list(missing)
+        first = [missing[k][0] for k in keys]
+        emb = np.asarray(model.encode([texts[i] for i in first], convert_to_numpy=True, show_progress_bar=False),
+                         dtype=np.float32)
+        for key, row in zip(keys, emb):
+            out[missing[key]] = row
+        # a batch larger than the whole cache only keeps its tail
+        store = min(len(keys), self.capacity)
+        if store:
+            slots = self._allocate(store)
+            # rows first, then the keys that name them
+            for row, slot in zip(emb[-store:], slots):
+                self.vectors[slot] = row
+            for key, slot in zip(keys[-store:], slots):
+                self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self.last_used[slot] = clock
+                self.slots[key] = int(slot)
+            self._changed()
+        return out
+
+    def flush(self) -> None:
+        """Write the mapped files back to disk."""
+        with self._exclusive():
+            for array in (self.vectors, self.keys, self.last_used, self.state):
+                array.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model_name,
+            'entries': len(self.slots),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+_lock = threading.Lock()
+_caches = {}
+
+
+def for_model(model_name: str, dim: int) -> Optional[EmbeddingCache]:
+    """The process-wide cache for `model_name`, or None if disabled or NumPy is missing."""
+    if _ensure_numpy() is None:
+        return None
+    capacity = capacity_for(dim)
+    if capacity <= 0:
+        return None
+    directory = os.path.join(cache_dir(), re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name))
+    key = (directory, model_name, dim, capacity)
+    with _lock:
+        cache = _caches.get(key)
+        if cache is None:
+            try:
+                cache = _caches[key] = EmbeddingCache(directory, model_name, dim, capacity)
+            except Exception:
+                logger.exception('embedding cache unavailable at %s', directory)
+                return None
+        return cache
+
+
+def reset_stats() -> None:
+    with _lock:
+        for cache in _caches.values():
+            cache.hits = cache.misses = 0
+
+
+def stats() -> List[dict]:
+    with _lock:
+        return [cache.stats() for cache in _caches.values()]
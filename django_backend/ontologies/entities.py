@@ -0,0 +1,105 @@
+"""Normalized `Entity`/`Relation` rows extracted from `Ontology.json` at ingest.
+
+The graph read paths query these indexed tables instead of decoding and
+normalizing whole JSON documents per request. Rows are derived from the
+stored `Ontology.normalized` form (see `normalization`) and replaced
+wholesale whenever their ontology is saved (deletes cascade).
+"""
+import json
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from . import normalization
+from .models import Entity, Ontology, Relation
+
+_BATCH_SIZE = 500
+
+
+def text_key(value) -> str:
+    """Column value for an id/label/type: strings as-is, anything else as JSON."""
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return value[:255]
+
+
+def build_rows(ontology: Ontology) -> Tuple[List[Entity], List[Relation]]:
+    form = normalization.of(ontology)
+    entities: List[Entity] = []
+    relations: List[Relation] = []
+    if not form['nodes'] and not form['relations']:
+        return entities, relations
+    # `properties` keeps the raw item the normalized one came from
+    nodes = normalization.raw_nodes(ontology.json)
+    edges = normalization.raw_relations(ontology.json)
+    for pos, nn in form['nodes']:
+        n = nodes[pos] if pos < len(nodes) else None
+        entities.append(Entity(
+            ontology_id=ontology.id, position=pos,
+            entity_id=text_key(nn['id']), label=text_key(nn['label']), type=text_key(nn['type']),
+            data=nn, properties=n if isinstance(n, dict) else None,
+        ))
+    for pos, rr in form['relations']:
+        r = edges[pos] if pos < len(edges) else None
+        relations.append(Relation(
+            ontology_id=ontology.id, position=pos,
+            source=text_key(rr['source']), relation=text_key(rr['relation']), target=text_key(rr['target']),
+            data=rr, properties=r,
+        ))
+    return entities, relations
+
+
+def sync(ontology: Ontology) -> None:
+    """Replace the rows of one ontology with freshly normalized ones."""
+    entities, relations = build_rows(ontology)
+    with transaction.atomic():
+        Entity.objects.filter(ontology_id=ontology.id).delete()
+        Relation.objects.filter(ontology_id=ontology.id).delete()
+        Entity.objects.bulk_create(entities, batch_size=_BATCH_SIZE)
+        Relation.objects.bulk_create(relations, batch_size=_BATCH_SIZE)
+
+
+def add_many(ontologies: Iterable[Ontology]) -> None:
+    """Load the rows of ontologies that have none yet (a bulk import batch)."""
+    entities: List[Entity] = []
+    relations: List[Relation] = []
+    for o in ontologies:
+        e, r = build_rows(o)
+        entities.extend(e)
+        relations.extend(r)
+    with transaction.atomic():
+        Entity.objects.bulk_create(entities, batch_size=_BATCH_SIZE)
+        Relation.objects.bulk_create(relations, batch_size=_BATCH_SIZE)
+
+
+def rebuild(ontologies: Optional[Iterable[Ontology]] = None) -> int:
+    """Reload every row from the stored normalized forms. Returns the number of ontologies read."""
+    if ontologies is None:
+        ontologies = Ontology.objects.order_by('id').iterator(chunk_size=200)
+    count = 0
+    with transaction.atomic():
+        Entity.objects.all().delete()
+        Relation.objects.all().delete()
+        for o in ontologies:
+            entities, relations = build_rows(o)
+            Entity.objects.bulk_create(entities, batch_size=_BATCH_SIZE)
+            Relation.objects.bulk_create(relations, batch_size=_BATCH_SIZE)
+            count += 1
+    return count
+
+
+def for_ontologies(ontology_ids: List[int]):
+    """Entity and Relation rows of the given ontologies, in ontology order then position.
+
+    Returns `(entities_by_ontology, relations_by_ontology)` dicts of lists so
+    callers can merge them in their own ranking order.
+    """
+    entities = {oid: [] for oid in ontology_ids}
+    relations = {oid: [] for oid in ontology_ids}
+    for e in Entity.objects.filter(ontology_id__in=ontology_ids).order_by('ontology_id', 'position'):
+        entities[e.ontology_id].append(e)
+    for r in Relation.objects.filter(ontology_id__in=ontology_ids).order_by('ontology_id', 'position'):
+        relations[r.ontology_id].append(r)
+    return entities, relations
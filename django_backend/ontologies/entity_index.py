@@ -0,0 +1,194 @@
+"""Entity-level FAISS index used to pick graph traversal seeds.
+
+`faiss_index` embeds each ontology as a single vector, which blurs large
+documents and leaves `search_graph` matching seed nodes by substring. This
+index holds one vector per normalized `Entity` (label + type + description)
+and per `Relation` triple, so a query lands directly on the nodes it is
+about.
+
+Vector ids pack `(ontology_id, kind, position)`, so a hit maps back to its
+`Entity`/`Relation` row and an ontology's vectors can be found without a
+side table. The index worker keeps it up to date from the same job batches
+as the document index (see `index_jobs`), and it is published as the
+`entities` index bundle.
+"""
+import logging
+import random
+from functools import reduce
+from operator import or_
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import ann
+from .faiss_index import BundledIndex, _ensure_faiss, _setting, get_model
+from .models import Entity, Relation
+
+logger = logging.getLogger(__name__)
+
+ENTITY, RELATION = 0, 1
+_POSITION_BITS = 20
+_KIND_BITS = 1
+_MAX_POSITION = (1 << _POSITION_BITS) - 1
+_ONTOLOGY_SHIFT = _POSITION_BITS + _KIND_BITS
+
+_DESCRIPTION_KEYS = ('description', 'desc', 'definition', 'comment')
+
+_entities = BundledIndex('entities')
+
+
+def vector_id(ontology_id: int, kind: int, position: int) -> int:
+    return (int(ontology_id) << _ONTOLOGY_SHIFT) | (kind << _POSITION_BITS) | int(position)
+
+
+def decode(vid: int):
+    """`(ontology_id, kind, position)` of a vector id."""
+    return vid >> _ONTOLOGY_SHIFT, (vid >> _POSITION_BITS) & 1, vid & _MAX_POSITION
+
+
+def entity_text(data: dict, properties) -> str:
+    text = f"{data.get('label')} ({data.get('type')})"
+    if isinstance(properties, dict):
+        for key in _DESCRIPTION_KEYS:
+            if properties.get(key):
+                return f'{text}: {properties[key]}'
+    return text
+
+
+def relation_text(data: dict) -> str:
+    return f"{data.get('source')} {data.get('relation')} {data.get('target')}"
+
+
+def _rows(ontology_ids: Optional[List[int]] = None):
+    """`(vector_id, text)` for every Entity and Relation row (of `ontology_ids`)."""
+    entities = Entity.objects.order_by('ontology_id', 'position')
+    relations = Relation.objects.order_by('ontology_id', 'position')
+    if ontology_ids is not None:
+        entities = entities.filter(ontology_id__in=ontology_ids)
+        relations = relations.filter(ontology_id__in=ontology_ids)
+    chunk_size = _setting('FAISS_BUILD_CHUNK_SIZE', 200) * 10
+    for oid, pos, data, properties in entities.values_list('ontology_id', 'position', 'data', 'properties').iterator(chunk_size=chunk_size):
+        if pos <= _MAX_POSITION:
+            yield vector_id(oid, ENTITY, pos), entity_text(data, properties)
+    for oid, pos, data in relations.values_list('ontology_id', 'position', 'data').iterator(chunk_size=chunk_size):
+        if pos <= _MAX_POSITION:
+            yield vector_id(oid, RELATION, pos), relation_text(data)
+
+
+def _count() -> int:
+    return Entity.objects.count() + Relation.objects.count()
+
+
+def _sample(n: int):
+    """About `n` random rows, drawn from whole ontologies."""
+    ids = list(Entity.objects.order_by().values_list('ontology_id', flat=True).distinct())
+    random.shuffle(ids)
+    total = max(_count(), 1)
+    per_ontology = total / max(len(ids), 1)
+    picked = ids[:max(int(n / per_ontology) + 1, 1)]
+    for i, row in enumerate(_rows(sorted(picked))):
+        if i >= n:
+            break
+        yield row
+
+
+def _rebuild(model, progress=None):
+    return _entities.rebuild(model, _rows(), progress, count=_count(), sample=_sample)
+
+
+def build_index(force=False, progress=None):
+    """Build the entity index from every Entity/Relation row; returns the build stats."""
+    model = get_model()
+    faiss, _ = _ensure_faiss()
+    if model is None or faiss is None:
+        return None
+    with _entities.lock:
+        if not force:
+            _entities.refresh()
+            if not _entities.stale(model):
+                return None
+        return _rebuild(model, progress)
+
+
+def apply_changes(ontology_ids: Iterable[int]) -> None:
+    """Replace the vectors of the given ontologies with their current rows."""
+    ontology_ids = sorted({int(i) for i in ontology_ids})
+    if not ontology_ids:
+        return
+    model = get_model()
+    faiss, np = _ensure_faiss()
+    if model is None or faiss is None:
+        return
+    with _entities.lock:
+        _entities.refresh()
+        if _entities.stale(model):
+            _rebuild(model)
+            return
+        existing = ann.stored_ids(_entities.index)
+        stale_ids = np.ascontiguousarray(existing[np.isin(existing >> _ONTOLOGY_SHIFT, ontology_ids)], dtype=np.int64)
+        if not _entities.can_update(stale_ids):
+            _rebuild(model)
+            return
+        _entities.update(model, stale_ids, _rows(ontology_ids))
+
+
+def bundle_info() -> dict:
+    return _entities.info()
+
+
+def bundle_version() -> Optional[str]:
+    return _entities.current_version()
+
+
+def query(text: str, k: Optional[int] = None, nprobe: Optional[int] = None,
+          ef_search: Optional[int] = None) -> List[dict]:
+    """Nearest entities and relation triples for `text`.
+
+    Each hit is `{'ontology_id', 'kind', 'node_ids', 'score', 'data'}` where
+    `node_ids` is the entity id, or the source and target of a relation.
+    Returns [] when the index or model is unavailable.
+    """
+    if k is None:
+        k = getattr(settings, 'ENTITY_SEED_K', 20)
+    model = get_model()
+    faiss, _ = _ensure_faiss()
+    if model is None or faiss is None or k <= 0:
+        return []
+    hits = _entities.search(model, text, k, nprobe=nprobe, ef_search=ef_search)
+    if not hits:
+        return []
+    decoded = [(decode(vid), score) for vid, score in hits]
+    wanted = {ENTITY: [], RELATION: []}
+    for (oid, kind, pos), _ in decoded:
+        wanted[kind].append(Q(ontology_id=oid, position=pos))
+    rows = {}
+    for kind, model_cls in ((ENTITY, Entity), (RELATION, Relation)):
+        if wanted[kind]:
+            for row in model_cls.objects.filter(reduce(or_, wanted[kind])):
+                rows[(row.ontology_id, kind, row.position)] = row
+    results = []
+    for key, score in decoded:
+        row = rows.get(key)
+        if row is None:
+            # the row changed after the index was published
+            continue
+        oid, kind, _ = key
+        if kind == ENTITY:
+            node_ids = [row.data['id']]
+        else:
+            node_ids = [row.data['source'], row.data['target']]
+        results.append({'ontology_id': oid, 'kind': 'entity' if kind == ENTITY else 'relation',
+                        'node_ids': node_ids, 'score': score, 'data': row.data})
+    return results
+
+
+def seeds_by_ontology(hits: List[dict]) -> dict:
+    """`{ontology_id: [node_id, ...]}` from `query()` hits, best first, without repeats."""
+    out = {}
+    for hit in hits:
+        nodes = out.setdefault(hit['ontology_id'], [])
+        for nid in hit['node_ids']:
+            if nid not in nodes:
+                nodes.append(nid)
+    return out
@@ -1,39 +1,498 @@
-from typing import List
+"""Semantic (FAISS) index over Ontology payloads.
 
-"""Lightweight FAISS delegator for the Django backend package.
+Each ontology is embedded with a SentenceTransformer model and stored in an
+`IndexIDMap` keyed by `Ontology.id`, so saving a document re-encodes and
+re-adds just that document (`add_with_ids`) and deleting it calls
+`remove_ids`. The signals queue changed ids as index jobs (see `index_jobs`)
+and `manage.py index_worker` applies them in batches with `apply_changes()`. A full `build_index()` only runs when explicitly asked
+for (`manage.py rebuild_faiss`), when there is no usable index yet, or when
+the configured model no longer matches the index.
 
-This module avoids importing FAISS or heavy ML libraries in the web process.
-It forwards semantic-search queries to the configured remote index service
-(for example the Hugging Face Space) via the `ontologies.remote_index` helper.
+The index is persisted as a versioned bundle (see `index_bundle`) with its
+id map and a manifest, and loaded memory-mapped; processes that did not
+write it pick up a newer published version on their next query.
+`BundledIndex` holds that per-process state and is shared with the
+entity-level index in `entity_index`.
+
+Builds stream rows from the database and keep memory bounded: texts longer
+than `FAISS_CHUNK_CHARS` are split into chunks whose embeddings are
+mean-pooled into the row's vector, chunks are encoded in batches of at most
+`FAISS_ENCODE_BATCH_SIZE` (and `FAISS_BUILD_BUFFER_MB` of buffered text), and
+each batch is added to the index as soon as it is encoded.
+
+The index type is configurable (exact flat search, IVF, HNSW, IVF-PQ; see
+`ann`); trained types are trained on an encoded sample of the corpus.
+
+FAISS and sentence-transformers are imported lazily; without them every
+function is a no-op and `query_top_k` returns [] so callers fall back to
+the lexical scorer. If a remote index service is configured
+(`ontologies.remote_index`) queries are delegated to it instead.
 """
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from . import ann, embedding_cache, generation, index_bundle, payload_codec
+from .models import Ontology
 
 try:
-    # Use absolute import to ensure the linter and runtime can resolve the module
     from .remote_index import query as remote_query, REMOTE_INDEX_URL
 except Exception:
-    # Fallback: provide a dummy delegator if import fails (keeps API stable)
     remote_query = None
     REMOTE_INDEX_URL = None
 
+logger = logging.getLogger(__name__)
 
-def build_index(force: bool = False):
-    """No-op: index is managed remotely."""
-    return
+_model_lock = threading.Lock()
+_model = None
+_model_name = None
 
+_approx_token_re = re.compile(r'\w+|[^\w\s]')
 
-def load_index():
-    """No-op: index is remote."""
-    return
 
+def model_name() -> str:
+    return getattr(settings, 'FAISS_MODEL_NAME', 'all-MiniLM-L6-v2')
 
-def query_top_k(text: str, k: int = 5) -> List[dict]:
-    """Delegate queries to the remote index service.
 
-    Returns an empty list if the remote service is unavailable.
-    """
-    if remote_query is None:
-        return []
+def get_model():
+    """Lazily import and return the SentenceTransformer model."""
+    global _model, _model_name
+    name = model_name()
+    with _model_lock:
+        if _model_name != name:
+            # a failed load is remembered too, so a missing dependency is not
+            # retried on every query
+            _model_name = name
+            try:
+                # import when needed to avoid heavy import at module load
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(name)
+            except Exception:
+                _model = None
+    return _model
+
+
+def _ensure_faiss():
+    """Helper to import faiss and numpy lazily."""
     try:
-        return remote_query(text, k=k)
+        import faiss
+        import numpy as np
+        return faiss, np
     except Exception:
+        return None, None
+
+
+def _encode(model, texts: List[str], cache=None):
+    """Embed `texts` as L2-normalized float32 rows (inner product = cosine)."""
+    faiss, np = _ensure_faiss()
+    if cache is not None:
+        emb = cache.encode(model, texts)
+    else:
+        emb = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+    emb = np.ascontiguousarray(emb, dtype=np.float32)
+    faiss.normalize_L2(emb)
+    return emb
+
+
+def _model_dimension(model) -> int:
+    return int(model.get_sentence_embedding_dimension())
+
+
+def _setting(name: str, default: int) -> int:
+    return int(getattr(settings, name, default))
+
+
+@dataclass
+class BuildStats:
+    """Progress of one build or update; tokens are an approximate word/punctuation count."""
+    rows: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return max(time.monotonic() - self.started, 1e-9)
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.elapsed
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.tokens / self.elapsed
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Split `text` into chunks of at most `max_chars`, preferring whitespace boundaries."""
+    if len(text) <= max_chars:
+        return [text]
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            cut = text.rfind(' ', start + max_chars // 2, end)
+            if cut > start:
+                end = cut
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def _add(index, model, rows: Iterable[Tuple[int, str]],
+         progress: Optional[Callable[[BuildStats], None]] = None) -> BuildStats:
+    """Encode `(vector_id, text)` rows batch by batch and add them as they are produced.
+
+    Each row gets one vector: the normalized sum of its chunks' embeddings.
+    Unchanged texts are served from the embedding cache. `progress` is
+    called with the running stats after every batch.
+    """
+    faiss, np = _ensure_faiss()
+    dim = _model_dimension(model)
+    cache = embedding_cache.for_model(model_name(), dim)
+    max_chunk_chars = max(_setting('FAISS_CHUNK_CHARS', 2000), 1)
+    batch_size = max(_setting('FAISS_ENCODE_BATCH_SIZE', 64), 1)
+    buffer_chars = max(_setting('FAISS_BUILD_BUFFER_MB', 64) * 1024 * 1024, max_chunk_chars)
+    stats = BuildStats()
+
+    ids: List[int] = []
+    texts: List[str] = []
+    owners: List[int] = []
+    buffered = 0
+
+    def flush():
+        nonlocal buffered
+        if not texts:
+            return
+        emb = _encode(model, texts, cache)
+        vectors = np.zeros((len(ids), dim), dtype=np.float32)
+        np.add.at(vectors, np.asarray(owners), emb)
+        faiss.normalize_L2(vectors)
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+        ids.clear()
+        texts.clear()
+        owners.clear()
+        buffered = 0
+        if progress is not None:
+            progress(stats)
+
+    for vid, text in rows:
+        chunks = split_text(text, max_chunk_chars)
+        stats.rows += 1
+        stats.chunks += len(chunks)
+        stats.tokens += len(_approx_token_re.findall(text))
+        if len(chunks) > batch_size:
+            # a very long row is pooled on its own, one batch of chunks at a time
+            flush()
+            vector = np.zeros((1, dim), dtype=np.float32)
+            for start in range(0, len(chunks), batch_size):
+                vector += _encode(model, chunks[start:start + batch_size], cache).sum(axis=0)
+            faiss.normalize_L2(vector)
+            index.add_with_ids(vector, np.asarray([vid], dtype=np.int64))
+            continue
+        if len(texts) + len(chunks) > batch_size or buffered + len(text) > buffer_chars:
+            flush()
+        ids.append(vid)
+        for chunk in chunks:
+            texts.append(chunk)
+            owners.append(len(ids) - 1)
+        buffered += len(text)
+    flush()
+    if cache is not None:
+        try:
+            cache.flush()
+        except Exception:
+            logger.exception('could not persist the embedding cache')
+    return stats
+
+
+class _Collector:
+    """Stands in for an index in `_add` to gather the vectors of a training sample."""
+
+    def __init__(self):
+        self.parts = []
+
+    def add_with_ids(self, vectors, ids):
+        self.parts.append(vectors.copy())
+
+
+class BundledIndex:
+    """An `IndexIDMap` published as an `index_bundle`, as seen by this process."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.RLock()
+        self.index = None
+        # model the index was built with, from the bundle manifest
+        self.model: Optional[str] = None
+        # published bundle version `index` was loaded from or saved as
+        self.version: Optional[str] = None
+        # index type spec (`FAISS_INDEX_FACTORY`) the index was built for and
+        # the FAISS factory string it resolved to
+        self.spec: Optional[str] = None
+        self.factory: Optional[str] = None
+        # whether `index` is memory-mapped (and must be re-read before mutating)
+        self.mmapped = False
+        self.path: Optional[str] = None
+
+    def load(self) -> None:
+        """Load the current published bundle (memory-mapped) if there is one."""
+        faiss, _ = _ensure_faiss()
+        if faiss is None:
+            return
+        bundle = index_bundle.load(self.name)
+        if bundle is None or not ann.is_id_index(bundle.index):
+            return
+        self.index = bundle.index
+        self.model = bundle.manifest.get('model')
+        self.spec = bundle.manifest.get('factory_spec', 'flat')
+        self.factory = bundle.manifest.get('factory', 'Flat')
+        self.version = bundle.version
+        self.path = bundle.path
+        self.mmapped = bundle.mmapped
+
+    def refresh(self) -> None:
+        """Load the index, or switch to a newer version another process published."""
+        if self.index is None or index_bundle.current_version(self.name) != self.version:
+            self.load()
+
+    def current_version(self) -> Optional[str]:
+        """Bundle version the next `search` will use, refreshing first."""
+        with self.lock:
+            self.refresh()
+            return self.version
+
+    def stale(self, model) -> bool:
+        """Whether the index must be rebuilt for `model` and the configured index type."""
+        if self.index is None or self.index.d != _model_dimension(model):
+            return True
+        if self.spec is not None and self.spec != ann.configured_spec():
+            return True
+        return self.model is not None and self.model != model_name()
+
+    def can_update(self, remove_ids) -> bool:
+        """Whether removing `remove_ids` can be done in place (not on HNSW)."""
+        _, np = _ensure_faiss()
+        if ann.supports_remove(self.index) or not len(remove_ids):
+            return True
+        return not np.isin(np.asarray(remove_ids), ann.stored_ids(self.index)).any()
+
+    def _save(self) -> None:
+        try:
+            self.version = index_bundle.publish(
+                self.name, self.index, {'ids': ann.stored_ids(self.index)},
+                model=model_name(), generation=generation.current(),
+                factory=self.factory, factory_spec=self.spec)
+            self.path = os.path.join(index_bundle.root_dir(self.name), self.version)
+        except Exception:
+            logger.exception('could not persist FAISS index bundle %s', self.name)
+
+    def _train(self, index, model, count: int, sample) -> bool:
+        """Train `index` on an encoded corpus sample; False if the corpus is too small."""
+        _, np = _ensure_faiss()
+        size = ann.training_sample_size(index, count)
+        if size < ann.min_training_points(index) or sample is None:
+            return False
+        collector = _Collector()
+        _add(collector, model, sample(size))
+        vectors = np.concatenate(collector.parts) if collector.parts else None
+        if vectors is None or len(vectors) < ann.min_training_points(index):
+            return False
+        index.train(vectors)
+        return True
+
+    def rebuild(self, model, rows: Iterable[Tuple[int, str]], progress=None,
+                count: int = 0, sample=None) -> BuildStats:
+        """Replace the index with a fresh one over `rows` and publish it.
+
+        `count` (corpus size) sizes the preset index types and `sample(n)`
+        yields `n` random rows to train them on.
+        """
+        dim = _model_dimension(model)
+        spec = ann.configured_spec()
+        factory = ann.factory_string(spec, count, dim)
+        index = ann.make_index(dim, factory)
+        if not index.is_trained and not self._train(index, model, count, sample):
+            logger.warning('%s index: %s rows are too few to train %s, using a flat index', self.name, count, factory)
+            factory = 'Flat'
+            index = ann.make_index(dim, factory)
+        stats = _add(index, model, rows, progress)
+        self.index = index
+        self.factory = factory
+        self.spec = spec
+        self.model = model_name()
+        self.mmapped = False
+        self._save()
+        return stats
+
+    def update(self, model, remove, rows: Iterable[Tuple[int, str]]) -> BuildStats:
+        """Remove the ids in `remove`, add `rows` and publish."""
+        faiss, _ = _ensure_faiss()
+        if self.mmapped:
+            # the mapping is read-only, and some types (IVF) cannot be copied
+            # out of it; re-read instead
+            try:
+                self.index = faiss.read_index(os.path.join(self.path, index_bundle.INDEX_FILE))
+            except Exception:
+                self.index = faiss.clone_index(self.index)
+            self.mmapped = False
+        if len(remove):
+            self.index.remove_ids(remove)
+        stats = _add(self.index, model, rows)
+        self._save()
+        return stats
+
+    def search(self, model, text: str, k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None) -> List[Tuple[int, float]]:
+        """`(vector_id, score)` pairs of the `k` nearest rows; [] if unusable."""
+        with self.lock:
+            self.refresh()
+            if self.stale(model) or self.index.ntotal == 0:
+                return []
+            try:
+                params = ann.search_params(self.index, nprobe, ef_search)
+                D, I = self.index.search(_encode(model, [text]), k, params=params)
+            except Exception:
+                return []
+        return [(int(vid), float(score)) for score, vid in zip(D[0], I[0]) if vid >= 0]
+
+    def info(self) -> dict:
+        return {
+            'version': self.version,
+            'model': self.model,
+            'count': int(self.index.ntotal) if self.index is not None else 0,
+            'factory': self.factory,
+            'mmapped': self.mmapped,
+        }
+
+
+_documents = BundledIndex('documents')
+
+
+def _document_rows(ids: Optional[List[int]] = None):
+    qs = Ontology.objects.order_by('id')
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    rows = qs.values_list('id', 'json', 'payload').iterator(chunk_size=_setting('FAISS_BUILD_CHUNK_SIZE', 200))
+    for oid, data, blob in rows:
+        yield oid, json.dumps(payload_codec.resolve(data, blob) or {}, ensure_ascii=False)
+
+
+def _document_sample(n: int):
+    ids = list(Ontology.objects.values_list('id', flat=True))
+    return _document_rows(sorted(random.sample(ids, min(n, len(ids)))))
+
+
+def _rebuild_documents(model, progress=None) -> BuildStats:
+    return _documents.rebuild(model, _document_rows(), progress,
+                              count=Ontology.objects.count(), sample=_document_sample)
+
+
+def build_index(force=False, progress=None) -> Optional[BuildStats]:
+    """Build the FAISS index from every Ontology.
+
+    Without `force` an index that is already loaded (or persisted) and matches
+    the current model is kept as is; changes reach it through
+    `apply_changes()`. Returns the build stats, or None if nothing was built.
+    """
+    model = get_model()
+    faiss, _ = _ensure_faiss()
+    if model is None or faiss is None:
+        # cannot build index in this environment
+        return None
+    with _documents.lock:
+        if not force:
+            _documents.refresh()
+            if not _documents.stale(model):
+                return None
+        return _rebuild_documents(model, progress)
+
+
+def load_index():
+    """Load the current published bundle (memory-mapped) if there is one."""
+    with _documents.lock:
+        _documents.load()
+
+
+def bundle_info() -> dict:
+    """Manifest-level description of the index this process is serving."""
+    return _documents.info()
+
+
+def bundle_version() -> Optional[str]:
+    return _documents.current_version()
+
+
+def ensure_index(background: bool = False):
+    """Make sure a usable index is loaded, building it if not.
+
+    With `background` the build is queued for the index worker instead, so
+    a web process never builds the index itself.
+    """
+    model = get_model()
+    if model is None:
+        return
+    with _documents.lock:
+        _documents.refresh()
+        if not _documents.stale(model):
+            return
+    if background:
+        from . import index_jobs
+        index_jobs.enqueue_rebuild()
+    else:
+        build_index()
+
+
+def apply_changes(ids: Iterable[int]) -> None:
+    """Bring the entries of `ids` in line with the database.
+
+    Ids whose Ontology still exists are re-encoded and replaced; the others
+    are removed. Falls back to a full build when there is no index to patch
+    or the model changed.
+    """
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return
+    model = get_model()
+    faiss, np = _ensure_faiss()
+    if model is None or faiss is None:
+        return
+    with _documents.lock:
+        _documents.refresh()
+        remove = np.asarray(ids, dtype=np.int64)
+        if _documents.stale(model) or not _documents.can_update(remove):
+            _rebuild_documents(model)
+            return
+        _documents.update(model, remove, _document_rows(ids))
+
+
+def query_top_k(text, k=5, nprobe=None, ef_search=None):
+    """Query top-k matching Ontology records by semantic similarity.
+
+    `nprobe`/`ef_search` override the IVF/HNSW search effort for this query.
+    Returns an empty list when no index or model is available, so the web
+    worker never crashes on a missing dependency.
+    """
+    if remote_query is not None:
+        try:
+            return remote_query(text, k=k)
+        except Exception:
+            return []
+
+    model = get_model()
+    faiss, _ = _ensure_faiss()
+    if model is None or faiss is None:
         return []
+    hits = _documents.search(model, text, k, nprobe=nprobe, ef_search=ef_search)
+    objs = Ontology.objects.in_bulk([oid for oid, _ in hits])
+    return [{'id': oid, 'score': score, 'ontology': objs[oid].json}
+            for oid, score in hits if oid in objs]
@@ -0,0 +1,28 @@
+"""Corpus generation counter (see `models.CorpusGeneration`).
+
+The counter lives in the database so every worker process observes the same
+value; `signals` bumps it after each Ontology save or delete.
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CorpusGeneration
+
+_ROW_ID = 1
+
+
+def current() -> int:
+    value = CorpusGeneration.objects.filter(pk=_ROW_ID).values_list('generation', flat=True).first()
+    return value or 0
+
+
+def last_modified():
+    return CorpusGeneration.objects.filter(pk=_ROW_ID).values_list('updated_at', flat=True).first()
+
+
+def bump() -> int:
+    """Atomically increment the generation and return the new value."""
+    updated = CorpusGeneration.objects.filter(pk=_ROW_ID).update(generation=F('generation') + 1, updated_at=timezone.now())
+    if not updated:
+        CorpusGeneration.objects.get_or_create(pk=_ROW_ID, defaults={'generation': 1})
+    return current()
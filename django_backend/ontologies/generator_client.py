@@ -0,0 +1,124 @@
+"""HTTP client for the Ontology-Generator space.
+
+One `GeneratorClient` per configuration is shared by the upload pool. It
+keeps a `requests.Session` whose connection pool (`GENERATOR_POOL_SIZE`
+connections) is reused across uploads, so only the first upload pays for
+the TCP/TLS handshake. Connection errors and 502/503/504 answers are
+retried `GENERATOR_RETRIES` times with exponential backoff
+(`GENERATOR_BACKOFF`), honouring `Retry-After`.
+
+The generator answers on one of several candidate URLs. The client probes
+them in order once and then sends every upload to the one that worked,
+probing again only if that endpoint stops answering 200.
+
+The uploaded file is read from one seekable buffer (rewound per attempt),
+so retries and fallbacks resend the whole body. `attempt_budget()` and
+`budget()` bound how long one endpoint, and a whole `generate()` call, may
+take; upload jobs derive their timeouts from them.
+"""
+import logging
+import threading
+from typing import BinaryIO, Callable, List, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_URL = 'https://huggingface.co/spaces/VivanRajath/Ontology-Generator'
+
+
+def candidate_urls(base_url: str) -> List[str]:
+    base = base_url.rstrip('/')
+    return [base + '/generate', base + '/api/generate', base]
+
+
+class GeneratorClient:
+    def __init__(self, base_url: str, timeout: float = 30.0, connect_timeout: float = 5.0,
+                 retries: int = 2, backoff: float = 0.5, pool_size: int = 4):
+        self.candidates = candidate_urls(base_url)
+        self.timeout = (connect_timeout, timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.endpoint = None
+        self.lock = threading.Lock()
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset({'POST'}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(pool_size, 1), max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _order(self) -> List[str]:
+        with self.lock:
+            remembered = self.endpoint
+        if remembered is None:
+            return list(self.candidates)
+        return [remembered] + [url for url in self.candidates if url != remembered]
+
+    def _remember(self, url: Optional[str]) -> None:
+        with self.lock:
+            self.endpoint = url
+
+    def attempt_budget(self) -> float:
+        """Worst-case seconds spent on one endpoint: every try timing out, plus
+        the backoff sleeps between them (a longer `Retry-After` is not counted)."""
+        connect, read = self.timeout
+        return (self.retries + 1) * (connect + read) + self.backoff * (2 ** self.retries)
+
+    def budget(self) -> float:
+        """Worst-case seconds of one `generate()` call, going through every candidate."""
+        return len(self.candidates) * self.attempt_budget()
+
+    def generate(self, filename: str, fileobj: BinaryIO,
+                 on_attempt: Optional[Callable[[str], None]] = None) -> Optional[dict]:
+        """POST the file to the generator; the parsed answer, or None if no endpoint took it.
+
+        `on_attempt(url)` is called before each endpoint is tried.
+        """
+        for url in self._order():
+            if on_attempt is not None:
+                on_attempt(url)
+            fileobj.seek(0)
+            try:
+                r = self.session.post(url, files={'file': (filename, fileobj)}, timeout=self.timeout)
+            except requests.RequestException as exc:
+                logger.warning('generator endpoint %s failed: %s', url, exc)
+                continue
+            if r.status_code != 200:
+                logger.info('generator endpoint %s answered %s', url, r.status_code)
+                continue
+            self._remember(url)
+            try:
+                return r.json()
+            except ValueError:
+                return {'ontology': r.text}
+        self._remember(None)
+        return None
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def client() -> GeneratorClient:
+    """The shared client for the current settings."""
+    config = (
+        getattr(settings, 'HF_ONTOLOGY_GENERATOR_URL', _DEFAULT_URL),
+        float(getattr(settings, 'GENERATOR_TIMEOUT', 30.0)),
+        float(getattr(settings, 'GENERATOR_CONNECT_TIMEOUT', 5.0)),
+        int(getattr(settings, 'GENERATOR_RETRIES', 2)),
+        float(getattr(settings, 'GENERATOR_BACKOFF', 0.5)),
+        int(getattr(settings, 'GENERATOR_POOL_SIZE', getattr(settings, 'UPLOAD_WORKERS', 2))),
+    )
+    with _lock:
+        shared = _clients.get(config)
+        if shared is None:
+            shared = _clients[config] = GeneratorClient(*config)
+        return shared
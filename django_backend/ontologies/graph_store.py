@@ -0,0 +1,224 @@
+"""Materialized aggregated graph maintained incrementally on write.
+
+`aggregated_graph` used to merge every `Ontology.json` row on each request.
+Instead the merged nodes and deduplicated `(source, target, relation)` edges
+are kept in `GraphNode`/`GraphEdge`, each with a reference count of how many
+ontologies assert it. The `Ontology` signals call `apply()` with the old and
+new payload of a single document, so a delete only drops the entries no other
+ontology still asserts.
+
+Every entry also remembers its representative: the lowest ontology id that
+asserts it and the position inside that document; when it goes away the next
+one is looked up in the `Entity`/`Relation` tables. Reading the store ordered
+by `(first_ontology_id, position)` therefore reproduces the first-seen order
+(and first-seen attributes) of the original per-request merge.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F
+
+from . import normalization
+from .models import Entity, GraphCentrality, GraphEdge, GraphNode, Ontology, Relation
+
+
+def _key(value) -> str:
+    raw = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _new_row(model, key: str, data: dict, **fields):
+    if model is GraphEdge:
+        fields.update(source_key=_key(data['source']), target_key=_key(data['target']))
+    return model(key=key, data=data, **fields)
+
+
+def contributions(form) -> Tuple[Dict[str, Tuple[dict, int]], Dict[str, Tuple[dict, int]]]:
+    """Distinct nodes and edges asserted by one ontology's normalized form.
+
+    `form` is an `Ontology.normalized` value (`None` means absent). Returns
+    two ordered maps of `key -> (normalized dict, position)`, keeping the
+    first occurrence of each key like the original merge did.
+    """
+    nodes: Dict[str, Tuple[dict, int]] = OrderedDict()
+    edges: Dict[str, Tuple[dict, int]] = OrderedDict()
+    if not form:
+        return nodes, edges
+    for pos, nn in form['nodes']:
+        key = _key(nn['id'])
+        if key not in nodes:
+            nodes[key] = (nn, pos)
+    for pos, rr in form['relations']:
+        key = _key([rr['source'], rr['target'], rr['relation']])
+        if key not in edges:
+            edges[key] = (rr, pos)
+    return nodes, edges
+
+
+def _apply_model(model, ontology_id: int, old: Dict[str, Tuple[dict, int]], new: Dict[str, Tuple[dict, int]]) -> Dict[str, dict]:
+    """Move one ontology's contribution for `model` from `old` to `new`.
+
+    Returns `{key: data}` for entries still referenced that lost their
+    representative.
+    """
+    touched = set(old) | set(new)
+    if not touched:
+        return {}
+    rows = {row.key: row for row in model.objects.select_for_update().filter(key__in=touched)}
+    orphans = {}
+    to_create = []
+    for key, (data, pos) in new.items():
+        row = rows.get(key)
+        if key not in old:
+            if row is None:
+                to_create.append(_new_row(model, key, data, ref_count=1, first_ontology_id=ontology_id, position=pos))
+                continue
+            row.ref_count += 1
+            if ontology_id < row.first_ontology_id:
+                row.first_ontology_id, row.position, row.data = ontology_id, pos, data
+            row.save(update_fields=['ref_count', 'first_ontology_id', 'position', 'data'])
+        elif row is not None and row.first_ontology_id == ontology_id and (row.position != pos or row.data != data):
+            row.position, row.data = pos, data
+            row.save(update_fields=['position', 'data'])
+    for key in old:
+        if key in new or key not in rows:
+            continue
+        row = rows[key]
+        if row.ref_count <= 1:
+            row.delete()
+            continue
+        model.objects.filter(pk=row.pk).update(ref_count=F('ref_count') - 1)
+        if row.first_ontology_id == ontology_id:
+            orphans[key] = row.data
+    model.objects.bulk_create(to_create, batch_size=500)
+    return orphans
+
+
+def _reassign(ontology_id: int, node_orphans: Dict[str, dict], edge_orphans: Dict[str, dict]) -> None:
+    """Find the next representative for entries whose representative left.
+
+    The representative is always the lowest asserting ontology id, so the next
+    one is the first matching `Entity`/`Relation` row of a later ontology,
+    found through the indexed columns rather than by decoding JSON.
+    """
+    from .entities import text_key
+
+    if node_orphans:
+        pending = dict(node_orphans)
+        candidates = (Entity.objects
+                      .filter(entity_id__in={text_key(d['id']) for d in pending.values()}, ontology_id__gt=ontology_id)
+                      .order_by('ontology_id', 'position'))
+        for e in candidates.iterator(chunk_size=500):
+            key = _key(e.data['id'])
+            if key in pending:
+                GraphNode.objects.filter(key=key).update(first_ontology_id=e.ontology_id, position=e.position, data=e.data)
+                del pending[key]
+                if not pending:
+                    break
+    if edge_orphans:
+        pending = dict(edge_orphans)
+        candidates = (Relation.objects
+                      .filter(source__in={text_key(d['source']) for d in pending.values()},
+                              target__in={text_key(d['target']) for d in pending.values()},
+                              ontology_id__gt=ontology_id)
+                      .order_by('ontology_id', 'position'))
+        for r in candidates.iterator(chunk_size=500):
+            key = _key([r.data['source'], r.data['target'], r.data['relation']])
+            if key in pending:
+                GraphEdge.objects.filter(key=key).update(first_ontology_id=r.ontology_id, position=r.position, data=r.data)
+                del pending[key]
+                if not pending:
+                    break
+
+
+def apply(ontology_id: int, old_form, new_form) -> None:
+    """Replace the contribution of one ontology (`None` form means absent)."""
+    old_nodes, old_edges = contributions(old_form)
+    new_nodes, new_edges = contributions(new_form)
+    with transaction.atomic():
+        node_orphans = _apply_model(GraphNode, ontology_id, old_nodes, new_nodes)
+        edge_orphans = _apply_model(GraphEdge, ontology_id, old_edges, new_edges)
+        _reassign(ontology_id, node_orphans, edge_orphans)
+
+
+def add_many(ontologies: Iterable[Ontology]) -> None:
+    """Add the contributions of newly created ontologies in one pass (bulk imports).
+
+    Equivalent to `apply(o.id, None, o.normalized)` for each of them, with a few
+    statements per model instead of several per ontology.
+    """
+    found = {GraphNode: OrderedDict(), GraphEdge: OrderedDict()}
+    for o in sorted(ontologies, key=lambda o: o.id):
+        nodes, edges = contributions(normalization.of(o))
+        for model, items in ((GraphNode, nodes), (GraphEdge, edges)):
+            merged = found[model]
+            for key, (data, pos) in items.items():
+                entry = merged.get(key)
+                if entry is None:
+                    merged[key] = [data, pos, o.id, 1]
+                else:
+                    entry[3] += 1
+    with transaction.atomic():
+        for model, merged in found.items():
+            keys = list(merged)
+            changed = []
+            for start in range(0, len(keys), 500):
+                for row in model.objects.select_for_update().filter(key__in=keys[start:start + 500]):
+                    data, pos, ontology_id, count = merged.pop(row.key)
+                    row.ref_count += count
+                    if ontology_id < row.first_ontology_id:
+                        row.first_ontology_id, row.position, row.data = ontology_id, pos, data
+                    changed.append(row)
+            model.objects.bulk_update(changed, ['ref_count', 'first_ontology_id', 'position', 'data'], batch_size=500)
+            model.objects.bulk_create(
+                [_new_row(model, key, data, ref_count=count, first_ontology_id=ontology_id, position=pos)
+                 for key, (data, pos, ontology_id, count) in merged.items()], batch_size=500)
+
+
+def rebuild(ontologies: Optional[Iterable[Ontology]] = None) -> int:
+    """Recompute the whole store from scratch. Returns the number of ontologies read."""
+    if ontologies is None:
+        ontologies = Ontology.objects.only('id', 'normalized').order_by('id').iterator(chunk_size=200)
+    node_rows: Dict[str, GraphNode] = {}
+    edge_rows: Dict[str, GraphEdge] = {}
+    count = 0
+    for o in ontologies:
+        count += 1
+        nodes, edges = contributions(normalization.of(o))
+        for rows, model, found in ((node_rows, GraphNode, nodes), (edge_rows, GraphEdge, edges)):
+            for key, (data, pos) in found.items():
+                row = rows.get(key)
+                if row is None:
+                    rows[key] = _new_row(model, key, data, ref_count=1, first_ontology_id=o.id, position=pos)
+                else:
+                    row.ref_count += 1
+    with transaction.atomic():
+        GraphNode.objects.all().delete()
+        GraphEdge.objects.all().delete()
+        # the new rows carry no centrality scores; have the worker recompute them
+        GraphCentrality.objects.all().delete()
+        GraphNode.objects.bulk_create(node_rows.values(), batch_size=500)
+        GraphEdge.objects.bulk_create(edge_rows.values(), batch_size=500)
+    return count
+
+
+def _ordered(model, chunk_size: Optional[int]) -> Iterable[dict]:
+    qs = model.objects.order_by('first_ontology_id', 'position').values_list('data', flat=True)
+    return qs.iterator(chunk_size=chunk_size) if chunk_size else qs
+
+
+def node_count() -> int:
+    return GraphNode.objects.count()
+
+
+def nodes(chunk_size: Optional[int] = None) -> Iterable[dict]:
+    """Merged nodes in first-seen order; streamed from the DB when `chunk_size` is set."""
+    return _ordered(GraphNode, chunk_size)
+
+
+def relations(chunk_size: Optional[int] = None) -> Iterable[dict]:
+    """Deduplicated relations in first-seen order; streamed when `chunk_size` is set."""
+    return _ordered(GraphEdge, chunk_size)
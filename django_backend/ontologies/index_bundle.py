@@ -0,0 +1,239 @@
+"""Versioned, self-describing on-disk bundles for FAISS indexes.
+
+A bundle is a directory holding the FAISS index, its id map (and any other
+row-aligned arrays) as `.npy` files and a `manifest.json` recording the
+embedding model, dimension, corpus generation and a SHA-256 checksum of the
+data files:
+
+    <FAISS_INDEX_DIR>/<name>/CURRENT          -> "v000000000042-0000000007"
+    <FAISS_INDEX_DIR>/<name>/v000000000042-0000000007/
+        index.faiss
+        ids.npy
+        manifest.json
+
+A version is the corpus generation plus a per-index publish sequence number,
+so versions of the same generation still sort in publish order.
+
+`publish()` writes a new version next to the old ones and then swaps the
+`CURRENT` pointer with an atomic rename, so readers never see a partial
+bundle. `load()` maps the index in place (`IO_FLAG_MMAP_IFC`: the codes stay
+in the file's pages; plain `IO_FLAG_MMAP` still copies Flat and HNSW codes
+onto the heap) and memory-maps the arrays, so a cold start does not copy the
+index into the heap and several worker processes share one copy in the page
+cache. Index types that cannot be mapped in place are read normally.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+INDEX_FILE = 'index.faiss'
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+# `v<generation>-<sequence>`; older bundles were `v<generation>-<random hex>`
+_VERSION_RE = re.compile(r'v\d{12}-(\d{10})')
+
+
+@dataclass
+class Bundle:
+    version: str
+    path: str
+    index: object
+    arrays: Dict[str, object]
+    manifest: dict
+    # whether `index` is mapped read-only from the bundle file
+    mmapped: bool = False
+
+    @property
+    def ids(self):
+        return self.arrays['ids']
+
+
+def _ensure_faiss():
+    """Helper to import faiss and numpy lazily."""
+    try:
+        import faiss
+        import numpy as np
+        return faiss, np
+    except Exception:
+        return None, None
+
+
+def root_dir(name: str) -> str:
+    base = getattr(settings, 'FAISS_INDEX_DIR', None) or os.path.join(settings.BASE_DIR, 'faiss_index')
+    return os.path.join(os.path.abspath(base), name)
+
+
+def _checksum(path: str, files) -> str:
+    digest = hashlib.sha256()
+    for fname in sorted(files):
+        with open(os.path.join(path, fname), 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def current_version(name: str) -> Optional[str]:
+    """Version directory `CURRENT` points at, or None if nothing was published."""
+    try:
+        with open(os.path.join(root_dir(name), CURRENT_FILE), encoding='utf-8') as fh:
+            return fh.read().strip() or None
+    except OSError:
+        return None
+
+
+def _sequence(version: str) -> int:
+    match = _VERSION_RE.fullmatch(version)
+    return int(match.group(1)) if match else -1
+
+
+def _versions(root: str):
+    """Published versions under `root`, oldest first."""
+    return sorted((d for d in os.listdir(root) if d.startswith('v')), key=lambda d: (_sequence(d), d))
+
+
+def _write_manifest(path: str, manifest: dict) -> None:
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+
+
+def publish(name: str, index, arrays: Dict[str, object], *, model: str, generation: int, **meta) -> str:
+    """Write `index` and `arrays` (must include `ids`) as a new version and make it current."""
+    faiss, np = _ensure_faiss()
+    root = root_dir(name)
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f'.tmp-{uuid.uuid4().hex}')
+    os.makedirs(tmp)
+    try:
+        faiss.write_index(index, os.path.join(tmp, INDEX_FILE))
+        files = [INDEX_FILE]
+        for key in sorted(arrays):
+            fname = f'{key}.npy'
+            np.save(os.path.join(tmp, fname), np.asarray(arrays[key]), allow_pickle=False)
+            files.append(fname)
+        manifest = dict(meta)
+        manifest.update({
+            'format': FORMAT_VERSION,
+            'name': name,
+            'model': model,
+            'dimension': int(index.d),
+            'count': int(index.ntotal),
+            'generation': int(generation),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'arrays': sorted(arrays),
+            'files': {f: os.path.getsize(os.path.join(tmp, f)) for f in files},
+            'checksum': {'algorithm': 'sha256', 'value': _checksum(tmp, files)},
+        })
+        while True:
+            versions = _versions(root)
+            sequence = _sequence(versions[-1]) + 1 if versions else 0
+            version = f'v{int(generation):012d}-{sequence:010d}'
+            manifest['version'] = version
+            _write_manifest(tmp, manifest)
+            try:
+                os.rename(tmp, os.path.join(root, version))
+                break
+            except OSError:
+                # another process published this sequence number first
+                if not os.path.isdir(os.path.join(root, version)):
+                    raise
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(root, f'.{CURRENT_FILE}-{version}')
+    with open(pointer, 'w', encoding='utf-8') as fh:
+        fh.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+    _prune(root, version)
+    return version
+
+
+def _prune(root: str, current: str) -> None:
+    """Keep the newest `FAISS_BUNDLE_KEEP` versions, by publish sequence.
+
+    Removing a directory another process still has mapped is safe on POSIX:
+    the pages stay valid until that process unmaps them.
+    """
+    keep = max(int(getattr(settings, 'FAISS_BUNDLE_KEEP', 2)), 1)
+    versions = [d for d in _versions(root) if d != current]
+    for old in versions[:max(len(versions) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def verify(path: str, manifest: dict) -> bool:
+    """Whether the data files under `path` match the manifest's sizes and checksum."""
+    files = manifest.get('files') or {}
+    try:
+        if any(os.path.getsize(os.path.join(path, f)) != size for f, size in files.items()):
+            return False
+        return _checksum(path, list(files)) == manifest['checksum']['value']
+    except (OSError, KeyError, TypeError):
+        return False
+
+
+def load(name: str, mmap: bool = True, verify_checksum: Optional[bool] = None) -> Optional[Bundle]:
+    """Load the current bundle of `name`, or None if there is none or it is unusable.
+
+    File sizes are always checked against the manifest; the full checksum is
+    only verified with `verify_checksum` (default: the `FAISS_VERIFY_BUNDLE`
+    setting), since it reads every byte and defeats the cheap mmap start-up.
+    """
+    faiss, np = _ensure_faiss()
+    if faiss is None:
+        return None
+    version = current_version(name)
+    if version is None:
+        return None
+    path = os.path.join(root_dir(name), version)
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        logger.exception('unreadable manifest for index bundle %s/%s', name, version)
+        return None
+    if manifest.get('format') != FORMAT_VERSION:
+        logger.warning('index bundle %s/%s has format %s, expected %s', name, version, manifest.get('format'), FORMAT_VERSION)
+        return None
+    if verify_checksum is None:
+        verify_checksum = getattr(settings, 'FAISS_VERIFY_BUNDLE', False)
+    files = manifest.get('files') or {}
+    try:
+        sizes_ok = all(os.path.getsize(os.path.join(path, f)) == size for f, size in files.items())
+    except OSError:
+        sizes_ok = False
+    if not sizes_ok or (verify_checksum and not verify(path, manifest)):
+        logger.error('index bundle %s/%s does not match its manifest', name, version)
+        return None
+    index_path = os.path.join(path, INDEX_FILE)
+    index, mapped = None, False
+    if mmap:
+        try:
+            index = faiss.read_index(index_path, getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP))
+            mapped = True
+        except Exception:
+            logger.info('index bundle %s/%s cannot be mapped in place; reading it', name, version)
+    try:
+        if index is None:
+            index = faiss.read_index(index_path)
+        arrays = {key: np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+                  for key in manifest.get('arrays', [])}
+    except Exception:
+        logger.exception('could not read index bundle %s/%s', name, version)
+        return None
+    if 'ids' not in arrays or len(arrays['ids']) != index.ntotal:
+        logger.error('index bundle %s/%s id map does not match the index', name, version)
+        return None
+    return Bundle(version=version, path=path, index=index, arrays=arrays, manifest=manifest, mmapped=mapped)
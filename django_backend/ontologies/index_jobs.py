@@ -0,0 +1,148 @@
+"""Durable queue of FAISS index work (see `models.IndexJob`).
+
+Web processes never touch the FAISS indexes. The signals `enqueue()` the
+ontology that changed, and `manage.py index_worker` claims due jobs in
+batches and applies them with `faiss_index.apply_changes()` and
+`entity_index.apply_changes()`, publishing new index bundles that the web
+processes pick up on their next query.
+
+Jobs coalesce: there is at most one row per ontology and one full rebuild
+row, so a burst of saves to the same document is applied once. A row that is
+re-enqueued while a worker applies it is kept (its `enqueued_at` moved) and
+applied again by the next batch. Claims use `SELECT ... FOR UPDATE SKIP
+LOCKED` where the database supports it, so several workers never take the
+same job; since every worker writes the same bundles, run one worker per
+`FAISS_INDEX_DIR`. Failed jobs are retried with exponential backoff.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import IndexJob
+
+logger = logging.getLogger(__name__)
+
+REBUILD_KEY = 'rebuild'
+_MAX_BACKOFF_SECONDS = 300
+
+
+def _key(ontology_id: int) -> str:
+    return f'ontology:{int(ontology_id)}'
+
+
+def worker_name() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _upsert(key: str, ontology_id=None, touch: bool = True) -> None:
+    now = timezone.now()
+    if touch and IndexJob.objects.filter(key=key).update(enqueued_at=now, not_before=now):
+        return
+    try:
+        with transaction.atomic():
+            IndexJob.objects.create(key=key, ontology_id=ontology_id, enqueued_at=now, not_before=now)
+    except IntegrityError:
+        # created concurrently; that row already covers this request
+        pass
+
+
+def enqueue(ontology_id: int) -> None:
+    """Ask the worker to bring one ontology's index entries in line with the database."""
+    _upsert(_key(ontology_id), ontology_id)
+
+
+def enqueue_many(ontology_ids: Iterable[int], batch_size: int = 1000) -> None:
+    """`enqueue()` many ontologies with a few bulk statements (bulk imports)."""
+    ids = sorted({int(i) for i in ontology_ids})
+    now = timezone.now()
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        keys = [_key(i) for i in chunk]
+        IndexJob.objects.filter(key__in=keys).update(enqueued_at=now, not_before=now)
+        IndexJob.objects.bulk_create(
+            [IndexJob(key=key, ontology_id=i, enqueued_at=now, not_before=now) for key, i in zip(keys, chunk)],
+            ignore_conflicts=True)
+
+
+def enqueue_rebuild() -> None:
+    """Ask the worker to build the indexes if they are missing or stale."""
+    _upsert(REBUILD_KEY, touch=False)
+
+
+def claim(limit: int, worker: str) -> List[IndexJob]:
+    """Claim up to `limit` due jobs (oldest first) for `worker`."""
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'INDEX_JOB_LEASE_SECONDS', 600))
+    with transaction.atomic():
+        jobs = list(
+            IndexJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - lease), not_before__lte=now)
+            .order_by('enqueued_at')[:limit]
+        )
+        if jobs:
+            IndexJob.objects.filter(pk__in=[job.pk for job in jobs]).update(claimed_by=worker, claimed_at=now)
+    return jobs
+
+
+def complete(jobs: List[IndexJob], worker: str) -> None:
+    """Drop applied jobs; release the ones re-enqueued while they were applied."""
+    with transaction.atomic():
+        for job in jobs:
+            IndexJob.objects.filter(pk=job.pk, enqueued_at=job.enqueued_at).delete()
+        IndexJob.objects.filter(pk__in=[job.pk for job in jobs], claimed_by=worker).update(
+            claimed_by='', claimed_at=None, attempts=0, last_error='')
+
+
+def fail(jobs: List[IndexJob], worker: str, error: str) -> None:
+    """Release failed jobs for a retry after an exponential backoff."""
+    attempts = max(job.attempts for job in jobs) + 1
+    delay = min(2 ** attempts, _MAX_BACKOFF_SECONDS)
+    IndexJob.objects.filter(pk__in=[job.pk for job in jobs], claimed_by=worker).update(
+        claimed_by='', claimed_at=None, attempts=F('attempts') + 1, last_error=error[:2000],
+        not_before=timezone.now() + timedelta(seconds=delay))
+
+
+def apply(jobs: List[IndexJob]) -> None:
+    """Apply claimed jobs to the document and entity indexes."""
+    from . import entity_index, faiss_index
+
+    if any(job.key == REBUILD_KEY for job in jobs):
+        faiss_index.build_index()
+        entity_index.build_index()
+    ids = [job.ontology_id for job in jobs if job.ontology_id is not None]
+    if ids:
+        faiss_index.apply_changes(ids)
+        entity_index.apply_changes(ids)
+
+
+def run_batch(limit: int, worker: str) -> int:
+    """Claim, apply and settle one batch; returns the number of jobs claimed."""
+    jobs = claim(limit, worker)
+    if not jobs:
+        return 0
+    try:
+        apply(jobs)
+    except Exception as exc:
+        logger.exception('index jobs failed: %s', [job.key for job in jobs])
+        fail(jobs, worker, f'{type(exc).__name__}: {exc}')
+    else:
+        complete(jobs, worker)
+    return len(jobs)
+
+
+def stats() -> dict:
+    now = timezone.now()
+    oldest = IndexJob.objects.order_by('enqueued_at').values_list('enqueued_at', flat=True).first()
+    return {
+        'pending': IndexJob.objects.count(),
+        'claimed': IndexJob.objects.filter(claimed_at__isnull=False).count(),
+        'failing': IndexJob.objects.filter(attempts__gt=0).count(),
+        'oldest_age_s': (now - oldest).total_seconds() if oldest else 0.0,
+    }
@@ -0,0 +1,80 @@
+"""Lightweight local semantic helpers (dependency-free).
+
+These were originally defined inline in `views.py`; they live here so the
+search index and the signal handlers can share the exact same tokenization
+and field weighting without importing the DRF views.
+"""
+import re
+from typing import Dict, List, Tuple
+
+_token_re = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str):
+    return _token_re.findall((text or '').lower())
+
+
+def _collect_text(obj, depth: int = 0) -> List[Tuple[str, float]]:
+    texts: List[Tuple[str, float]] = []
+    if obj is None:
+        return texts
+    if isinstance(obj, str):
+        texts.append((obj, max(1.0, 3.0 - depth * 0.3)))
+        return texts
+    if isinstance(obj, (int, float, bool)):
+        texts.append((str(obj), 1.0))
+        return texts
+    if isinstance(obj, list):
+        for item in obj:
+            texts.extend(_collect_text(item, depth + 1))
+        return texts
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            key_low = str(k).lower()
+            key_weight = 1.0
+            if any(x in key_low for x in ('label', 'name', 'title', 'desc', 'summary')):
+                key_weight = 2.5
+            if isinstance(v, (str, int, float, bool)):
+                texts.append((str(v), key_weight))
+            else:
+                for t, w in _collect_text(v, depth + 1):
+                    texts.append((t, w * key_weight))
+        return texts
+    try:
+        s = str(obj)
+        texts.append((s, 1.0))
+    except Exception:
+        pass
+    return texts
+
+
+def _token_weights(doc_obj) -> Dict[str, float]:
+    """Accumulate `_collect_text` weights per token.
+
+    The returned dict preserves first-occurrence order, which the inverted
+    index relies on to reproduce the legacy floating point sums exactly.
+    """
+    token_weights: Dict[str, float] = {}
+    for text, weight in _collect_text(doc_obj):
+        for t in _tokens(text):
+            token_weights[t] = token_weights.get(t, 0.0) + float(weight)
+    return token_weights
+
+
+def _score_query_against_doc(query: str, doc_obj: dict) -> float:
+    q_tokens = set(_tokens(query))
+    if not q_tokens:
+        return 0.0
+    token_weights = _token_weights(doc_obj)
+    if not token_weights:
+        return 0.0
+    intersect = 0.0
+    doc_sum = 0.0
+    for t, w in token_weights.items():
+        doc_sum += w
+        if t in q_tokens:
+            intersect += w
+    if doc_sum <= 0:
+        return 0.0
+    score = intersect / (doc_sum + len(q_tokens))
+    return float(score)
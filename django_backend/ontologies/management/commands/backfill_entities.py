@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ...entities import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Load the normalized Entity/Relation tables from existing Ontology records'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Entities and relations loaded from {count} ontologies'))
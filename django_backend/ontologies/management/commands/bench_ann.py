@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import ann, synthetic
+
+# (index spec, search effort values to sweep)
+_DEFAULT_CONFIGS = ['flat', 'ivf:1,8,32', 'hnsw:16,64,128', 'ivfpq:8,32']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark recall@k, latency and memory of the FAISS index types on synthetic embeddings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=100000, help='vectors in the corpus')
+        parser.add_argument('--dim', type=int, default=384)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--configs', nargs='+', default=_DEFAULT_CONFIGS,
+                            help='SPEC[:EFFORT,...] where SPEC is a preset or factory string and EFFORT '
+                                 'is nprobe (IVF) or efSearch (HNSW)')
+
+    def handle(self, *args, **options):
+        faiss, np = ann._ensure_faiss()
+        if faiss is None:
+            raise CommandError('faiss and numpy are required for this benchmark')
+        n, dim, k = options['n'], options['dim'], options['k']
+        data = synthetic.embeddings(n, dim, seed=options['seed'])
+        queries = synthetic.embeddings(options['queries'], dim, seed=options['seed'])
+        queries = data[np.random.default_rng(options['seed'] + 1).integers(0, n, len(queries))] * 0.5 + queries * 0.5
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        ids = np.arange(n, dtype=np.int64)
+
+        exact = ann.make_index(dim, 'Flat')
+        exact.add_with_ids(data, ids)
+        _, truth = exact.search(queries, k)
+
+        self.stdout.write(f"{'index':>22} {'effort':>7} {'build s':>8} {'MB':>8} "
+                          f"{'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for config in options['configs']:
+            spec, _, efforts = config.partition(':')
+            factory = ann.factory_string(spec, n, dim)
+            start = time.perf_counter()
+            index = ann.make_index(dim, factory)
+            sample = ann.training_sample_size(index, n)
+            if sample:
+                index.train(data[np.random.default_rng(options['seed']).choice(n, sample, replace=False)])
+            index.add_with_ids(data, ids)
+            build = time.perf_counter() - start
+            size_mb = len(faiss.serialize_index(index)) / (1024 * 1024)
+            for effort in ([int(e) for e in efforts.split(',') if e] or [None]):
+                params = ann.search_params(index, nprobe=effort, ef_search=effort)
+                latencies = []
+                found = np.empty_like(truth)
+                for i, q in enumerate(queries):
+                    t = time.perf_counter()
+                    _, found[i] = index.search(q[None, :], k, params=params)
+                    latencies.append((time.perf_counter() - t) * 1000)
+                recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+                p50, p99 = np.percentile(latencies, [50, 99])
+                self.stdout.write(f"{factory:>22} {effort if effort else '-':>7} {build:>8.2f} {size_mb:>8.1f} "
+                                  f"{recall:>9.3f} {p50:>8.3f} {p99:>8.3f}")
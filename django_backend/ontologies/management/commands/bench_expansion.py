@@ -0,0 +1,87 @@
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand
+
+from ... import normalization, synthetic
+from ...components import ComponentIndex, components_of
+
+
+def _format(payloads):
+    """Entities and relationships the way remote_query assembles them."""
+    entities, relationships = [], []
+    seen_entities, seen_relationships = set(), set()
+    for data in payloads:
+        for node in data['nodes']:
+            if node['id'] not in seen_entities:
+                seen_entities.add(node['id'])
+                entities.append({'id': node['id']})
+        for rel in data['relations']:
+            key = (rel['source'], rel['target'], rel['relation'])
+            if key not in seen_relationships:
+                seen_relationships.add(key)
+                relationships.append({'source': rel['source'], 'target': rel['target'], 'type': rel['relation']})
+    return entities, relationships
+
+
+def _bfs_per_entity(entities, relationships):
+    """The previous expansion: a DiGraph per request and a BFS per entity."""
+    import networkx as nx
+
+    G = nx.DiGraph()
+    for e in entities:
+        G.add_node(e['id'], **e)
+    for r in relationships:
+        G.add_edge(r['source'], r['target'], **r)
+    connected = set()
+    for e in entities:
+        queue = deque([e['id']])
+        while queue:
+            node = queue.popleft()
+            if node not in connected:
+                connected.add(node)
+                if node in G:
+                    queue.extend(list(G.neighbors(node)))
+    return ([e for e in entities if e['id'] in connected],
+            [r for r in relationships if r['source'] in connected and r['target'] in connected])
+
+
+def _component_lookup(index, entities, relationships):
+    hit = components_of(index, (e['id'] for e in entities))
+    return entities, [r for r in relationships
+                      if index.component(r['source']) in hit and index.component(r['target']) in hit]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark connected-entity expansion: per-entity BFS vs union-find component lookup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edges', type=int, default=50000, help='total relations in the synthetic corpus')
+        parser.add_argument('--hit-fraction', type=float, default=1.0,
+                            help='share of the corpus returned as the query result set')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        edges_per_doc = 16
+        docs = list(synthetic.ontologies(max(1, options['edges'] // edges_per_doc), edges_per_doc=edges_per_doc))
+        hits = docs[:max(1, int(len(docs) * options['hit_fraction']))]
+        entities, relationships = _format(hits)
+        self.stdout.write(f'corpus: {len(docs)} ontologies, {len(docs) * edges_per_doc} relations; '
+                          f'result set: {len(entities)} entities, {len(relationships)} relationships')
+
+        start = time.perf_counter()
+        index = ComponentIndex()
+        for data in docs:
+            index.add_form(normalization.canonical(data))
+        self.stdout.write(f'union-find built incrementally in {time.perf_counter() - start:.3f}s (once per corpus change)')
+
+        for name, fn in (('bfs per entity', lambda: _bfs_per_entity(entities, relationships)),
+                         ('component lookup', lambda: _component_lookup(index, entities, relationships))):
+            best = None
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                out_entities, out_relationships = fn()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(f'{name:>18}: {best * 1000:9.1f} ms/request '
+                              f'({len(out_entities)} entities, {len(out_relationships)} relationships)')
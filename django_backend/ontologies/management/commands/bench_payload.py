@@ -0,0 +1,48 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from ... import payload_codec, synthetic
+
+
+class Command(BaseCommand):
+    help = 'Compare stored size and decode time of plain JSONField payloads against compressed blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, default=2000)
+        parser.add_argument('--nodes', type=int, default=40)
+        parser.add_argument('--edges', type=int, default=60)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def _time(self, fn, items, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for item in items:
+                fn(item)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best / len(items) * 1e6
+
+    def handle(self, *args, **options):
+        docs = list(synthetic.ontologies(options['docs'], nodes_per_doc=options['nodes'],
+                                         edges_per_doc=options['edges']))
+        # what the JSONField stores (json.dumps with default separators) and decodes
+        plain = [json.dumps(d) for d in docs]
+        plain_bytes = sum(len(s.encode()) for s in plain)
+        self.stdout.write(f"{'storage':>14} {'bytes/doc':>10} {'ratio':>7} {'decode us/doc':>14} {'encode us/doc':>14}")
+        self.stdout.write(f"{'jsonfield':>14} {plain_bytes / len(docs):>10.0f} {1.0:>7.2f} "
+                          f"{self._time(json.loads, plain, options['repeat']):>14.1f} "
+                          f"{self._time(json.dumps, docs, options['repeat']):>14.1f}")
+
+        codecs = ['zlib'] + (['zstd'] if payload_codec._ensure_zstd() else [])
+        formats = ['json'] + (['msgpack'] if payload_codec._ensure_msgpack() else [])
+        for codec in codecs:
+            for fmt in formats:
+                blobs = [payload_codec.encode(d, codec, fmt) for d in docs]
+                size = sum(len(b) for b in blobs)
+                decode_us = self._time(payload_codec.decode, blobs, options['repeat'])
+                encode_us = self._time(lambda d: payload_codec.encode(d, codec, fmt), docs, options['repeat'])
+                self.stdout.write(f"{codec + '+' + fmt:>14} {size / len(docs):>10.0f} {plain_bytes / size:>7.2f} "
+                                  f"{decode_us:>14.1f} {encode_us:>14.1f}")
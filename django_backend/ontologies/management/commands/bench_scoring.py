@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import synthetic
+from ...lexical import _score_query_against_doc, _token_weights
+from ...scoring import SPARSE_SCORERS, SparseCorpus, _ensure_scipy
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the legacy per-document scorer against the sparse BM25/TF-IDF engines on synthetic corpora'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+        parser.add_argument('--queries', type=int, default=5)
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--skip-legacy-above', type=int, default=None,
+                            help='do not time the legacy scorer for corpora larger than this')
+
+    def handle(self, *args, **options):
+        np, _ = _ensure_scipy()
+        if np is None:
+            raise CommandError('numpy and scipy are required for this benchmark')
+        queries = synthetic.queries(options['queries'])
+        k = options['k']
+        self.stdout.write(f"{'docs':>8} {'scorer':>8} {'build s':>10} {'ms/query':>10}")
+        for size in options['sizes']:
+            docs = list(enumerate(synthetic.ontologies(size)))
+
+            skip = options['skip_legacy_above']
+            if skip is None or size <= skip:
+                start = time.perf_counter()
+                for q in queries:
+                    scored = [(oid, _score_query_against_doc(q, doc)) for oid, doc in docs]
+                    sorted((s for s in scored if s[1] > 0), key=lambda x: x[1], reverse=True)[:k]
+                per_query = (time.perf_counter() - start) / len(queries) * 1000
+                self.stdout.write(f"{size:>8} {'legacy':>8} {'-':>10} {per_query:>10.2f}")
+
+            start = time.perf_counter()
+            corpus = SparseCorpus.from_token_weights((oid, _token_weights(doc)) for oid, doc in docs)
+            corpus_time = time.perf_counter() - start
+            for name, cls in SPARSE_SCORERS.items():
+                start = time.perf_counter()
+                scorer = cls(corpus)
+                build = corpus_time + time.perf_counter() - start
+                start = time.perf_counter()
+                for q in queries:
+                    scorer.top_k(q, k)
+                per_query = (time.perf_counter() - start) / len(queries) * 1000
+                self.stdout.write(f"{size:>8} {name:>8} {build:>10.2f} {per_query:>10.2f}")
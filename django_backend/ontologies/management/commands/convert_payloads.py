@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Ontology
+from ...payload_codec import convert_rows, storage_mode
+
+
+class Command(BaseCommand):
+    help = 'Rewrite stored Ontology payloads as plain JSON or compressed blobs (default: ONTOLOGY_PAYLOAD_STORAGE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=['json', 'compressed'], default=None)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        to = options['to'] or storage_mode()
+        count = convert_rows(Ontology, to, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} ontologies converted to {to} storage'))
@@ -0,0 +1,61 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from ... import resolution, synthetic
+
+
+def _pair_scores(labels, truth):
+    """Pairwise precision and recall of `labels` against the true entities."""
+    def pairs(counts):
+        return sum(c * (c - 1) // 2 for c in counts.values())
+
+    found = pairs(Counter(labels))
+    expected = pairs(Counter(truth))
+    correct = pairs(Counter(zip(labels, truth)))
+    return (correct / found if found else 1.0), (correct / expected if expected else 1.0)
+
+
+class Command(BaseCommand):
+    help = 'Cluster the stored entity aliases (or a synthetic corpus) and report cluster sizes and runtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='cluster this many generated names instead of the stored aliases')
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='3-gram Jaccard similarity for MinHash candidates (ENTITY_RESOLUTION_THRESHOLD)')
+        parser.add_argument('--max-bucket', type=int, default=None,
+                            help='skip LSH buckets larger than this (ENTITY_RESOLUTION_MAX_BUCKET)')
+        parser.add_argument('--top', type=int, default=10, help='largest clusters to list')
+        parser.add_argument('--apply', action='store_true',
+                            help='store the new canonical ids and re-normalize the corpus in the background')
+
+    def handle(self, *args, **options):
+        cluster_options = {'threshold': options['threshold'], 'max_bucket': options['max_bucket'],
+                           'top': options['top']}
+        truth = None
+        if options['synthetic']:
+            names, truth = synthetic.entity_names(options['synthetic'])
+            labels, report = resolution.cluster(names, **cluster_options)
+        else:
+            report = resolution.recluster(apply=options['apply'], **cluster_options)
+
+        self.stdout.write(f'{report.names} names -> {report.clusters} clusters '
+                          f'({report.merged_names} names merged into another)')
+        share = report.pairs_compared / report.all_pairs if report.all_pairs else 0.0
+        self.stdout.write(f'compared {report.pairs_compared} candidate pairs of {report.all_pairs} '
+                          f'({share:.4%}), {report.pairs_matched} matched; '
+                          f'{report.oversized_buckets} oversized LSH buckets skipped')
+        self.stdout.write('cluster sizes: ' + ', '.join(f'{size}: {count}' for size, count in report.sizes.items()))
+        self.stdout.write('timings: ' + ', '.join(f'{name} {seconds:.3f}s' for name, seconds in report.timings.items()))
+        if truth is not None:
+            precision, recall = _pair_scores(labels, truth)
+            self.stdout.write(f'pairwise precision {precision:.3f}, recall {recall:.3f} '
+                              f'({len(set(truth))} true entities)')
+        for members in report.largest:
+            shown = ', '.join(repr(m) for m in members[:8])
+            more = f' (+{len(members) - 8} more)' if len(members) > 8 else ''
+            self.stdout.write(f'  {len(members):>4}  {shown}{more}')
+        if options['apply'] and not options['synthetic']:
+            self.stdout.write(self.style.SUCCESS(
+                f'{report.applied} aliases moved to another canonical id; the index worker re-normalizes the corpus'))
@@ -0,0 +1,41 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...bulk_import import load
+
+
+class Command(BaseCommand):
+    help = 'Import ontologies from NDJSON files or JSON arrays of {filename, source, ontology} records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Files to import ('-' reads stdin)")
+        parser.add_argument('--format', choices=['auto', 'ndjson', 'json'], default='auto')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'IMPORT_BATCH_SIZE', 500))
+        parser.add_argument('--source', default='', help='source for records that do not set one')
+        parser.add_argument('--show-errors', type=int, default=20, help='Rejected lines to print per file')
+
+    def handle(self, *args, **options):
+        def progress(report):
+            self.stdout.write(f'  {report.created} rows ({report.rows_per_s:.0f} rows/s), {report.rejected} rejected')
+
+        total_created = total_rejected = 0
+        for path in options['paths']:
+            try:
+                stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+            except OSError as exc:
+                raise CommandError(f'cannot read {path}: {exc}')
+            try:
+                report = load(stream, fmt=options['format'], batch_size=options['batch_size'],
+                              source=options['source'], progress=progress)
+            finally:
+                if stream is not sys.stdin.buffer:
+                    stream.close()
+            total_created += report.created
+            total_rejected += report.rejected
+            self.stdout.write(f'{path}: {report.created} rows in {report.elapsed:.1f}s '
+                              f'({report.rows_per_s:.0f} rows/s), {report.rejected} rejected')
+            for error in report.errors[:options['show_errors']]:
+                self.stdout.write(self.style.WARNING(f"  line {error['line']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(f'Imported {total_created} ontologies, rejected {total_rejected} lines'))
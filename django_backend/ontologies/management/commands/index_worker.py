@@ -0,0 +1,88 @@
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ... import centrality, entity_index, index_jobs, normalization
+from ...faiss_index import build_index
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Apply queued FAISS index jobs in batches until stopped (run one worker per index directory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'INDEX_WORKER_BATCH_SIZE', 100),
+                            help='Jobs claimed and applied together')
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'INDEX_WORKER_POLL_SECONDS', 2.0),
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+
+    def handle(self, *args, **options):
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+
+        previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            self._run(options, stopping)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def _run(self, options, stopping):
+        worker = index_jobs.worker_name()
+        self.stdout.write(f'index worker {worker} started')
+        # build the indexes up front if there are none yet (or the model changed)
+        build_index()
+        entity_index.build_index()
+        self._renormalize()
+        self._refresh_centrality()
+
+        applied = 0
+        while not stopping:
+            started = time.monotonic()
+            claimed = index_jobs.run_batch(options['batch_size'], worker)
+            if claimed:
+                applied += claimed
+                self.stdout.write(f'applied {claimed} index jobs in {time.monotonic() - started:.2f}s')
+                continue
+            if options['once']:
+                break
+            # drop connections the database closed while the worker was idle
+            close_old_connections()
+            if self._renormalize():
+                continue
+            self._refresh_centrality()
+            time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f'index worker {worker} stopped after {applied} jobs'))
+
+    def _renormalize(self) -> int:
+        """Bring rows normalized by other rules up to date (after a rules change)."""
+        if not normalization.stale().exists():
+            return 0
+        started = time.monotonic()
+        try:
+            count = normalization.renormalize()
+        except Exception:
+            logger.exception('re-normalization failed')
+            return 0
+        self.stdout.write(f're-normalized {count} ontologies in {time.monotonic() - started:.2f}s')
+        return count
+
+    def _refresh_centrality(self) -> None:
+        """Recompute the graph ranking scores once the corpus changed (rate limited)."""
+        try:
+            if not centrality.due():
+                return
+            scores = centrality.refresh()
+        except Exception:
+            logger.exception('centrality refresh failed')
+            return
+        self.stdout.write(f'centrality of {scores.nodes} nodes refreshed in {scores.elapsed:.2f}s '
+                          f'({scores.iterations} PageRank iterations)')
@@ -1,10 +1,42 @@
+import time
+
 from django.core.management.base import BaseCommand
-from ..faiss_index import build_index
+from ... import embedding_cache, entity_index
+from ...faiss_index import build_index
 
 
 class Command(BaseCommand):
-    help = 'Rebuild FAISS index from Ontology records'
+    help = 'Rebuild the document and entity FAISS indexes from Ontology records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--progress-every', type=float, default=5.0,
+                            help='Seconds between progress lines (0 to disable)')
+
+    def _reporter(self, name, every):
+        last = [time.monotonic()]
+
+        def report(stats):
+            if every <= 0 or time.monotonic() - last[0] < every:
+                return
+            last[0] = time.monotonic()
+            self.stdout.write(self._line(name, stats))
+        return report
+
+    @staticmethod
+    def _line(name, stats):
+        return (f'{name}: {stats.rows} rows, {stats.chunks} chunks in {stats.elapsed:.1f}s '
+                f'({stats.rows_per_s:.1f} rows/s, {stats.tokens_per_s:.0f} tokens/s)')
 
     def handle(self, *args, **options):
-        build_index()
+        for name, build in (('documents', build_index), ('entities', entity_index.build_index)):
+            embedding_cache.reset_stats()
+            stats = build(force=True, progress=self._reporter(name, options['progress_every']))
+            if stats is None:
+                self.stdout.write(self.style.WARNING(f'{name}: FAISS or the embedding model is unavailable'))
+                continue
+            self.stdout.write(self._line(name, stats))
+            for s in embedding_cache.stats():
+                self.stdout.write(
+                    f"{name}: embedding cache {s['hits']} hits / {s['misses']} misses "
+                    f"({s['hit_rate']:.1%} hit rate, {s['entries']}/{s['capacity']} entries)")
         self.stdout.write(self.style.SUCCESS('FAISS index rebuilt'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ...graph_store import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized aggregated graph served by /api/graph/'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Graph store rebuilt from {count} ontologies'))
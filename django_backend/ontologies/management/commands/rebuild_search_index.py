@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ...search_index import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the lexical inverted index used by query_top_k_local'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {count} ontologies'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ...normalization import VERSION, renormalize
+
+
+class Command(BaseCommand):
+    help = 'Re-normalize ontologies stored with other normalization rules and rebuild what derives from them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Ontologies rewritten per transaction')
+
+    def handle(self, *args, **options):
+        count = renormalize(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} ontologies re-normalized to rules version {VERSION}'))
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:31
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The tokenization and field weighting of `lexical` as of this migration,
+# frozen here so later changes to the app code cannot change what it does.
+_token_re = re.compile(r"\w+", re.UNICODE)
+
+
+def _collect_text(obj, depth=0):
+    texts = []
+    if obj is None:
+        return texts
+    if isinstance(obj, str):
+        texts.append((obj, max(1.0, 3.0 - depth * 0.3)))
+        return texts
+    if isinstance(obj, (int, float, bool)):
+        texts.append((str(obj), 1.0))
+        return texts
+    if isinstance(obj, list):
+        for item in obj:
+            texts.extend(_collect_text(item, depth + 1))
+        return texts
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            key_low = str(k).lower()
+            key_weight = 1.0
+            if any(x in key_low for x in ('label', 'name', 'title', 'desc', 'summary')):
+                key_weight = 2.5
+            if isinstance(v, (str, int, float, bool)):
+                texts.append((str(v), key_weight))
+            else:
+                for t, w in _collect_text(v, depth + 1):
+                    texts.append((t, w * key_weight))
+        return texts
+    try:
+        texts.append((str(obj), 1.0))
+    except Exception:
+        pass
+    return texts
+
+
+def _token_weights(doc_obj):
+    token_weights = {}
+    for text, weight in _collect_text(doc_obj):
+        for t in _token_re.findall((text or '').lower()):
+            token_weights[t] = token_weights.get(t, 0.0) + float(weight)
+    return token_weights
+
+
+def build_postings(apps, schema_editor):
+    Ontology = apps.get_model('ontologies', 'Ontology')
+    TokenPosting = apps.get_model('ontologies', 'TokenPosting')
+    DocumentWeight = apps.get_model('ontologies', 'DocumentWeight')
+    for o in Ontology.objects.order_by('id').iterator(chunk_size=500):
+        doc_sum = 0.0
+        postings = []
+        for position, (token, weight) in enumerate(_token_weights(o.json or {}).items()):
+            doc_sum += weight
+            if len(token) <= 255:
+                postings.append(TokenPosting(token=token, ontology_id=o.id, weight=weight, position=position))
+        TokenPosting.objects.bulk_create(postings, batch_size=1000)
+        DocumentWeight.objects.create(ontology_id=o.id, weight_sum=doc_sum)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentWeight',
+            fields=[
+                ('ontology', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='doc_weight', serialize=False, to='ontologies.ontology')),
+                ('weight_sum', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TokenPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=255)),
+                ('weight', models.FloatField()),
+                ('position', models.PositiveIntegerField()),
+                ('ontology', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='ontologies.ontology')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'ontology'], name='posting_token_idx')],
+            },
+        ),
+        migrations.RunPython(build_postings, migrations.RunPython.noop),
+    ]
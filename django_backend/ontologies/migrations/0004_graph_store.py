@@ -0,0 +1,113 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+# The node/relation normalization and keying of `graph_store` as of this
+# migration, frozen here so later changes to the app code cannot change what
+# it does. Rows are re-derived with the current rules by `renormalize` (see
+# 0012_normalized_form).
+
+
+def _normalize_node(n):
+    if isinstance(n, str):
+        return {'id': n, 'label': n, 'type': 'Entity'}
+    if isinstance(n, dict):
+        nid = n.get('id') or n.get('label') or n.get('name')
+        label = n.get('label') or n.get('name') or nid
+        ntype = n.get('type') or n.get('class') or n.get('label') or 'Entity'
+        return {'id': nid, 'label': label, 'type': ntype}
+    return None
+
+
+def _normalize_relation(r):
+    if not r:
+        return None
+    if isinstance(r, dict):
+        s = r.get('source') or r.get('from') or r.get('s')
+        t = r.get('target') or r.get('to') or r.get('t')
+        rel = r.get('relation') or r.get('label') or r.get('type') or 'related_to'
+        return {'source': s, 'target': t, 'relation': rel}
+    return None
+
+
+def _key(value):
+    raw = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else []
+
+
+def contributions(data):
+    nodes, edges = {}, {}
+    if not isinstance(data, dict):
+        return nodes, edges
+    for pos, n in enumerate(_as_list(data.get('nodes') or data.get('entities') or [])):
+        nn = _normalize_node(n)
+        if nn and nn.get('id'):
+            nodes.setdefault(_key(nn['id']), (nn, pos))
+    for pos, r in enumerate(_as_list(data.get('relations') or data.get('edges') or [])):
+        rr = _normalize_relation(r)
+        if rr and rr.get('source') and rr.get('target'):
+            edges.setdefault(_key([rr['source'], rr['target'], rr['relation']]), (rr, pos))
+    return nodes, edges
+
+
+def build_graph_store(apps, schema_editor):
+    Ontology = apps.get_model('ontologies', 'Ontology')
+    GraphNode = apps.get_model('ontologies', 'GraphNode')
+    GraphEdge = apps.get_model('ontologies', 'GraphEdge')
+    node_rows, edge_rows = {}, {}
+    for o in Ontology.objects.order_by('id').iterator(chunk_size=200):
+        nodes, edges = contributions(o.json)
+        for rows, model, found in ((node_rows, GraphNode, nodes), (edge_rows, GraphEdge, edges)):
+            for key, (data, pos) in found.items():
+                if key in rows:
+                    rows[key].ref_count += 1
+                else:
+                    rows[key] = model(key=key, data=data, ref_count=1, first_ontology_id=o.id, position=pos)
+    GraphNode.objects.bulk_create(node_rows.values(), batch_size=500)
+    GraphEdge.objects.bulk_create(edge_rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0003_documentweight_indexed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('data', models.JSONField()),
+                ('ref_count', models.PositiveIntegerField(default=1)),
+                ('first_ontology_id', models.BigIntegerField()),
+                ('position', models.PositiveIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['first_ontology_id', 'position'], name='graphedge_order_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GraphNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('data', models.JSONField()),
+                ('ref_count', models.PositiveIntegerField(default=1)),
+                ('first_ontology_id', models.BigIntegerField()),
+                ('position', models.PositiveIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['first_ontology_id', 'position'], name='graphnode_order_idx')],
+            },
+        ),
+        migrations.RunPython(build_graph_store, migrations.RunPython.noop),
+    ]
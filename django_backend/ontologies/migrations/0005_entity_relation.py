@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0004_graph_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('entity_id', models.CharField(db_index=True, max_length=255)),
+                ('label', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('type', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('data', models.JSONField()),
+                ('properties', models.JSONField(blank=True, null=True)),
+                ('ontology', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='ontologies.ontology')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ontology', 'position'], name='entity_order_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Relation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('source', models.CharField(max_length=255)),
+                ('relation', models.CharField(max_length=255)),
+                ('target', models.CharField(db_index=True, max_length=255)),
+                ('data', models.JSONField()),
+                ('properties', models.JSONField(blank=True, null=True)),
+                ('ontology', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='ontologies.ontology')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'relation', 'target'], name='relation_triple_idx'), models.Index(fields=['ontology', 'position'], name='relation_order_idx')],
+            },
+        ),
+    ]
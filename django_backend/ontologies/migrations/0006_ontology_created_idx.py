@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0005_entity_relation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ontology',
+            index=models.Index(fields=['-created_at', 'id'], name='ontology_created_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+def create_row(apps, schema_editor):
+    CorpusGeneration = apps.get_model('ontologies', 'CorpusGeneration')
+    CorpusGeneration.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0006_ontology_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorpusGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0007_corpus_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('ontology_id', models.BigIntegerField(blank=True, null=True)),
+                ('enqueued_at', models.DateTimeField()),
+                ('not_before', models.DateTimeField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('claimed_by', models.CharField(blank=True, max_length=255)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['not_before', 'enqueued_at'], name='indexjob_due_idx')],
+            },
+        ),
+    ]
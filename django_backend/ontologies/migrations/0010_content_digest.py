@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0009_upload_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ontology',
+            name='content_digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:07
+
+import django_backend.ontologies.payload_codec
+from django.db import migrations
+
+from django_backend.ontologies.payload_codec import compressed, convert_rows
+
+
+def to_configured_storage(apps, schema_editor):
+    # rows are rewritten in place only when compressed storage is configured
+    if compressed():
+        convert_rows(apps.get_model('ontologies', 'Ontology'), 'compressed')
+
+
+def to_json(apps, schema_editor):
+    convert_rows(apps.get_model('ontologies', 'Ontology'), 'json')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0010_content_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ontology',
+            name='payload',
+            field=django_backend.ontologies.payload_codec.PayloadBlobField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='ontology',
+            name='json',
+            field=django_backend.ontologies.payload_codec.PayloadJSONField(null=True),
+        ),
+        migrations.RunPython(to_configured_storage, to_json),
+    ]
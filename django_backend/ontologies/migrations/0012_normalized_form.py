@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:12
+
+import django_backend.ontologies.normalization
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0011_compressed_payload'),
+    ]
+
+    # Existing rows start at normalized_version 0, i.e. stale: the index worker
+    # (or `manage.py renormalize`) stores their form with the current rules and
+    # rebuilds the graph store and entity rows derived from it.
+    operations = [
+        migrations.AddField(
+            model_name='ontology',
+            name='normalized',
+            field=django_backend.ontologies.normalization.NormalizedField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ontology',
+            name='normalized_version',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0012_normalized_form'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntityAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=255, unique=True)),
+                ('canonical', models.CharField(db_index=True, max_length=255)),
+                ('label_key', models.CharField(db_index=True, max_length=255)),
+                ('token_key', models.CharField(db_index=True, max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EntityBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.CharField(max_length=24)),
+                ('alias', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='ontologies.entityalias')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('band', 'alias'), name='entityblock_band_alias_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0013_entity_resolution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphCentrality',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('nodes', models.PositiveIntegerField(default=0)),
+                ('iterations', models.PositiveIntegerField(default=0)),
+                ('elapsed', models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='graphnode',
+            name='in_degree',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='graphnode',
+            name='out_degree',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='graphnode',
+            name='pagerank',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='graphnode',
+            index=models.Index(fields=['-pagerank'], name='graphnode_pagerank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphnode',
+            index=models.Index(fields=['-in_degree'], name='graphnode_in_degree_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graphnode',
+            index=models.Index(fields=['-out_degree'], name='graphnode_out_degree_idx'),
+        ),
+    ]
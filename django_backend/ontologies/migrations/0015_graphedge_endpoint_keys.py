@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:02
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def _key(value):
+    # `graph_store._key` as of this migration
+    raw = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def fill_endpoint_keys(apps, schema_editor):
+    GraphEdge = apps.get_model('ontologies', 'GraphEdge')
+    batch = []
+    for edge in GraphEdge.objects.only('id', 'data').iterator(chunk_size=1000):
+        edge.source_key, edge.target_key = _key(edge.data['source']), _key(edge.data['target'])
+        batch.append(edge)
+        if len(batch) >= 1000:
+            GraphEdge.objects.bulk_update(batch, ['source_key', 'target_key'])
+            batch = []
+    GraphEdge.objects.bulk_update(batch, ['source_key', 'target_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ontologies', '0014_graph_centrality'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graphedge',
+            name='source_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='graphedge',
+            name='target_key',
+            field=models.CharField(db_index=True, default='', max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_endpoint_keys, migrations.RunPython.noop),
+    ]
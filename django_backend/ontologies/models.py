@@ -1,10 +1,234 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+
+from .normalization import NormalizedField
+from .payload_codec import PayloadBlobField, PayloadJSONField
 
 class Ontology(models.Model):
     filename = models.CharField(max_length=255, blank=True)
     source = models.CharField(max_length=255, blank=True)
-    json = models.JSONField()
+    # the payload dict; NULL in the database when stored compressed in
+    # `payload` (see `payload_codec`), but always the dict on the instance
+    json = PayloadJSONField(null=True)
+    payload = PayloadBlobField(null=True, blank=True)
+    # canonical nodes/relations computed from `json` on save, and the version
+    # of the rules that produced them (see `normalization`)
+    normalized = NormalizedField(null=True, blank=True)
+    normalized_version = models.PositiveSmallIntegerField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # SHA-256 of the uploaded file the ontology was generated from; repeat
+    # uploads of the same bytes reuse this row (see `uploads`)
+    content_digest = models.CharField(max_length=64, blank=True, db_index=True)
+
+    class Meta:
+        # supports the (-created_at, id) keyset used to page the list view
+        indexes = [models.Index(fields=['-created_at', 'id'], name='ontology_created_idx')]
 
     def __str__(self):
         return f"{self.filename} ({self.created_at.isoformat()})"
+
+    def _save_table(self, raw=False, cls=None, force_insert=False, force_update=False, using=None,
+                    update_fields=None):
+        # `normalized` is computed while the row is written, which records new
+        # entity aliases (see `resolution`); they commit or roll back with the
+        # row. Only the write itself runs in the transaction, not the post_save
+        # handlers, so readers are not held up behind them.
+        with transaction.atomic(using=using):
+            return super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
+
+
+class TokenPosting(models.Model):
+    """One entry of the inverted index behind `query_top_k_local`.
+
+    `weight` is the accumulated `_collect_text` weight of `token` inside the
+    ontology and `position` its first-occurrence ordinal, so intersections can
+    be summed in the same order as the legacy per-document scorer.
+    """
+    token = models.CharField(max_length=255)
+    ontology = models.ForeignKey(Ontology, on_delete=models.CASCADE, related_name='postings')
+    weight = models.FloatField()
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['token', 'ontology'], name='posting_token_idx')]
+
+
+class DocumentWeight(models.Model):
+    """Per-ontology sum of all token weights (the scorer's denominator)."""
+    ontology = models.OneToOneField(Ontology, on_delete=models.CASCADE, primary_key=True, related_name='doc_weight')
+    weight_sum = models.FloatField()
+    # bumped whenever the document is re-indexed; lets cached scoring
+    # matrices detect that the postings changed
+    indexed_at = models.DateTimeField(auto_now=True)
+
+
+class GraphNode(models.Model):
+    """A merged node of the aggregated graph (see `graph_store`).
+
+    `key` is a digest of the node id; `data` the normalized node served by
+    `/api/graph/`. `first_ontology_id`/`position` locate the first ontology
+    asserting it and fix the output order; `ref_count` counts the ontologies
+    asserting it. `pagerank`/`in_degree`/`out_degree` are refreshed
+    periodically by `centrality`.
+    """
+    key = models.CharField(max_length=40, unique=True)
+    data = models.JSONField()
+    ref_count = models.PositiveIntegerField(default=1)
+    first_ontology_id = models.BigIntegerField()
+    position = models.PositiveIntegerField()
+    pagerank = models.FloatField(default=0.0)
+    in_degree = models.PositiveIntegerField(default=0)
+    out_degree = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['first_ontology_id', 'position'], name='graphnode_order_idx'),
+            models.Index(fields=['-pagerank'], name='graphnode_pagerank_idx'),
+            models.Index(fields=['-in_degree'], name='graphnode_in_degree_idx'),
+            models.Index(fields=['-out_degree'], name='graphnode_out_degree_idx'),
+        ]
+
+
+class GraphEdge(models.Model):
+    """A deduplicated `(source, target, relation)` edge of the aggregated graph.
+
+    `source_key`/`target_key` are the `GraphNode.key` of its endpoints, so the
+    edges among a set of nodes are found through an index.
+    """
+    key = models.CharField(max_length=40, unique=True)
+    source_key = models.CharField(max_length=40, db_index=True)
+    target_key = models.CharField(max_length=40, db_index=True)
+    data = models.JSONField()
+    ref_count = models.PositiveIntegerField(default=1)
+    first_ontology_id = models.BigIntegerField()
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['first_ontology_id', 'position'], name='graphedge_order_idx')]
+
+
+class Entity(models.Model):
+    """A normalized node of one ontology, populated at ingest (see `entities`).
+
+    The indexed text columns serve lookups; `data` is the normalized node and
+    `properties` the raw node dict as it appears in `Ontology.json`.
+    """
+    ontology = models.ForeignKey(Ontology, on_delete=models.CASCADE, related_name='entities')
+    position = models.PositiveIntegerField()
+    entity_id = models.CharField(max_length=255, db_index=True)
+    label = models.CharField(max_length=255, blank=True, db_index=True)
+    type = models.CharField(max_length=255, blank=True, db_index=True)
+    data = models.JSONField()
+    properties = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['ontology', 'position'], name='entity_order_idx')]
+
+
+class Relation(models.Model):
+    """A normalized `(source, relation, target)` edge of one ontology."""
+    ontology = models.ForeignKey(Ontology, on_delete=models.CASCADE, related_name='relations')
+    position = models.PositiveIntegerField()
+    source = models.CharField(max_length=255)
+    relation = models.CharField(max_length=255)
+    target = models.CharField(max_length=255, db_index=True)
+    data = models.JSONField()
+    properties = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'relation', 'target'], name='relation_triple_idx'),
+            models.Index(fields=['ontology', 'position'], name='relation_order_idx'),
+        ]
+
+
+class EntityAlias(models.Model):
+    """A node id seen at ingest and the canonical entity it resolves to (see `resolution`).
+
+    `label_key`/`token_key` are the exact blocking keys of `alias`; its
+    MinHash LSH bands are `EntityBlock` rows.
+    """
+    alias = models.CharField(max_length=255, unique=True)
+    canonical = models.CharField(max_length=255, db_index=True)
+    label_key = models.CharField(max_length=255, db_index=True)
+    token_key = models.CharField(max_length=255, db_index=True)
+
+
+class EntityBlock(models.Model):
+    """One MinHash LSH band of an alias; aliases sharing a band are compared."""
+    alias = models.ForeignKey(EntityAlias, on_delete=models.CASCADE, related_name='blocks')
+    band = models.CharField(max_length=24)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['band', 'alias'], name='entityblock_band_alias_uniq')]
+
+
+class CorpusGeneration(models.Model):
+    """Single-row counter bumped on every Ontology write or delete.
+
+    Anything derived from the whole corpus (ETags, caches, in-process
+    indexes) is tagged with the generation it was built from.
+    """
+    generation = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class GraphCentrality(models.Model):
+    """Single row describing the scores stored on `GraphNode` (see `centrality`).
+
+    `generation` is the corpus generation they were computed from.
+    """
+    generation = models.BigIntegerField(default=0)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    nodes = models.PositiveIntegerField(default=0)
+    iterations = models.PositiveIntegerField(default=0)
+    elapsed = models.FloatField(default=0.0)
+
+
+class IndexJob(models.Model):
+    """Pending FAISS index work, applied by `manage.py index_worker` (see `index_jobs`).
+
+    `key` coalesces requests: one row per ontology (`ontology:<id>`) plus one
+    for a full rebuild (`rebuild`). Re-enqueueing moves `enqueued_at`, which
+    tells the worker that a row changed again while it was being applied.
+    `claimed_by`/`claimed_at` mark a row a worker is applying; a claim older
+    than `INDEX_JOB_LEASE_SECONDS` is assumed dead and can be taken over.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    ontology_id = models.BigIntegerField(null=True, blank=True)
+    enqueued_at = models.DateTimeField()
+    not_before = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=255, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['not_before', 'enqueued_at'], name='indexjob_due_idx')]
+
+
+class UploadJob(models.Model):
+    """An uploaded file on its way through the Ontology-Generator (see `uploads`).
+
+    `upload_document` answers `202 Accepted` with the job id at once; a
+    background pool forwards the spooled file and records the outcome here
+    for `/api/upload/<id>/`.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255, blank=True)
+    digest = models.CharField(max_length=64, blank=True, db_index=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    ontology = models.ForeignKey(Ontology, null=True, blank=True, on_delete=models.SET_NULL, related_name='upload_jobs')
+    error = models.TextField(blank=True)
+    # what the remote Query-chat index said about the new ontology, if configured
+    remote = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,171 @@
+"""The rules that turn a raw ontology payload into canonical nodes and relations.
+
+Payloads come in several shapes (`nodes` or `entities`, `relations` or
+`edges`, bare strings, `from`/`to` instead of `source`/`target`, ...). They
+are normalized once, when an Ontology is saved: `Ontology.normalized` holds
+
+    {'nodes': [[position, node], ...], 'relations': [[position, relation], ...]}
+
+with only the valid entries (a node needs an id, a relation a source and a
+target) and `position` their index in the raw list; node ids are resolved
+to canonical entities across documents (see `resolution`). The graph store,
+the `Entity`/`Relation` rows and the component index are all derived from
+this form, never from the raw payload.
+
+`Ontology.normalized_version` records the `VERSION` of the rules that
+produced the form. Bump `VERSION` whenever the rules change: the index
+worker then re-normalizes the rows stamped with another version in the
+background with `renormalize()` and rebuilds what is derived from them.
+`manage.py renormalize` does the same in the foreground.
+"""
+import logging
+
+from django.db import models, transaction
+
+logger = logging.getLogger(__name__)
+
+# 2: node ids resolved to canonical entities
+VERSION = 2
+
+
+def normalize_node(n):
+    if isinstance(n, str):
+        return {'id': n, 'label': n, 'type': 'Entity'}
+    if isinstance(n, dict):
+        nid = n.get('id') or n.get('label') or n.get('name')
+        label = n.get('label') or n.get('name') or nid
+        ntype = n.get('type') or n.get('class') or n.get('label') or 'Entity'
+        return {'id': nid, 'label': label, 'type': ntype}
+    return None
+
+
+def normalize_relation(r):
+    if not r:
+        return None
+    if isinstance(r, dict):
+        s = r.get('source') or r.get('from') or r.get('s')
+        t = r.get('target') or r.get('to') or r.get('t')
+        rel = r.get('relation') or r.get('label') or r.get('type') or 'related_to'
+        return {'source': s, 'target': t, 'relation': rel}
+    return None
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else []
+
+
+def raw_nodes(data) -> list:
+    """The raw node list of a payload (`nodes` or `entities`)."""
+    if not isinstance(data, dict):
+        return []
+    return _as_list(data.get('nodes') or data.get('entities') or [])
+
+
+def raw_relations(data) -> list:
+    """The raw relation list of a payload (`relations` or `edges`)."""
+    if not isinstance(data, dict):
+        return []
+    return _as_list(data.get('relations') or data.get('edges') or [])
+
+
+def canonical(data) -> dict:
+    """The canonical form of one raw payload (`None` gives an empty form)."""
+    nodes = []
+    for pos, n in enumerate(raw_nodes(data)):
+        nn = normalize_node(n)
+        if nn and nn.get('id'):
+            nodes.append([pos, nn])
+    relations = []
+    for pos, r in enumerate(raw_relations(data)):
+        rr = normalize_relation(r)
+        if rr and rr.get('source') and rr.get('target'):
+            relations.append([pos, rr])
+    return {'nodes': nodes, 'relations': relations}
+
+
+def normalize(data, record: bool = True) -> dict:
+    """The form stored for a raw payload: `canonical()` with node ids resolved
+    to canonical entities (see `resolution`). With `record=False` ids not seen
+    before are resolved without adding them to the alias map."""
+    from . import resolution
+
+    return resolution.resolve(canonical(data), record=record)
+
+
+def of(ontology) -> dict:
+    """The stored form of `ontology`, computed (without recording aliases) for
+    rows saved before it was stored."""
+    form = ontology.normalized
+    if form is None:
+        form = normalize(ontology.json, record=False)
+    return form
+
+
+class NormalizedField(models.JSONField):
+    """JSONField recomputed from `source_field` on every save, stamping `version_field`.
+
+    Declare it before `version_field` so the stamp is written in the same
+    statement (saves and `bulk_create` evaluate fields in declaration order).
+    """
+
+    def __init__(self, *args, source_field='json', version_field='normalized_version', **kwargs):
+        self.source_field = source_field
+        self.version_field = version_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.source_field != 'json':
+            kwargs['source_field'] = self.source_field
+        if self.version_field != 'normalized_version':
+            kwargs['version_field'] = self.version_field
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = normalize(getattr(model_instance, self.source_field))
+        setattr(model_instance, self.attname, value)
+        setattr(model_instance, self.version_field, VERSION)
+        return value
+
+
+def stale():
+    """Ontologies whose stored form was produced by other rules (or never stored)."""
+    from .models import Ontology
+
+    return Ontology.objects.exclude(normalized_version=VERSION)
+
+
+def renormalize(batch_size: int = 200) -> int:
+    """Re-normalize every stale ontology; returns the number of rows rewritten.
+
+    Rows whose form changed get fresh `Entity`/`Relation` rows; then the graph
+    store is rebuilt once, the corpus generation bumped and the component
+    index invalidated, and index jobs are queued for them.
+    """
+    from . import components, entities, generation, graph_store, index_jobs
+
+    rewritten = 0
+    changed = []
+    while True:
+        batch = list(stale().order_by('id')[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            for o in batch:
+                form = normalize(o.json)
+                # a concurrent save already stored a current form; leave it be
+                if not type(o).objects.filter(pk=o.pk, normalized_version=o.normalized_version).update(
+                        normalized=form, normalized_version=VERSION):
+                    continue
+                rewritten += 1
+                if form != o.normalized:
+                    o.normalized, o.normalized_version = form, VERSION
+                    entities.sync(o)
+                    changed.append(o.id)
+    if changed:
+        graph_store.rebuild()
+        generation.bump()
+        components.invalidate()
+        index_jobs.enqueue_many(changed)
+        logger.info('re-normalized %s ontologies to rules version %s', len(changed), VERSION)
+    return rewritten
@@ -0,0 +1,201 @@
+"""Optional compressed storage of `Ontology.json`.
+
+With `ONTOLOGY_PAYLOAD_STORAGE = 'compressed'` the payload is written to the
+binary `Ontology.payload` column as compressed bytes and the `json` column is
+left NULL; with `'json'` (the default) it is a plain JSONField as before.
+Either way `ontology.json` is the decoded dict: the field's descriptor
+decodes `payload` on first access only, so code that never touches the
+payload never pays for it. Rows of both kinds can coexist; every save writes
+the row in the configured mode.
+
+A blob is `b'OJ' + version + codec + format + data`:
+
+    codec   'z' zlib, 's' zstd (needs `zstandard`)
+    format  'j' compact JSON, 'm' MessagePack (needs `msgpack`)
+
+`ONTOLOGY_PAYLOAD_CODEC` / `ONTOLOGY_PAYLOAD_FORMAT` choose them ('auto'
+picks zstd and MessagePack when installed, else zlib and JSON). The header
+makes every blob self-describing, so changing either setting never breaks
+reading existing rows. `manage.py convert_payloads` rewrites stored rows to
+the configured mode.
+"""
+import json
+import zlib
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+MAGIC = b'OJ'
+VERSION = 1
+_HEADER = len(MAGIC) + 3
+
+
+def _ensure_zstd():
+    """Helper to import zstandard lazily."""
+    try:
+        import zstandard
+        return zstandard
+    except Exception:
+        return None
+
+
+def _ensure_msgpack():
+    """Helper to import msgpack lazily."""
+    try:
+        import msgpack
+        return msgpack
+    except Exception:
+        return None
+
+
+def storage_mode() -> str:
+    return (getattr(settings, 'ONTOLOGY_PAYLOAD_STORAGE', 'json') or 'json').lower()
+
+
+def compressed() -> bool:
+    return storage_mode() == 'compressed'
+
+
+def _codec(name: str = None) -> str:
+    name = (name or getattr(settings, 'ONTOLOGY_PAYLOAD_CODEC', 'auto')).lower()
+    if name == 'auto':
+        return 's' if _ensure_zstd() is not None else 'z'
+    return {'zstd': 's', 'zlib': 'z'}[name]
+
+
+def _format(name: str = None) -> str:
+    name = (name or getattr(settings, 'ONTOLOGY_PAYLOAD_FORMAT', 'auto')).lower()
+    if name == 'auto':
+        return 'm' if _ensure_msgpack() is not None else 'j'
+    return {'msgpack': 'm', 'json': 'j'}[name]
+
+
+def encode(value, codec: str = None, fmt: str = None) -> bytes:
+    """Compress `value`; `codec`/`fmt` override the configured 'zstd'|'zlib' and 'msgpack'|'json'."""
+    codec, fmt = _codec(codec), _format(fmt)
+    level = int(getattr(settings, 'ONTOLOGY_PAYLOAD_LEVEL', 6))
+    if fmt == 'm':
+        raw = _ensure_msgpack().packb(value, use_bin_type=True)
+    else:
+        raw = json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if codec == 's':
+        data = _ensure_zstd().ZstdCompressor(level=level).compress(raw)
+    else:
+        data = zlib.compress(raw, level)
+    return MAGIC + bytes([VERSION]) + codec.encode() + fmt.encode() + data
+
+
+def decode(blob):
+    """The value stored in `blob` (bytes or memoryview) by `encode()`."""
+    blob = bytes(blob)
+    if blob[:len(MAGIC)] != MAGIC or blob[len(MAGIC)] != VERSION:
+        raise ValueError('not an ontology payload blob')
+    codec, fmt = chr(blob[len(MAGIC) + 1]), chr(blob[len(MAGIC) + 2])
+    data = blob[_HEADER:]
+    if codec == 's':
+        zstd = _ensure_zstd()
+        if zstd is None:
+            raise RuntimeError('payload is zstd-compressed but zstandard is not installed')
+        raw = zstd.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    if fmt == 'm':
+        msgpack = _ensure_msgpack()
+        if msgpack is None:
+            raise RuntimeError('payload is MessagePack-encoded but msgpack is not installed')
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+    return json.loads(raw)
+
+
+def resolve(value, blob):
+    """The payload of a row read with `values_list('json', 'payload')`."""
+    if value is None and blob is not None:
+        return decode(blob)
+    return value
+
+
+class _PayloadDescriptor(DeferredAttribute):
+    """`instance.json`: the stored dict, decoded from `payload` on first access."""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        data = instance.__dict__
+        name = self.field.attname
+        blob_name = self.field.blob_field
+        if name not in data:
+            instance.refresh_from_db(fields=[f for f in (name, blob_name) if f not in data])
+        if data[name] is None:
+            if blob_name not in data:
+                instance.refresh_from_db(fields=[blob_name])
+            if data[blob_name] is not None:
+                data[name] = decode(data[blob_name])
+                # the decoded dict is the source of truth from now on
+                data[blob_name] = None
+        return data[name]
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class PayloadJSONField(models.JSONField):
+    """JSONField that is left NULL in compressed mode (the bytes go to `blob_field`)."""
+    descriptor_class = _PayloadDescriptor
+
+    def __init__(self, *args, blob_field='payload', **kwargs):
+        self.blob_field = blob_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.blob_field != 'payload':
+            kwargs['blob_field'] = self.blob_field
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        return None if compressed() else value
+
+
+class PayloadBlobField(models.BinaryField):
+    """Compressed copy of `json_field`, written in compressed mode only."""
+
+    def __init__(self, *args, json_field='json', **kwargs):
+        self.json_field = json_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.json_field != 'json':
+            kwargs['json_field'] = self.json_field
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        if not compressed():
+            return None
+        return encode(getattr(model_instance, self.json_field))
+
+
+def convert_rows(model, to: str, batch_size: int = 200) -> int:
+    """Rewrite the stored payload of every `model` row as `to` ('compressed' or 'json').
+
+    Works on historical models too (migrations): it only uses
+    `values_list`/`update`, which bypass the fields' save hooks.
+    """
+    converted = 0
+    if to == 'compressed':
+        rows = model.objects.filter(json__isnull=False)
+    else:
+        rows = model.objects.filter(payload__isnull=False)
+    ids = list(rows.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        for pk, value, blob in model.objects.filter(pk__in=chunk).values_list('pk', 'json', 'payload'):
+            value = resolve(value, blob)
+            if to == 'compressed':
+                model.objects.filter(pk=pk).update(json=None, payload=encode(value))
+            else:
+                model.objects.filter(pk=pk).update(json=value, payload=None)
+            converted += 1
+    return converted
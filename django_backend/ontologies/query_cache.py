@@ -0,0 +1,134 @@
+"""LRU cache of query responses, invalidated by the corpus generation.
+
+`/api/query/` and `/api/search_graph/?q=` results are stored in a Django
+cache (the `QUERY_CACHE_ALIAS` alias: locmem in-process, or a file/DB cache
+shared across workers). Keys carry the corpus generation, so any Ontology
+save or delete makes older entries unreachable; they then age out of the LRU.
+They also carry the document and entity index bundle versions: the index
+worker publishes those after the generation bump, so semantic results for
+the same generation change once the new bundles are live.
+
+The LRU order and sizes live in a manifest entry in the same cache, bounded
+by `QUERY_CACHE_MAX_ENTRIES` and `QUERY_CACHE_MAX_BYTES`. Across workers the
+manifest is best effort (last writer wins), so entries also get
+`QUERY_CACHE_TIMEOUT` as a backstop.
+"""
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import generation
+
+_PREFIX = 'qc'
+_MANIFEST_KEY = f'{_PREFIX}:manifest'
+_HITS_KEY = f'{_PREFIX}:hits'
+_MISSES_KEY = f'{_PREFIX}:misses'
+
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'QUERY_CACHE_ALIAS', 'default')]
+
+
+def _max_entries() -> int:
+    return int(getattr(settings, 'QUERY_CACHE_MAX_ENTRIES', 512))
+
+
+def _max_bytes() -> int:
+    return int(getattr(settings, 'QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+def _timeout() -> Optional[int]:
+    return getattr(settings, 'QUERY_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def index_versions() -> str:
+    """Versions of the document and entity index bundles queries are served from."""
+    from . import entity_index, faiss_index
+    return f'{faiss_index.bundle_version() or "-"}/{entity_index.bundle_version() or "-"}'
+
+
+def make_key(endpoint: str, query: str, **params) -> str:
+    """Cache key for a query: endpoint, normalized text, params, generation and index versions."""
+    normalized = (query or '').strip().lower()
+    parts = [endpoint, normalized, index_versions()] + [f'{k}={params[k]}' for k in sorted(params)]
+    digest = hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    return f'{_PREFIX}:{generation.current()}:{digest}'
+
+
+def _count(key: str) -> None:
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # first use: add() is a no-op if another worker created it meanwhile
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def _manifest(cache) -> 'OrderedDict[str, int]':
+    return cache.get(_MANIFEST_KEY) or OrderedDict()
+
+
+def get(key: str) -> Optional[Any]:
+    """Cached value for `key`, or None on a miss. Updates the hit/miss counters."""
+    cache = _cache()
+    value = cache.get(key)
+    if value is None:
+        _count(_MISSES_KEY)
+        return None
+    _count(_HITS_KEY)
+    with _lock:
+        manifest = _manifest(cache)
+        if key in manifest:
+            manifest.move_to_end(key)
+            cache.set(_MANIFEST_KEY, manifest, timeout=None)
+    return value
+
+
+def put(key: str, value: Any) -> None:
+    """Store `value`, evicting least recently used entries beyond the bounds."""
+    size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    if size > _max_bytes():
+        return
+    cache = _cache()
+    with _lock:
+        manifest = _manifest(cache)
+        manifest.pop(key, None)
+        manifest[key] = size
+        total = sum(manifest.values())
+        evicted = []
+        while manifest and (len(manifest) > _max_entries() or total > _max_bytes()):
+            old_key, old_size = manifest.popitem(last=False)
+            total -= old_size
+            evicted.append(old_key)
+        cache.set(key, value, timeout=_timeout())
+        if evicted:
+            cache.delete_many(evicted)
+        cache.set(_MANIFEST_KEY, manifest, timeout=None)
+
+
+def stats() -> dict:
+    cache = _cache()
+    manifest = _manifest(cache)
+    return {
+        'hits': cache.get(_HITS_KEY, 0),
+        'misses': cache.get(_MISSES_KEY, 0),
+        'entries': len(manifest),
+        'bytes': sum(manifest.values()),
+        'max_entries': _max_entries(),
+        'max_bytes': _max_bytes(),
+        'generation': generation.current(),
+    }
+
+
+def clear() -> None:
+    cache = _cache()
+    with _lock:
+        cache.delete_many(list(_manifest(cache)) + [_MANIFEST_KEY, _HITS_KEY, _MISSES_KEY])
@@ -0,0 +1,455 @@
+"""Entity resolution: map node ids from different uploads to canonical entities.
+
+Every document names its own nodes, so "OpenAI", "openai" and "Open AI"
+used to be three nodes of the aggregated graph. `resolve()` runs as part of
+normalization at ingest and rewrites the node ids (and relation endpoints)
+of a normalized form to their canonical id, so the graph store, the
+`Entity`/`Relation` rows, the component index and the traversal graph all
+see one entity.
+
+The id -> canonical map is persisted in `EntityAlias`. A new id is only
+compared with the aliases that share a blocking key with it:
+
+    label key   casefolded, accents, punctuation and legal suffixes
+                ("Inc", "Ltd", ...) dropped ("openai")
+    token key   the same words sorted ("ai open" for "AI, Open")
+    MinHash     LSH bands of the character 3-gram MinHash signature
+                (`EntityBlock` rows), for near-duplicates like
+                "International Business Machines Corp"/"...Corporation"
+
+A shared label key is a match. Any other candidate, including one with the
+same token key ("Man bites dog" for "Dog bites man"), must reach
+`ENTITY_RESOLUTION_THRESHOLD` Jaccard similarity of the 3-grams and carry
+the same numbers ("GPT-3" is not "GPT-4"). Symbols that name things stay in
+the keys: a trailing `+`/`#` and a leading `.` ("C++", "C#" and ".NET" are
+not "C" and "NET"). A new id joins the
+cluster of its best match (so canonical ids never change at ingest) or
+becomes a canonical id itself. Only saves record new aliases, inside the
+transaction of the save (see `Ontology.save`); reads such as
+`normalization.of()` resolve with `record=False` and leave the map as is.
+
+`cluster()` resolves a whole list of names at once with the same keys and
+union-find; `manage.py entity_merge_report` runs it over every alias (or a
+synthetic corpus), prints cluster sizes and timings and, with `--apply`,
+stores the new map and re-normalizes the corpus in the background.
+"""
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+# a word: letters/digits with a trailing `+`/`#` (c++, c#) and a leading `.` (.net)
+_WORD = re.compile(r'(?:(?<![0-9a-z.])\.)?[0-9a-z]+[+#]*')
+_DIGITS = re.compile(r'[0-9]+')
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_SEED = 1
+_SHINGLE = 3
+_QUERY_CHUNK = 500
+_local = threading.local()
+# trailing words that do not tell two organisations apart
+_LEGAL_SUFFIXES = frozenset({
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited',
+    'llc', 'llp', 'lp', 'plc', 'gmbh', 'ag', 'sa', 'bv', 'nv',
+})
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, 'ENTITY_RESOLUTION', True))
+
+
+def _threshold() -> float:
+    return float(getattr(settings, 'ENTITY_RESOLUTION_THRESHOLD', 0.8))
+
+
+def _bands() -> Tuple[int, int]:
+    """(bands, rows per band) of the LSH index."""
+    bands = int(getattr(settings, 'ENTITY_RESOLUTION_BANDS', 8))
+    rows = int(getattr(settings, 'ENTITY_RESOLUTION_BAND_ROWS', 4))
+    return bands, rows
+
+
+def fold(text: str) -> str:
+    """Lowercase words of `text` without accents or punctuation (but see `_WORD`)."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return ' '.join(_WORD.findall(text))
+
+
+@dataclass
+class Keys:
+    label: str
+    tokens: str
+    shingles: frozenset
+    numbers: Tuple[str, ...]
+
+    @classmethod
+    def of(cls, name: str) -> 'Keys':
+        words = fold(name).split()
+        while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+            words.pop()
+        label = ''.join(words)
+        if len(label) <= _SHINGLE:
+            shingles = frozenset([label]) if label else frozenset()
+        else:
+            shingles = frozenset(label[i:i + _SHINGLE] for i in range(len(label) - _SHINGLE + 1))
+        return cls(label=label, tokens=' '.join(sorted(words)), shingles=shingles,
+                   numbers=tuple(_DIGITS.findall(label)))
+
+
+def similarity(a: Keys, b: Keys) -> float:
+    """1.0 for a shared label key, else the 3-gram Jaccard similarity."""
+    if not a.label or not b.label:
+        return 0.0
+    if a.label == b.label:
+        return 1.0
+    if a.numbers != b.numbers:
+        return 0.0
+    inter = len(a.shingles & b.shingles)
+    return inter / (len(a.shingles) + len(b.shingles) - inter)
+
+
+def _permutations(count: int):
+    rng = np.random.default_rng(_SEED)
+    a = rng.integers(1, 2 ** 32, size=count, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, size=count, dtype=np.uint64)
+    return a, b
+
+
+def minhash(shingle_sets: Sequence[Iterable[str]], chunk: int = 4096) -> np.ndarray:
+    """MinHash signatures, one row of `bands * rows` values per shingle set.
+
+    The shingles of a chunk of names are hashed into one array and all
+    permutations are applied at once; `np.minimum.reduceat` then takes the
+    per-name minimum. Empty sets get an all-max row (they match nothing).
+    """
+    bands, rows = _bands()
+    a, b = _permutations(bands * rows)
+    out = np.full((len(shingle_sets), bands * rows), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingle_sets), chunk):
+        hashes, offsets, owners = [], [], []
+        for i, shingles in enumerate(shingle_sets[start:start + chunk]):
+            if not shingles:
+                continue
+            offsets.append(len(hashes))
+            owners.append(start + i)
+            hashes.extend(zlib.crc32(s.encode('utf-8')) for s in sorted(shingles))
+        if not hashes:
+            continue
+        values = np.asarray(hashes, dtype=np.uint64)
+        # a, x < 2**32 so a * x + b stays below 2**64
+        permuted = (a[:, None] * values[None, :] + b[:, None]) % _PRIME
+        out[owners] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return out
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One uint64 per (name, band): the band's rows folded with a fixed multiplier."""
+    bands, rows = _bands()
+    shaped = signatures.reshape(len(signatures), bands, rows)
+    mult = np.uint64(0x9E3779B97F4A7C15) ** np.arange(1, rows + 1, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        return (shaped * mult).sum(axis=2, dtype=np.uint64)
+
+
+def _band_labels(keys: np.ndarray) -> List[str]:
+    return [f'{b}:{int(k):016x}' for b, k in enumerate(keys)]
+
+
+# -- online resolution at ingest ---------------------------------------------
+
+@dataclass
+class _Entry:
+    order: float
+    alias: str
+    canonical: str
+    keys: Keys
+
+
+def _best(keys: Keys, entries: Iterable[_Entry], threshold: float) -> Optional[_Entry]:
+    best, best_score = None, 0.0
+    for entry in sorted(entries, key=lambda e: e.order):
+        score = similarity(keys, entry.keys)
+        if score >= threshold and score > best_score:
+            best, best_score = entry, score
+            if score == 1.0:
+                break
+    return best
+
+
+@contextmanager
+def memo():
+    """Remember resolved ids in this thread, so a batch resolved up front with
+    one `resolve_ids()` call is not looked up again row by row."""
+    previous = getattr(_local, 'memo', None)
+    _local.memo = {}
+    try:
+        yield
+    finally:
+        _local.memo = previous
+
+
+class _Blocks:
+    """In-memory blocking index over candidate entries."""
+
+    def __init__(self):
+        self.buckets: Dict[str, List[_Entry]] = defaultdict(list)
+        self.max_bucket = int(getattr(settings, 'ENTITY_RESOLUTION_MAX_BUCKET', 200))
+
+    @staticmethod
+    def _keys(keys: Keys, bands: List[str]) -> List[str]:
+        out = ['l:' + keys.label] if keys.label else []
+        if keys.tokens:
+            out.append('t:' + keys.tokens)
+        return out + ['b:' + band for band in bands]
+
+    def add(self, entry: _Entry, bands: List[str]) -> None:
+        for key in self._keys(entry.keys, bands):
+            self.buckets[key].append(entry)
+
+    def candidates(self, keys: Keys, bands: List[str]) -> List[_Entry]:
+        found: Dict[str, _Entry] = {}
+        for key in self._keys(keys, bands):
+            bucket = self.buckets.get(key, ())
+            if key[0] == 'b' and len(bucket) > self.max_bucket:
+                continue  # an over-full LSH band
+            for entry in bucket:
+                found.setdefault(entry.alias, entry)
+        return list(found.values())
+
+
+def resolve_ids(ids: Iterable[str], record: bool = True) -> Dict[str, str]:
+    """The canonical id of every string in `ids`, recording the new ones unless `record` is False."""
+    from .models import EntityAlias, EntityBlock
+
+    ids = list(dict.fromkeys(i for i in ids if isinstance(i, str) and i and len(i) <= 255))
+    remembered = getattr(_local, 'memo', None)
+    mapping = {}
+    if remembered is not None:
+        mapping = {i: remembered[i] for i in ids if i in remembered}
+        ids = [i for i in ids if i not in mapping]
+    if ids:
+        mapping.update(EntityAlias.objects.filter(alias__in=ids).values_list('alias', 'canonical'))
+    new = [i for i in ids if i not in mapping]
+    if not new:
+        if remembered is not None:
+            remembered.update(mapping)
+        return mapping
+
+    keys = {i: Keys.of(i) for i in new}
+    bands = band_keys(minhash([keys[i].shingles for i in new]))
+    labels = {i: _band_labels(bands[n]) if keys[i].shingles else [] for n, i in enumerate(new)}
+
+    found: Dict[str, Tuple[int, str]] = {}
+    label_keys = sorted({k.label for k in keys.values() if k.label})
+    token_keys = sorted({k.tokens for k in keys.values() if k.tokens})
+    band_values = sorted({b for bs in labels.values() for b in bs})
+    for lookup, values in (('label_key__in', label_keys), ('token_key__in', token_keys),
+                           ('blocks__band__in', band_values)):
+        for start in range(0, len(values), _QUERY_CHUNK):
+            rows = EntityAlias.objects.filter(**{lookup: values[start:start + _QUERY_CHUNK]})
+            for pk, alias, canonical in rows.values_list('pk', 'alias', 'canonical'):
+                found[alias] = (pk, canonical)
+
+    blocks = _Blocks()
+    if found:
+        aliases = list(found)
+        alias_keys = [Keys.of(a) for a in aliases]
+        alias_bands = band_keys(minhash([k.shingles for k in alias_keys]))
+        for n, alias in enumerate(aliases):
+            pk, canonical = found[alias]
+            blocks.add(_Entry(pk, alias, canonical, alias_keys[n]),
+                       _band_labels(alias_bands[n]) if alias_keys[n].shingles else [])
+
+    threshold = _threshold()
+    for i in new:
+        match = _best(keys[i], blocks.candidates(keys[i], labels[i]), threshold)
+        mapping[i] = match.canonical if match is not None else i
+        # later ids of the same batch may resolve to this one
+        blocks.add(_Entry(float('inf'), i, mapping[i], keys[i]), labels[i])
+    if not record:
+        return mapping
+
+    EntityAlias.objects.bulk_create(
+        [EntityAlias(alias=i, canonical=mapping[i], label_key=keys[i].label[:255], token_key=keys[i].tokens[:255])
+         for i in new], ignore_conflicts=True)
+    # concurrent saves may have recorded some of them first; theirs wins
+    stored = dict(EntityAlias.objects.filter(alias__in=new).values_list('alias', 'pk'))
+    mapping.update(EntityAlias.objects.filter(alias__in=new).values_list('alias', 'canonical'))
+    EntityBlock.objects.bulk_create(
+        [EntityBlock(alias_id=stored[i], band=band) for i in new if i in stored for band in labels[i]],
+        ignore_conflicts=True)
+    if remembered is not None:
+        remembered.update(mapping)
+    return mapping
+
+
+def ids_of(form: dict) -> Iterator:
+    """Node ids and relation endpoints of a normalized form."""
+    for _, nn in form['nodes']:
+        yield nn['id']
+    for _, rr in form['relations']:
+        yield rr['source']
+        yield rr['target']
+
+
+def resolve(form: dict, record: bool = True) -> dict:
+    """`form` (see `normalization`) with node ids and relation endpoints resolved."""
+    if not enabled() or not form or not (form['nodes'] or form['relations']):
+        return form
+    mapping = resolve_ids(ids_of(form), record=record)
+
+    def canonical(value):
+        return mapping.get(value, value) if isinstance(value, str) else value
+
+    return {
+        'nodes': [[pos, dict(nn, id=canonical(nn['id']))] for pos, nn in form['nodes']],
+        'relations': [[pos, dict(rr, source=canonical(rr['source']), target=canonical(rr['target']))]
+                      for pos, rr in form['relations']],
+    }
+
+
+# -- batch clustering ----------------------------------------------------------
+
+@dataclass
+class MergeReport:
+    names: int = 0
+    clusters: int = 0
+    pairs_compared: int = 0
+    pairs_matched: int = 0
+    oversized_buckets: int = 0
+    applied: int = 0
+    sizes: Dict[int, int] = field(default_factory=dict)
+    largest: List[List[str]] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def merged_names(self) -> int:
+        return self.names - self.clusters
+
+    @property
+    def all_pairs(self) -> int:
+        return self.names * (self.names - 1) // 2
+
+    def as_dict(self) -> dict:
+        return {
+            'names': self.names,
+            'clusters': self.clusters,
+            'merged_names': self.merged_names,
+            'pairs_compared': self.pairs_compared,
+            'all_pairs': self.all_pairs,
+            'pairs_matched': self.pairs_matched,
+            'oversized_buckets': self.oversized_buckets,
+            'applied': self.applied,
+            'sizes': self.sizes,
+            'largest': self.largest,
+            'timings': {k: round(v, 3) for k, v in self.timings.items()},
+        }
+
+
+def cluster(names: Sequence[str], threshold: float = None, max_bucket: int = None,
+            top: int = 10) -> Tuple[List[int], MergeReport]:
+    """Cluster `names`; returns the cluster label (index of its canonical, the
+    first member) of every name and a report.
+
+    Names sharing a label key are merged without comparing them; names
+    sharing a token key or an LSH band are compared pairwise, skipping buckets
+    larger than `max_bucket` (stop-word-like bands) so the work stays
+    sub-quadratic.
+    """
+    from .components import UnionFind
+
+    threshold = _threshold() if threshold is None else threshold
+    max_bucket = max_bucket or int(getattr(settings, 'ENTITY_RESOLUTION_MAX_BUCKET', 200))
+    report = MergeReport(names=len(names))
+    uf = UnionFind()
+    for i in range(len(names)):
+        uf.add(i)
+
+    started = time.perf_counter()
+    keys = [Keys.of(n) for n in names]
+    report.timings['keys_s'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    bands = band_keys(minhash([k.shingles for k in keys]))
+    report.timings['minhash_s'] = time.perf_counter() - started
+
+    def compare(buckets) -> None:
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > max_bucket:
+                report.oversized_buckets += 1
+                continue
+            for x, i in enumerate(members):
+                for j in members[x + 1:]:
+                    if uf.find(i) == uf.find(j):
+                        continue
+                    report.pairs_compared += 1
+                    if similarity(keys[i], keys[j]) >= threshold:
+                        report.pairs_matched += 1
+                        uf.union(i, j)
+
+    started = time.perf_counter()
+    first: Dict[str, int] = {}
+    by_tokens: Dict[str, List[int]] = defaultdict(list)
+    for i, k in enumerate(keys):
+        if k.label:
+            uf.union(first.setdefault(k.label, i), i)
+        if k.tokens:
+            by_tokens[k.tokens].append(i)
+    compare(by_tokens)
+    report.timings['exact_keys_s'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for b in range(bands.shape[1]):
+        buckets: Dict[int, List[int]] = defaultdict(list)
+        for i, value in enumerate(bands[:, b].tolist()):
+            if keys[i].shingles:
+                buckets[value].append(i)
+        compare(buckets)
+    report.timings['lsh_s'] = time.perf_counter() - started
+
+    members_of: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(names)):
+        members_of[uf.find(i)].append(i)
+    labels = [0] * len(names)
+    for members in members_of.values():
+        for i in members:
+            labels[i] = members[0]
+    report.clusters = len(members_of)
+    sizes: Dict[int, int] = defaultdict(int)
+    for members in members_of.values():
+        sizes[len(members)] += 1
+    report.sizes = dict(sorted(sizes.items()))
+    biggest = sorted(members_of.values(), key=len, reverse=True)[:top]
+    report.largest = [[names[i] for i in members] for members in biggest if len(members) > 1]
+    report.timings['total_s'] = sum(report.timings.values())
+    return labels, report
+
+
+def recluster(apply: bool = False, **options) -> MergeReport:
+    """Re-cluster every stored alias; with `apply`, store the new canonical ids.
+
+    Applying marks every ontology for re-normalization, which the index
+    worker (or `manage.py renormalize`) carries out.
+    """
+    from .models import EntityAlias, Ontology
+
+    rows = list(EntityAlias.objects.order_by('pk').values_list('pk', 'alias', 'canonical'))
+    labels, report = cluster([alias for _, alias, _ in rows], **options)
+    if apply:
+        changed = [EntityAlias(pk=pk, canonical=rows[labels[n]][1])
+                   for n, (pk, _, canonical) in enumerate(rows) if rows[labels[n]][1] != canonical]
+        EntityAlias.objects.bulk_update(changed, ['canonical'], batch_size=500)
+        if changed:
+            Ontology.objects.update(normalized_version=0)
+        report.applied = len(changed)
+    return report
@@ -0,0 +1,242 @@
+"""Pluggable lexical scoring engines for `query_top_k_local`.
+
+`legacy` is the original overlap score (served from the inverted index in
+`search_index`). `bm25` and `tfidf` keep a SciPy CSR document-term matrix
+built from the same `_collect_text` field weights and score a query against
+every document with a single sparse mat-vec, picking the top-k with
+`argpartition`.
+
+The engine is selected with the `LEXICAL_SCORER` setting or per request with
+a `scorer=` parameter. If NumPy/SciPy are not installed every name falls back
+to `legacy`.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from . import search_index
+from .lexical import _tokens
+from .models import DocumentWeight, Ontology, TokenPosting
+
+DEFAULT_SCORER = 'legacy'
+
+
+def _ensure_scipy():
+    """Helper to import numpy and scipy.sparse lazily."""
+    try:
+        import numpy as np
+        from scipy import sparse
+        return np, sparse
+    except Exception:
+        return None, None
+
+
+class SparseCorpus:
+    """Document-term matrix of accumulated token weights.
+
+    Rows follow `ids`; `doc_lengths` holds each document's total weight, which
+    is the same denominator the legacy scorer uses.
+    """
+
+    def __init__(self, ids, vocab: Dict[str, int], matrix, doc_lengths):
+        self.ids = ids
+        self.vocab = vocab
+        self.matrix = matrix
+        self.doc_lengths = doc_lengths
+
+    @classmethod
+    def from_rows(cls, docs: Iterable[Tuple[int, float, Iterable[Tuple[str, float]]]]):
+        """Build from `(ontology_id, weight_sum, [(token, weight), ...])` rows."""
+        np, sparse = _ensure_scipy()
+        ids: List[int] = []
+        lengths: List[float] = []
+        vocab: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for oid, weight_sum, postings in docs:
+            for token, weight in postings:
+                indices.append(vocab.setdefault(token, len(vocab)))
+                data.append(weight)
+            ids.append(oid)
+            lengths.append(weight_sum)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(ids), len(vocab)),
+        )
+        matrix.sort_indices()
+        return cls(np.asarray(ids, dtype=np.int64), vocab, matrix, np.asarray(lengths, dtype=np.float64))
+
+    @classmethod
+    def from_token_weights(cls, docs: Iterable[Tuple[int, Dict[str, float]]]):
+        """Build from `(ontology_id, lexical._token_weights(json))` pairs."""
+        def rows():
+            for oid, weights in docs:
+                yield oid, sum(weights.values()), weights.items()
+        return cls.from_rows(rows())
+
+    @classmethod
+    def from_database(cls):
+        """Build from the persisted postings of `search_index`."""
+        lengths = dict(DocumentWeight.objects.values_list('ontology_id', 'weight_sum'))
+        postings = (TokenPosting.objects
+                    .order_by('ontology_id', 'position')
+                    .values_list('ontology_id', 'token', 'weight')
+                    .iterator(chunk_size=5000))
+
+        def rows():
+            current, bucket = None, []
+            for oid, token, weight in postings:
+                if oid != current:
+                    if current is not None:
+                        yield current, lengths.get(current, 0.0), bucket
+                    current, bucket = oid, []
+                bucket.append((token, weight))
+            if current is not None:
+                yield current, lengths.get(current, 0.0), bucket
+        return cls.from_rows(rows())
+
+
+class _SparseScorer:
+    name = ''
+
+    def __init__(self, corpus: SparseCorpus):
+        self.corpus = corpus
+        self.matrix = self._weight_matrix(corpus)
+
+    def _weight_matrix(self, corpus):
+        raise NotImplementedError
+
+    def _query_vector(self, columns):
+        raise NotImplementedError
+
+    def scores(self, text: str):
+        """Score `text` against every document; returns a dense vector aligned with `corpus.ids`."""
+        np, _ = _ensure_scipy()
+        columns = sorted({self.corpus.vocab[t] for t in _tokens(text) if t in self.corpus.vocab})
+        if not columns:
+            return np.zeros(len(self.corpus.ids), dtype=np.float64)
+        return self.matrix @ self._query_vector(columns)
+
+    def top_k(self, text: str, k: int = 5) -> List[Tuple[int, float]]:
+        np, _ = _ensure_scipy()
+        if k <= 0:
+            return []
+        scores = self.scores(text)
+        positive = np.flatnonzero(scores > 0)
+        if positive.size > k:
+            positive = positive[np.argpartition(-scores[positive], k - 1)[:k]]
+        # highest score first, ties broken by ontology id like the legacy sort
+        order = np.lexsort((self.corpus.ids[positive], -scores[positive]))
+        picked = positive[order]
+        return [(int(self.corpus.ids[i]), float(scores[i])) for i in picked]
+
+
+class Bm25Scorer(_SparseScorer):
+    """Okapi BM25 with the accumulated field weights as term frequencies."""
+    name = 'bm25'
+
+    def __init__(self, corpus: SparseCorpus, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        super().__init__(corpus)
+
+    def _weight_matrix(self, corpus):
+        np, _ = _ensure_scipy()
+        m = corpus.matrix.copy()
+        n_docs = m.shape[0]
+        if not m.nnz:
+            return m
+        df = np.bincount(m.indices, minlength=m.shape[1])
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        avgdl = float(corpus.doc_lengths.mean()) or 1.0
+        rows = np.repeat(np.arange(n_docs), np.diff(m.indptr))
+        norm = self.k1 * (1.0 - self.b + self.b * corpus.doc_lengths[rows] / avgdl)
+        tf = m.data
+        m.data = idf[m.indices] * tf * (self.k1 + 1.0) / (tf + norm)
+        return m
+
+    def _query_vector(self, columns):
+        np, _ = _ensure_scipy()
+        q = np.zeros(self.matrix.shape[1], dtype=np.float64)
+        q[columns] = 1.0
+        return q
+
+
+class TfidfScorer(_SparseScorer):
+    """Cosine similarity between L2-normalized TF-IDF vectors."""
+    name = 'tfidf'
+
+    def _weight_matrix(self, corpus):
+        np, sparse = _ensure_scipy()
+        m = corpus.matrix.copy()
+        n_docs = m.shape[0]
+        df = np.bincount(m.indices, minlength=m.shape[1])
+        self.idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+        m.data = m.data * self.idf[m.indices]
+        norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms) @ m
+
+    def _query_vector(self, columns):
+        np, _ = _ensure_scipy()
+        q = np.zeros(self.matrix.shape[1], dtype=np.float64)
+        q[columns] = self.idf[columns]
+        return q / np.linalg.norm(q)
+
+
+SPARSE_SCORERS = {cls.name: cls for cls in (Bm25Scorer, TfidfScorer)}
+SCORERS = (DEFAULT_SCORER,) + tuple(SPARSE_SCORERS)
+
+# Process-wide cache of the loaded corpus and scorers; reloaded when the
+# indexed documents change.
+_lock = threading.Lock()
+_state = {'fingerprint': None, 'corpus': None, 'scorers': {}}
+
+
+def resolve_scorer_name(name: Optional[str] = None) -> str:
+    """Return the scorer to use, raising ValueError for unknown names."""
+    name = (name or getattr(settings, 'LEXICAL_SCORER', DEFAULT_SCORER) or DEFAULT_SCORER).strip().lower()
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer '{name}', expected one of: {', '.join(SCORERS)}")
+    return name
+
+
+def _corpus_fingerprint():
+    agg = DocumentWeight.objects.aggregate(n=Count('pk'), last=Max('indexed_at'))
+    return agg['n'], agg['last']
+
+
+def get_scorer(name: str):
+    """Return a ready sparse scorer for `name`, building the matrix if stale."""
+    fingerprint = _corpus_fingerprint()
+    with _lock:
+        if _state['fingerprint'] != fingerprint:
+            _state['corpus'] = SparseCorpus.from_database()
+            _state['scorers'] = {}
+            _state['fingerprint'] = fingerprint
+        scorer = _state['scorers'].get(name)
+        if scorer is None:
+            scorer = SPARSE_SCORERS[name](_state['corpus'])
+            _state['scorers'][name] = scorer
+        return scorer
+
+
+def query(text: str, k: int = 5, scorer: Optional[str] = None) -> List[dict]:
+    """Top-k ontologies for `text` using the selected scoring engine."""
+    name = resolve_scorer_name(scorer)
+    np, _ = _ensure_scipy()
+    if name == DEFAULT_SCORER or np is None:
+        return search_index.query(text, k=k)
+    top = get_scorer(name).top_k(text, k)
+    objs = Ontology.objects.in_bulk([oid for oid, _ in top])
+    results = []
+    for oid, score in top:
+        o = objs.get(oid)
+        if o is None:
+            continue
+        results.append({'id': oid, 'score': score, 'ontology': o.json or {}})
+    return results
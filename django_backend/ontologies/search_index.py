@@ -0,0 +1,124 @@
+"""Persistent inverted index for the local lexical scorer.
+
+`query_top_k_local` used to re-tokenize every stored ontology on every query.
+This module keeps a token -> (ontology_id, weight) postings table plus the
+per-document weight sums in the database, maintained from the `Ontology`
+signals, so a query only reads the postings of its own tokens. Scores are
+identical to `lexical._score_query_against_doc`.
+"""
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+
+from .lexical import _token_weights, _tokens
+from .models import DocumentWeight, Ontology, TokenPosting
+
+_TOKEN_MAX_LENGTH = TokenPosting._meta.get_field('token').max_length
+_BATCH_SIZE = 1000
+
+
+def _build_rows(ontology: Ontology):
+    token_weights = _token_weights(ontology.json or {})
+    doc_sum = 0.0
+    postings = []
+    for position, (token, weight) in enumerate(token_weights.items()):
+        doc_sum += weight
+        if len(token) > _TOKEN_MAX_LENGTH:
+            # cannot be matched by the indexed column; still counts towards doc_sum
+            continue
+        postings.append(TokenPosting(token=token, ontology_id=ontology.id, weight=weight, position=position))
+    return postings, DocumentWeight(ontology_id=ontology.id, weight_sum=doc_sum)
+
+
+def index_ontology(ontology: Ontology) -> None:
+    """(Re)index a single ontology, replacing any previous postings."""
+    postings, doc_weight = _build_rows(ontology)
+    with transaction.atomic():
+        TokenPosting.objects.filter(ontology_id=ontology.id).delete()
+        DocumentWeight.objects.filter(ontology_id=ontology.id).delete()
+        TokenPosting.objects.bulk_create(postings, batch_size=_BATCH_SIZE)
+        doc_weight.save(force_insert=True)
+
+
+def index_many(ontologies: Iterable[Ontology]) -> None:
+    """Index ontologies that have no postings yet (a bulk import batch)."""
+    postings: List[TokenPosting] = []
+    weights: List[DocumentWeight] = []
+    for o in ontologies:
+        p, w = _build_rows(o)
+        postings.extend(p)
+        weights.append(w)
+    with transaction.atomic():
+        TokenPosting.objects.bulk_create(postings, batch_size=_BATCH_SIZE)
+        DocumentWeight.objects.bulk_create(weights, batch_size=_BATCH_SIZE)
+
+
+def remove_ontology(ontology_id: int) -> None:
+    TokenPosting.objects.filter(ontology_id=ontology_id).delete()
+    DocumentWeight.objects.filter(ontology_id=ontology_id).delete()
+
+
+def rebuild(ontologies: Iterable[Ontology] = None) -> int:
+    """Drop and rebuild the whole index. Returns the number of documents indexed."""
+    if ontologies is None:
+        ontologies = Ontology.objects.order_by('id').iterator(chunk_size=_BATCH_SIZE)
+    count = 0
+    with transaction.atomic():
+        TokenPosting.objects.all().delete()
+        DocumentWeight.objects.all().delete()
+        postings: List[TokenPosting] = []
+        weights: List[DocumentWeight] = []
+        for o in ontologies:
+            p, w = _build_rows(o)
+            postings.extend(p)
+            weights.append(w)
+            count += 1
+            if len(postings) >= _BATCH_SIZE:
+                TokenPosting.objects.bulk_create(postings, batch_size=_BATCH_SIZE)
+                postings = []
+            if len(weights) >= _BATCH_SIZE:
+                DocumentWeight.objects.bulk_create(weights, batch_size=_BATCH_SIZE)
+                weights = []
+        TokenPosting.objects.bulk_create(postings, batch_size=_BATCH_SIZE)
+        DocumentWeight.objects.bulk_create(weights, batch_size=_BATCH_SIZE)
+    return count
+
+
+def score_documents(text: str) -> Dict[int, float]:
+    """Return {ontology_id: score} for every document with a positive score."""
+    q_tokens = set(_tokens(text))
+    if not q_tokens:
+        return {}
+    intersect: Dict[int, float] = {}
+    postings = (TokenPosting.objects
+                .filter(token__in=q_tokens)
+                .order_by('ontology_id', 'position')
+                .values_list('ontology_id', 'weight'))
+    for oid, weight in postings:
+        intersect[oid] = intersect.get(oid, 0.0) + weight
+    if not intersect:
+        return {}
+    doc_sums = dict(DocumentWeight.objects.filter(ontology_id__in=list(intersect)).values_list('ontology_id', 'weight_sum'))
+    scores = {}
+    for oid, inter in intersect.items():
+        doc_sum = doc_sums.get(oid, 0.0)
+        if doc_sum <= 0:
+            continue
+        score = float(inter / (doc_sum + len(q_tokens)))
+        if score > 0:
+            scores[oid] = score
+    return scores
+
+
+def query(text: str, k: int = 5) -> List[dict]:
+    """Top-k ontologies for `text`, shaped like the legacy `query_top_k_local`."""
+    scores = score_documents(text)
+    top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+    objs = Ontology.objects.in_bulk([oid for oid, _ in top])
+    results = []
+    for oid, score in top:
+        o = objs.get(oid)
+        if o is None:
+            continue
+        results.append({'id': oid, 'score': score, 'ontology': o.json or {}})
+    return results
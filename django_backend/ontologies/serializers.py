@@ -2,6 +2,17 @@ from rest_framework import serializers
 from .models import Ontology
 
 class OntologySerializer(serializers.ModelSerializer):
+    # the model column is nullable only because compressed rows keep it NULL
+    json = serializers.JSONField()
+
     class Meta:
         model = Ontology
         fields = ['id', 'filename', 'source', 'json', 'created_at']
+
+    def __init__(self, *args, **kwargs):
+        # optional `fields=[...]` restricts the output to a subset (sparse fieldsets)
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
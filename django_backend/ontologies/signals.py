@@ -1,49 +1,121 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
+import logging
 import threading
-import time
+from contextlib import contextmanager
 from .models import Ontology
-from . import faiss_index
+from . import index_jobs
+from . import search_index
+from . import graph_store
+from . import entities
+from . import generation
+from . import components
+from . import normalization
+from . import payload_codec
 
-# Debounce rebuilds: if multiple saves/deletes happen in quick succession,
-# only perform one rebuild after the quiet period. This prevents thrashing
-# the web worker at import/save time.
-_debounce_lock = threading.Lock()
-_debounce_timer = None
-_DEBOUNCE_SECONDS = 2.0
+logger = logging.getLogger(__name__)
 
+_state = threading.local()
 
-def _schedule_rebuild():
-    global _debounce_timer
 
-    def _worker():
-        # small sleep to collect additional events
-        time.sleep(_DEBOUNCE_SECONDS)
+@contextmanager
+def suppressed():
+    """Skip the Ontology handlers in this thread, e.g. while a bulk import
+    maintains the derived tables itself and settles them once at the end."""
+    previous = getattr(_state, 'suppressed', False)
+    _state.suppressed = True
+    try:
+        yield
+    finally:
+        _state.suppressed = previous
+
+
+def _is_suppressed() -> bool:
+    return getattr(_state, 'suppressed', False)
+
+
+@receiver(pre_save, sender=Ontology)
+def before_save_ontology(sender, instance, **kwargs):
+    if _is_suppressed():
+        return
+    # remember the stored form so the graph store can retract what this
+    # ontology asserted before the update
+    previous = None
+    if instance.pk is not None:
         try:
-            faiss_index.build_index()
+            row = Ontology.objects.filter(pk=instance.pk).values_list('normalized', 'json', 'payload').first()
+            if row:
+                previous = row[0] if row[0] is not None else normalization.normalize(payload_codec.resolve(*row[1:]), record=False)
         except Exception:
-            # never let signal handlers raise
-            pass
-
-    with _debounce_lock:
-        if _debounce_timer and _debounce_timer.is_alive():
-            # already scheduled
-            return
-        _debounce_timer = threading.Thread(target=_worker, daemon=True)
-        _debounce_timer.start()
+            previous = None
+    instance._previous_normalized = previous
 
 
 @receiver(post_save, sender=Ontology)
 def after_save_ontology(sender, instance, **kwargs):
+    if _is_suppressed():
+        return
+    # keep the lexical inverted index in step with the row; this is cheap
+    # (one document) so it runs inline rather than in the index worker
     try:
-        _schedule_rebuild()
+        search_index.index_ontology(instance)
     except Exception:
         pass
+    try:
+        entities.sync(instance)
+    except Exception:
+        logger.exception('entity sync failed for ontology %s', instance.id)
+    try:
+        graph_store.apply(instance.id, getattr(instance, '_previous_normalized', None), instance.normalized)
+    except Exception:
+        logger.exception('graph store update failed for ontology %s', instance.id)
+    # bump last so readers that see the new generation also see the new data
+    new_generation = None
+    try:
+        new_generation = generation.bump()
+    except Exception:
+        logger.exception('corpus generation bump failed')
+    try:
+        components.ontology_changed(getattr(instance, '_previous_normalized', None), instance.normalized, new_generation)
+    except Exception:
+        logger.exception('component index update failed for ontology %s', instance.id)
+    # the FAISS indexes are updated out of process by `manage.py index_worker`
+    try:
+        index_jobs.enqueue(instance.id)
+    except Exception:
+        logger.exception('could not enqueue index update for ontology %s', instance.id)
 
 
 @receiver(post_delete, sender=Ontology)
 def after_delete_ontology(sender, instance, **kwargs):
+    if _is_suppressed():
+        return
+    # postings normally go with the row via CASCADE; this covers raw deletes
     try:
-        _schedule_rebuild()
+        search_index.remove_ontology(instance.id)
     except Exception:
         pass
+    try:
+        previous = normalization.of(instance)
+    except Exception:
+        logger.exception('could not read the stored form of ontology %s', instance.id)
+        previous = None
+    try:
+        graph_store.apply(instance.id, previous, None)
+    except Exception:
+        logger.exception('graph store update failed for ontology %s', instance.id)
+    # bump last so readers that see the new generation also see the new data
+    new_generation = None
+    try:
+        new_generation = generation.bump()
+    except Exception:
+        logger.exception('corpus generation bump failed')
+    try:
+        components.ontology_changed(previous, None, new_generation)
+    except Exception:
+        logger.exception('component index update failed for ontology %s', instance.id)
+    # the FAISS indexes are updated out of process by `manage.py index_worker`
+    try:
+        index_jobs.enqueue(instance.id)
+    except Exception:
+        logger.exception('could not enqueue index update for ontology %s', instance.id)
@@ -0,0 +1,115 @@
+"""Synthetic ontology corpora for the benchmark management commands."""
+import itertools
+import random
+from typing import Iterator, List, Tuple
+
+_TYPES = ['Person', 'Organization', 'Location', 'Concept', 'Event', 'Product']
+_RELATIONS = ['related_to', 'part_of', 'located_in', 'works_for', 'develops', 'mentions']
+
+
+def vocabulary(size: int = 20000, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def ontologies(n: int, nodes_per_doc: int = 12, edges_per_doc: int = 16,
+               entity_pool: int = 50000, seed: int = 0) -> Iterator[dict]:
+    """Yield `n` ontology payloads shaped like the generator's output.
+
+    Labels draw from a Zipf-like vocabulary so a few tokens are very common,
+    and node ids come from a shared pool so documents overlap.
+    """
+    rng = random.Random(seed)
+    words = vocabulary(seed=seed)
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(len(words))))
+    for _ in range(n):
+        ids = [f'E{rng.randrange(entity_pool)}' for _ in range(nodes_per_doc)]
+        nodes = []
+        for nid in ids:
+            label = ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(1, 3)))
+            nodes.append({
+                'id': nid,
+                'label': label,
+                'type': rng.choice(_TYPES),
+                'description': ' '.join(rng.choices(words, cum_weights=cum_weights, k=8)),
+            })
+        relations = [
+            {'source': rng.choice(ids), 'target': rng.choice(ids), 'relation': rng.choice(_RELATIONS)}
+            for _ in range(edges_per_doc)
+        ]
+        yield {'nodes': nodes, 'relations': relations}
+
+
+def queries(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    words = vocabulary(seed=0)
+    head = words[:2000]
+    return [' '.join(rng.sample(head, rng.randint(1, 4))) for _ in range(n)]
+
+
+def entity_names(n: int, max_variants: int = 4, seed: int = 0) -> Tuple[List[str], List[int]]:
+    """About `n` entity names written the ways different documents write them.
+
+    Returns the names and, for each, the index of the entity it names:
+    variants differ in case, spacing, punctuation, accents, a legal suffix or
+    a dropped letter. (Word order is not varied: "Dog bites man" is not "Man
+    bites dog".)
+    """
+    rng = random.Random(seed)
+    words = vocabulary(seed=seed)
+    suffixes = [' Inc', ' Inc.', ', Ltd', ' Corp', ' LLC']
+
+    def variant(base: str) -> str:
+        kind = rng.randrange(7)
+        if kind == 0:
+            return base.lower()
+        if kind == 1:
+            return base.upper()
+        if kind == 2:
+            return base.replace(' ', '')
+        if kind == 3:
+            return base.replace(' ', '-')
+        if kind == 4:
+            return base.replace('e', 'é', 1) if 'e' in base else base + '.'
+        if kind == 5 and len(base) > 12:
+            i = rng.randrange(1, len(base) - 1)
+            return base[:i] + base[i + 1:]
+        return base + rng.choice(suffixes)
+
+    names: List[str] = []
+    truth: List[int] = []
+    seen = set()
+    entity = 0
+    while len(names) < n:
+        base = ' '.join(w.capitalize() for w in rng.sample(words, rng.randint(1, 4)))
+        if rng.random() < 0.2:
+            base += f' {rng.randint(1, 20)}'
+        if base in seen:
+            continue
+        seen.add(base)
+        for name in dict.fromkeys([base] + [variant(base) for _ in range(rng.randint(0, max_variants))]):
+            names.append(name)
+            truth.append(entity)
+        entity += 1
+    order = list(range(len(names)))
+    rng.shuffle(order)
+    return [names[i] for i in order], [truth[i] for i in order]
+
+
+def embeddings(n: int, dim: int = 384, clusters: int = 256, spread: float = 0.35, seed: int = 0):
+    """`n` unit-length float32 vectors around `clusters` random centres.
+
+    Real sentence embeddings are far from uniform; clustered data gives ANN
+    indexes a realistic recall/latency trade-off.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
@@ -0,0 +1,112 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    # the test database is rolled back between tests, so the corpus
+    # generation repeats; results cached under it must not leak across tests
+    for cache in caches.all():
+        cache.clear()
+    yield
+
+
+class FakeGenerator:
+    """Local stand-in for the Ontology-Generator space.
+
+    `responses` maps a path to `(status, body)`, or to a list of them that is
+    answered in turn (the last one repeats); unknown paths answer 404. Every
+    request is recorded as `(path, body bytes)` and its client port in
+    `ports`, which tells connections apart.
+    """
+
+    def __init__(self):
+        self.responses = {'/generate': (200, {'ontology': {'nodes': ['generated'], 'relations': []}})}
+        self.requests = []
+        self.ports = []
+        self.delay = 0.0
+        self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+@pytest.fixture
+def fake_generator():
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    fake = FakeGenerator()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            fake.requests.append((self.path, body))
+            fake.ports.append(self.client_address[1])
+            time.sleep(fake.delay)
+            answer = fake.responses.get(self.path, (404, {'detail': 'not found'}))
+            if isinstance(answer, list):
+                answer = answer.pop(0) if len(answer) > 1 else answer[0]
+            code, payload = answer
+            data = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    fake.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=fake.server.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+class StubEncoder:
+    """SentenceTransformer stand-in: a bag of words, one dimension per word seen."""
+
+    dim = 64
+
+    def __init__(self):
+        self.words = {}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        import re
+
+        import numpy as np
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r'[a-z]+', text.lower()):
+                out[row, self.words.setdefault(word, len(self.words) % self.dim)] += 1
+        return out
+
+
+@pytest.fixture
+def stub_encoder(tmp_path, monkeypatch, settings):
+    """Serve both FAISS indexes from `tmp_path` with a `StubEncoder`."""
+    pytest.importorskip('faiss')
+    from django_backend.ontologies import entity_index, faiss_index
+
+    settings.FAISS_INDEX_DIR = str(tmp_path / 'index')
+    settings.EMBEDDING_CACHE_DIR = str(tmp_path / 'embedding_cache')
+    settings.FAISS_INDEX_FACTORY = 'flat'
+    encoder = StubEncoder()
+    for module in (faiss_index, entity_index):
+        monkeypatch.setattr(module, 'get_model', lambda: encoder)
+    monkeypatch.setattr(faiss_index, 'remote_query', None)
+    monkeypatch.setattr(faiss_index, '_documents', faiss_index.BundledIndex('documents'))
+    monkeypatch.setattr(entity_index, '_entities', faiss_index.BundledIndex('entities'))
+    return encoder
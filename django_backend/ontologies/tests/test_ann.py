@@ -0,0 +1,35 @@
+import pytest
+
+from django_backend.ontologies import ann, synthetic
+
+faiss = pytest.importorskip('faiss')
+np = pytest.importorskip('numpy')
+
+
+def _filled(factory, n=2000, dim=16):
+    data = synthetic.embeddings(n, dim, clusters=16)
+    index = ann.make_index(dim, factory)
+    if not index.is_trained:
+        index.train(data)
+    index.add_with_ids(data, np.arange(n, dtype=np.int64) * 10)
+    return index, data
+
+
+def test_presets_resolve_to_factory_strings():
+    assert ann.factory_string('flat', 10000, 384) == 'Flat'
+    assert ann.factory_string('ivf', 10000, 384) == 'IVF256,Flat'
+    assert ann.factory_string('ivfpq', 10000, 384) == 'IVF256,PQ48'
+    assert ann.factory_string('IVF64,SQ8', 10000, 384) == 'IVF64,SQ8'
+    # tiny corpora still get enough points per cell to train
+    assert ann.default_nlist(100) == 2
+
+
+@pytest.mark.parametrize('factory', ['Flat', 'IVF16,Flat', 'HNSW8'])
+def test_indexes_keep_external_ids(factory):
+    index, data = _filled(factory)
+    assert ann.is_id_index(index)
+    assert sorted(ann.stored_ids(index).tolist()) == list(range(0, 20000, 10))
+    params = ann.search_params(index, nprobe=16, ef_search=64)
+    _, found = index.search(data[:5], 1, params=params)
+    assert found[:, 0].tolist() == [0, 10, 20, 30, 40]
+    assert ann.supports_remove(index) == (factory != 'HNSW8')
@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+
+from django_backend.ontologies import bulk_import, generation
+from django_backend.ontologies.models import Entity, GraphNode, IndexJob, Ontology, TokenPosting
+
+
+def _record(i):
+    return {'filename': f'doc{i}.json', 'ontology': {'nodes': [f'n{i}', 'shared'], 'relations': [
+        {'source': f'n{i}', 'target': 'shared', 'relation': 'links'}]}}
+
+
+def test_json_array_is_decoded_across_reads(monkeypatch):
+    monkeypatch.setattr(bulk_import, '_READ_SIZE', 7)
+    body = json.dumps([_record(1), 12345, _record(2)]).encode()
+    got = list(bulk_import.records(io.BytesIO(body)))
+    assert [line for line, _ in got] == [1, 2, 3]
+    assert got[1][1] == 12345
+    assert got[2][1] == _record(2)
+
+    broken = list(bulk_import.records(io.BytesIO(b'[{"a": 1}, {"b": ')))
+    assert isinstance(broken[-1][1], Exception)
+
+
+@pytest.mark.django_db
+def test_bulk_endpoint_loads_batches_and_reports_rejected_lines():
+    lines = [json.dumps(_record(i)) for i in range(5)]
+    lines.insert(2, '{not json')
+    lines.insert(4, json.dumps({'filename': 'empty'}))
+    before = generation.current()
+    resp = Client().post('/api/ontologies/bulk/', data='\n'.join(lines).encode(),
+                         content_type='application/x-ndjson')
+    body = resp.json()
+    assert resp.status_code == 201, body
+    assert body['created'] == 5 and body['rejected'] == 2
+    assert [e['line'] for e in body['errors']] == [3, 5]
+    assert body['rows_per_s'] > 0
+
+    ids = list(Ontology.objects.values_list('id', flat=True))
+    assert len(ids) == 5
+    # derived tables are loaded, the generation moved once, one index job per row
+    assert Entity.objects.count() == 10
+    assert GraphNode.objects.count() == 6
+    assert TokenPosting.objects.filter(token='shared').count() == 5
+    assert generation.current() == before + 1
+    assert sorted(IndexJob.objects.values_list('ontology_id', flat=True)) == sorted(ids)
+
+    graph = Client().get('/api/graph/').json()
+    assert len(graph['nodes']) == 6
+
+
+@pytest.mark.django_db
+def test_import_command_reads_json_arrays(tmp_path):
+    path = tmp_path / 'ontologies.json'
+    path.write_text(json.dumps([_record(i) for i in range(7)] + ['nope']))
+    out = io.StringIO()
+    call_command('import_ontologies', str(path), '--batch-size', '3', stdout=out)
+    assert Ontology.objects.count() == 7
+    assert 'rows/s' in out.getvalue()
+    assert 'line 8: record must be a JSON object' in out.getvalue()
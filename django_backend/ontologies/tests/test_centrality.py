@@ -0,0 +1,91 @@
+import networkx as nx
+import numpy as np
+import pytest
+from django.test import Client, override_settings
+
+from django_backend.ontologies import centrality, graph_store
+from django_backend.ontologies.models import GraphCentrality, GraphEdge, GraphNode, Ontology
+
+HUB = {
+    'nodes': ['hub', 'a', 'b', 'c', 'd'],
+    'relations': [
+        {'source': 'a', 'target': 'hub'}, {'source': 'b', 'target': 'hub'},
+        {'source': 'c', 'target': 'hub'}, {'source': 'hub', 'target': 'a'},
+        {'source': 'c', 'target': 'd'}, {'source': 'c', 'target': 'd', 'relation': 'cites'},
+    ],
+}
+
+
+def test_pagerank_matches_networkx():
+    rng = np.random.default_rng(7)
+    src, dst = rng.integers(0, 40, 150), rng.integers(0, 40, 150)
+    pairs = sorted(set(zip(src.tolist(), dst.tolist())))
+    src, dst = np.array([s for s, _ in pairs]), np.array([t for _, t in pairs])
+    ranks, iterations = centrality.pagerank(src, dst, 40)
+
+    g = nx.DiGraph()
+    g.add_nodes_from(range(40))
+    g.add_edges_from(pairs)
+    expected = nx.pagerank(g, alpha=0.85)
+    assert 0 < iterations < 100
+    assert np.allclose(ranks, [expected[i] for i in range(40)], atol=1e-6)
+    assert ranks.sum() == pytest.approx(1.0)
+
+
+@pytest.mark.django_db
+def test_refresh_stores_scores_and_due_follows_the_corpus():
+    assert not centrality.due()
+    Ontology.objects.create(json=HUB)
+    assert centrality.due()
+
+    scores = centrality.refresh()
+    assert scores.nodes == 5 and not centrality.due()
+    rows = {n['id']: (p, i, o) for n, p, i, o in
+            GraphNode.objects.values_list('data', 'pagerank', 'in_degree', 'out_degree')}
+    assert rows['hub'][1:] == (3, 1) and rows['c'][1:] == (0, 2) and rows['d'][1:] == (1, 0)
+    assert max(rows, key=lambda nid: rows[nid][0]) == 'hub'
+
+    Ontology.objects.create(json={'nodes': ['e']})
+    assert not centrality.due()  # refreshed less than CENTRALITY_REFRESH_SECONDS ago
+    with override_settings(CENTRALITY_REFRESH_SECONDS=0):
+        assert centrality.due()
+
+    graph_store.rebuild()
+    assert not GraphCentrality.objects.exists()
+
+
+@pytest.mark.django_db
+def test_graph_top_returns_the_best_ranked_nodes_and_their_edges():
+    Ontology.objects.create(json=HUB)
+    centrality.refresh()
+    client = Client()
+
+    node_keys = dict(GraphNode.objects.values_list('data__id', 'key'))
+    assert all((s, t) == (node_keys[d['source']], node_keys[d['target']])
+               for s, t, d in GraphEdge.objects.values_list('source_key', 'target_key', 'data'))
+
+    graph = client.get('/api/graph/?top=2&rank=in_degree').json()
+    assert [(n['id'], n['in_degree']) for n in graph['nodes']] == [('hub', 3), ('a', 1)]
+    assert [(r['source'], r['target']) for r in graph['relations']] == [('a', 'hub'), ('hub', 'a')]
+    assert graph['rank']['by'] == 'in_degree' and graph['rank']['total_nodes'] == 5
+
+    first = client.get('/api/graph/?top=3')
+    assert first.json()['nodes'][0]['id'] == 'hub' and 'pagerank' in first.json()['nodes'][0]
+    assert client.get('/api/graph/?top=3', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    centrality.refresh()
+    assert client.get('/api/graph/?top=3', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 200
+
+    assert client.get('/api/graph/?top=0').status_code == 400
+    assert client.get('/api/graph/?top=many').status_code == 400
+    assert client.get('/api/graph/?top=3&rank=betweenness').status_code == 400
+    assert len(client.get('/api/graph/').json()['nodes']) == 5
+
+
+@pytest.mark.django_db
+def test_search_graph_top_prunes_the_neighbourhood():
+    Ontology.objects.create(json=HUB)
+    centrality.refresh()
+    body = Client().get('/api/search_graph/?q=hub&scorer=bm25&hops=2&top=2&rank=in_degree').json()
+    assert [n['id'] for n in body['nodes']] == ['hub', 'a']
+    assert {(r['source'], r['target']) for r in body['relations']} <= {('a', 'hub'), ('hub', 'a')}
+    assert body['rank']['top'] == 2
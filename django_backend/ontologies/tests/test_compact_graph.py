@@ -0,0 +1,61 @@
+import random
+from collections import deque
+
+import networkx as nx
+import pytest
+
+from django_backend.ontologies import compact_graph
+from django_backend.ontologies.compact_graph import CompactGraph
+from django_backend.ontologies.models import Ontology
+
+
+def _nx_expand(node_ids, edges, seeds, hops):
+    """Reference: the DiGraph BFS search_graph used to run."""
+    G = nx.DiGraph()
+    G.add_nodes_from(node_ids)
+    for s, t, rel in edges:
+        G.add_edge(s, t, relation=rel)
+    nodes, out = set(), set()
+    q = deque()
+    for s in seeds:
+        if s in G:
+            q.append((s, 0))
+            nodes.add(s)
+    while q:
+        node, depth = q.popleft()
+        if depth >= hops:
+            continue
+        for nbr in G.successors(node):
+            nodes.add(nbr)
+            out.add((node, nbr, G.edges[node, nbr]['relation']))
+            q.append((nbr, depth + 1))
+        for nbr in G.predecessors(node):
+            nodes.add(nbr)
+            out.add((nbr, node, G.edges[nbr, node]['relation']))
+            q.append((nbr, depth + 1))
+    return nodes, out
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_expand_matches_digraph_bfs(seed):
+    rng = random.Random(seed)
+    ids = [f'n{i}' for i in range(40)]
+    edges = [(rng.choice(ids), rng.choice(ids), rng.choice(['a', 'b'])) for _ in range(80)]
+    graph = CompactGraph.from_edges(ids, edges)
+    # a request only sees part of the corpus
+    sub = edges[:50]
+    edge_relations = {(s, t): rel for s, t, rel in sub}
+    seeds = rng.sample(ids, 3)
+    for hops in (0, 1, 2, 3):
+        assert compact_graph.expand(graph, seeds, hops, edge_relations) == _nx_expand(ids, sub, seeds, hops)
+
+
+@pytest.mark.django_db
+def test_shared_graph_refreshes_with_the_generation():
+    Ontology.objects.create(json={'nodes': ['A', 'B'], 'relations': [{'source': 'A', 'target': 'B'}]})
+    first = compact_graph.get()
+    assert compact_graph.get() is first
+    Ontology.objects.create(json={'nodes': ['C'], 'relations': [{'source': 'B', 'target': 'C'}]})
+    second = compact_graph.get()
+    assert second is not first
+    assert [second.ids[j] for j in second.successors(second.index['B'])] == ['C']
@@ -0,0 +1,30 @@
+import pytest
+from django.test import Client
+
+from django_backend.ontologies import components
+from django_backend.ontologies.models import Ontology
+
+
+@pytest.mark.django_db
+def test_index_is_extended_in_place_and_rebuilt_after_deletes():
+    Ontology.objects.create(json={'nodes': ['A', 'B'], 'relations': [{'source': 'A', 'target': 'B'}]})
+    index = components.get()
+    second = Ontology.objects.create(json={'nodes': ['C'], 'relations': [{'source': 'C', 'target': 'B'}]})
+    assert components.get() is index
+    assert index.component('A') == index.component('C')
+
+    second.delete()
+    rebuilt = components.get()
+    assert rebuilt is not index
+    assert rebuilt.component('A') != rebuilt.component('C')
+
+
+@pytest.mark.django_db
+def test_remote_query_keeps_relationships_in_hit_components():
+    Ontology.objects.create(json={
+        'nodes': ['alpha', 'beta'],
+        'relations': [{'source': 'alpha', 'target': 'beta'}, {'source': 'gamma', 'target': 'alpha'}],
+    })
+    data = Client().post('/api/query/', {'query': 'alpha'}, content_type='application/json').json()
+    assert [e['id'] for e in data['entities']] == ['alpha', 'beta']
+    assert [(r['source'], r['target']) for r in data['relationships']] == [('alpha', 'beta'), ('gamma', 'alpha')]
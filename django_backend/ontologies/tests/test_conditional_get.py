@@ -0,0 +1,44 @@
+import pytest
+from django.test import Client, override_settings
+
+from django_backend.ontologies import entity_index, index_bundle
+from django_backend.ontologies.faiss_index import BundledIndex
+from django_backend.ontologies.models import Ontology
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url,params', [
+    ('/api/graph/', {}),
+    ('/api/search_graph/', {'q': 'alpha', 'hops': '2'}),
+    ('/api/ontologies/', {'exclude': 'json'}),
+])
+def test_etag_revalidates_until_the_corpus_changes(url, params):
+    c = Client()
+    Ontology.objects.create(json={'nodes': ['alpha']})
+    first = c.get(url, params)
+    etag = first['ETag']
+    assert c.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert c.get(url, {**params, 'extra': '1'}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    Ontology.objects.create(json={'nodes': ['beta']})
+    again = c.get(url, params, HTTP_IF_NONE_MATCH=etag)
+    assert again.status_code == 200
+    assert again['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_search_graph_etag_changes_when_an_index_bundle_is_published(tmp_path, monkeypatch):
+    faiss = pytest.importorskip('faiss')
+    np = pytest.importorskip('numpy')
+    monkeypatch.setattr(entity_index, '_entities', BundledIndex('entities'))
+    c = Client()
+    Ontology.objects.create(json={'nodes': ['alpha']})
+    with override_settings(FAISS_INDEX_DIR=str(tmp_path)):
+        etag = c.get('/api/search_graph/', {'q': 'alpha'})['ETag']
+        assert c.get('/api/search_graph/', {'q': 'alpha'}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        index = faiss.IndexIDMap(faiss.IndexFlatIP(4))
+        index.add_with_ids(np.eye(4, dtype='float32')[:1], np.asarray([1]))
+        index_bundle.publish('entities', index, {'ids': np.asarray([1])}, model='m', generation=0)
+        again = c.get('/api/search_graph/', {'q': 'alpha'}, HTTP_IF_NONE_MATCH=etag)
+        assert again.status_code == 200 and again['ETag'] != etag
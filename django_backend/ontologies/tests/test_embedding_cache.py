@@ -0,0 +1,88 @@
+import pytest
+
+from django_backend.ontologies.embedding_cache import EmbeddingCache
+
+np = pytest.importorskip('numpy')
+
+
+class CountingEncoder:
+    """Deterministic stand-in that records which texts it was asked to encode."""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.asarray([[len(t) + i for i in range(self.dim)] for t in texts], dtype=np.float32)
+
+
+def test_only_new_texts_are_encoded_and_hits_survive_reopening(tmp_path):
+    encoder = CountingEncoder(4)
+    cache = EmbeddingCache(str(tmp_path), 'm', 4, capacity=10)
+    first = cache.encode(encoder, ['a', 'bb', 'a'])
+    assert encoder.calls == [['a', 'bb']]
+    assert first[0].tolist() == first[2].tolist() == [1, 2, 3, 4]
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), 'm', 4, capacity=10)
+    again = reopened.encode(encoder, ['bb', 'ccc'])
+    assert encoder.calls[-1] == ['ccc']
+    assert again[0].tolist() == first[1].tolist()
+    assert reopened.stats()['hits'] == 1 and reopened.stats()['misses'] == 1
+
+    other_model = EmbeddingCache(str(tmp_path), 'other', 4, capacity=10)
+    other_model.encode(encoder, ['bb'])
+    assert encoder.calls[-1] == ['bb']
+
+
+def test_least_recently_used_slots_are_reused(tmp_path):
+    encoder = CountingEncoder(2)
+    cache = EmbeddingCache(str(tmp_path), 'm', 2, capacity=2)
+    cache.encode(encoder, ['a'])
+    cache.encode(encoder, ['bb'])
+    cache.encode(encoder, ['a'])
+    cache.encode(encoder, ['ccc'])
+    assert cache.stats()['entries'] == 2
+    encoder.calls.clear()
+    cache.encode(encoder, ['a', 'bb', 'ccc'])
+    assert encoder.calls == [['bb']]
+
+
+def test_digests_ending_in_nul_are_evicted_cleanly(tmp_path):
+    encoder = CountingEncoder(2)
+    cache = EmbeddingCache(str(tmp_path), 'm', 2, capacity=2)
+    text = next(f't{i}' for i in range(10000) if cache.key(f't{i}').endswith(b'\x00'))
+    cache.encode(encoder, [text])
+    cache.encode(encoder, ['a'])
+    cache.encode(encoder, ['bbbbbbbbbb'])  # evicts `text`
+    encoder.calls.clear()
+    again = cache.encode(encoder, [text])
+    assert encoder.calls == [[text]] and again[0].tolist() == [len(text), len(text) + 1]
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), 'm', 2, capacity=2)
+    assert reopened.stats()['entries'] == 2
+    encoder.calls.clear()
+    assert reopened.encode(encoder, [text])[0].tolist() == [len(text), len(text) + 1]
+    assert encoder.calls == []
+
+
+def test_a_killed_build_never_maps_a_key_to_another_texts_vector(tmp_path):
+    encoder = CountingEncoder(2)
+    cache = EmbeddingCache(str(tmp_path / 'm'), 'm', 2, capacity=2)
+    cache.encode(encoder, ['a', 'bb'])
+    cache.flush()
+    cache.encode(encoder, ['ccc'])  # evicts 'a'; no flush, as if the build was killed here
+
+    # a restarted (or concurrent) process sees the eviction and the new entry
+    other = EmbeddingCache(str(tmp_path / 'm'), 'm', 2, capacity=2)
+    encoder.calls.clear()
+    out = other.encode(encoder, ['a', 'ccc'])
+    assert encoder.calls == [['a']]
+    assert out.tolist() == [[1, 2], [3, 4]]
+
+    # and the first one picks up what the other wrote
+    encoder.calls.clear()
+    assert cache.encode(encoder, ['a'])[0].tolist() == [1, 2]
+    assert encoder.calls == []
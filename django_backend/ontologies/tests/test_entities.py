@@ -0,0 +1,37 @@
+import pytest
+from django.test import Client
+
+from django_backend.ontologies import entities
+from django_backend.ontologies.models import Entity, Ontology, Relation
+
+DOC = {
+    'nodes': [{'id': 'OpenAI', 'label': 'OpenAI', 'type': 'Organization'}, 'GPT'],
+    'relations': [{'source': 'OpenAI', 'target': 'GPT', 'relation': 'develops'}],
+}
+
+
+@pytest.mark.django_db
+def test_rows_follow_the_ontology():
+    o = Ontology.objects.create(filename='a.json', json=DOC)
+    assert list(Entity.objects.filter(ontology=o).values_list('entity_id', 'type')) == [
+        ('OpenAI', 'Organization'), ('GPT', 'Entity')]
+    assert Relation.objects.get(source='OpenAI', relation='develops', target='GPT').ontology_id == o.id
+    Entity.objects.all().delete()
+    assert entities.rebuild() == 1
+    assert Entity.objects.count() == 2
+    o.delete()
+    assert not Entity.objects.exists() and not Relation.objects.exists()
+
+
+@pytest.mark.django_db
+def test_query_views_read_normalized_rows():
+    Ontology.objects.create(filename='a.json', json=DOC)
+    data = Client().post('/api/query/', {'query': 'openai'}, content_type='application/json').json()
+    assert data['entities'][0] == {'id': 'OpenAI', 'label': 'OpenAI', 'type': 'Organization', 'properties': DOC['nodes'][0]}
+    assert data['entities'][1] == {'id': 'GPT', 'label': 'GPT', 'type': 'Entity'}
+    assert data['relationships'] == [{'source': 'OpenAI', 'target': 'GPT', 'type': 'develops', 'properties': DOC['relations'][0]}]
+
+    graph = Client().get('/api/search_graph/', {'q': 'openai'}).json()
+    assert graph['traversal']['seeds'] == ['OpenAI']
+    assert {n['id'] for n in graph['nodes']} == {'OpenAI', 'GPT'}
+    assert graph['relations'] == [{'source': 'OpenAI', 'target': 'GPT', 'relation': 'develops'}]
@@ -0,0 +1,42 @@
+import pytest
+from django.test import Client
+
+from django_backend.ontologies import entity_index
+from django_backend.ontologies.models import Ontology
+
+
+def test_vector_ids_round_trip_and_group_by_ontology():
+    vid = entity_index.vector_id(12345, entity_index.RELATION, 77)
+    assert entity_index.decode(vid) == (12345, entity_index.RELATION, 77)
+    first = entity_index.vector_id(9, entity_index.ENTITY, 0)
+    last = entity_index.vector_id(9, entity_index.RELATION, 2 ** 20 - 1)
+    assert entity_index.decode(first)[0] == entity_index.decode(last)[0] == 9
+    assert last < entity_index.vector_id(10, entity_index.ENTITY, 0)
+
+
+def test_embedded_text_and_seed_grouping():
+    data = {'id': 'apple', 'label': 'Apple', 'type': 'Fruit'}
+    assert entity_index.entity_text(data, {'id': 'apple', 'description': 'a pome'}) == 'Apple (Fruit): a pome'
+    assert entity_index.entity_text(data, 'apple') == 'Apple (Fruit)'
+    assert entity_index.relation_text({'source': 'apple', 'relation': 'grows_on', 'target': 'tree'}) == 'apple grows_on tree'
+
+    hits = [
+        {'ontology_id': 1, 'node_ids': ['apple']},
+        {'ontology_id': 2, 'node_ids': ['car', 'engine']},
+        {'ontology_id': 1, 'node_ids': ['apple', 'tree']},
+    ]
+    assert entity_index.seeds_by_ontology(hits) == {1: ['apple', 'tree'], 2: ['car', 'engine']}
+
+
+@pytest.mark.django_db
+def test_search_graph_falls_back_to_substring_seeds_per_hit(stub_encoder):
+    indexed = Ontology.objects.create(json={'nodes': ['omega']})
+    entity_index.build_index(force=True)
+    assert {hit['ontology_id'] for hit in entity_index.query('alpha')} == {indexed.id}
+
+    # not in the entity index yet, and the only lexical hit
+    fresh = Ontology.objects.create(json={'nodes': ['alpha', 'beta'], 'relations': [{'source': 'alpha', 'target': 'beta'}]})
+    body = Client().get('/api/search_graph/', {'q': 'alpha', 'scorer': 'bm25'}).json()
+    assert [(m['id'], m['matched_ids']) for m in body['matches']] == [(fresh.id, ['alpha'])]
+    assert body['traversal']['seeds'] == ['alpha']
+    assert {n['id'] for n in body['nodes']} == {'alpha', 'beta'}
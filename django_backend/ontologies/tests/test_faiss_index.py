@@ -0,0 +1,73 @@
+import pytest
+
+from django_backend.ontologies import faiss_index
+from django_backend.ontologies.faiss_index import BundledIndex, split_text
+from django_backend.ontologies.models import Ontology
+
+
+def test_long_texts_are_split_on_whitespace_within_the_limit():
+    assert split_text('short', 10) == ['short']
+    text = ' '.join(f'word{i}' for i in range(200))
+    chunks = split_text(text, 64)
+    assert ''.join(chunks) == text
+    assert all(len(c) <= 64 for c in chunks)
+    assert all(c.startswith(' ') or c == chunks[0] for c in chunks)
+    assert split_text('x' * 25, 10) == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+def _ids(index, encoder, text, k=5):
+    return [vid for vid, _ in index.search(encoder, text, k)]
+
+
+@pytest.mark.django_db
+def test_bundled_index_updates_in_place_and_republishes(stub_encoder):
+    np = pytest.importorskip('numpy')
+    index = BundledIndex('scratch')
+    index.rebuild(stub_encoder, [(1, 'alpha'), (2, 'beta'), (3, 'gamma')])
+    assert index.index.ntotal == 3
+    assert _ids(index, stub_encoder, 'beta', k=1) == [2]
+
+    # edit: the old vector of 2 is replaced, not duplicated
+    index.update(stub_encoder, np.asarray([2]), [(2, 'delta')])
+    assert index.index.ntotal == 3
+    assert _ids(index, stub_encoder, 'delta', k=1) == [2]
+    assert max(score for _, score in index.search(stub_encoder, 'beta', 3)) < 0.5
+
+    # delete, on a copy memory-mapped from the published bundle
+    mapped = BundledIndex('scratch')
+    mapped.refresh()
+    assert mapped.version == index.version and mapped.mmapped
+    mapped.update(stub_encoder, np.asarray([1]), [])
+    assert mapped.index.ntotal == 2 and not mapped.mmapped
+    assert sorted(_ids(mapped, stub_encoder, 'alpha')) == [2, 3]
+
+    index.refresh()
+    assert index.version == mapped.version and index.index.ntotal == 2
+
+
+@pytest.mark.django_db
+def test_apply_changes_adds_edits_and_deletes_documents(stub_encoder):
+    alpha = Ontology.objects.create(json={'nodes': ['alpha']})
+    beta = Ontology.objects.create(json={'nodes': ['beta']})
+    faiss_index.build_index(force=True)
+    documents = faiss_index._documents
+    assert documents.index.ntotal == 2
+    assert [hit['id'] for hit in faiss_index.query_top_k('beta', k=1)] == [beta.id]
+
+    gamma = Ontology.objects.create(json={'nodes': ['gamma']})
+    faiss_index.apply_changes([gamma.id])
+    assert documents.index.ntotal == 3
+    assert [hit['id'] for hit in faiss_index.query_top_k('gamma', k=1)] == [gamma.id]
+
+    beta.json = {'nodes': ['delta']}
+    beta.save()
+    faiss_index.apply_changes([beta.id])
+    assert documents.index.ntotal == 3
+    assert [hit['id'] for hit in faiss_index.query_top_k('delta', k=1)] == [beta.id]
+    assert max(hit['score'] for hit in faiss_index.query_top_k('beta', k=3)) < 0.5
+
+    alpha_id = alpha.id
+    alpha.delete()
+    faiss_index.apply_changes([alpha_id])
+    assert documents.index.ntotal == 2
+    assert sorted(vid for vid, _ in documents.search(stub_encoder, 'alpha', 5)) == sorted([beta.id, gamma.id])
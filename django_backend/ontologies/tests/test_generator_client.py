@@ -0,0 +1,52 @@
+import io
+
+from django_backend.ontologies.generator_client import GeneratorClient
+
+ANSWER = {'ontology': {'nodes': ['a'], 'relations': []}}
+
+
+def _client(fake, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    return GeneratorClient(fake.url, timeout=5, **kwargs)
+
+
+def test_remembers_the_endpoint_that_answered_and_keeps_the_connection(fake_generator):
+    fake_generator.responses = {'/api/generate': (200, ANSWER)}
+    client = _client(fake_generator)
+    buffer = io.BytesIO(b'some document text')
+    tried = []
+    assert client.generate('doc.txt', buffer, on_attempt=tried.append) == ANSWER
+    assert client.generate('doc.txt', buffer) == ANSWER
+    assert tried == client.candidates[:2]
+    assert [path for path, _ in fake_generator.requests] == ['/generate', '/api/generate', '/api/generate']
+    # every attempt carries the whole file
+    assert all(b'some document text' in body for _, body in fake_generator.requests)
+    assert len(set(fake_generator.ports)) == 1
+
+
+def test_retries_unavailable_answers_with_the_same_body(fake_generator):
+    fake_generator.responses = {'/generate': [(503, {}), (503, {}), (200, ANSWER)]}
+    client = _client(fake_generator, retries=2)
+    assert client.generate('doc.txt', io.BytesIO(b'payload')) == ANSWER
+    assert [body.count(b'payload') for _, body in fake_generator.requests] == [1, 1, 1]
+
+
+def test_probes_again_when_the_remembered_endpoint_goes_away(fake_generator):
+    fake_generator.responses = {'/generate': (200, ANSWER)}
+    client = _client(fake_generator, retries=0)
+    assert client.generate('doc.txt', io.BytesIO(b'x')) == ANSWER
+    assert client.endpoint.endswith('/generate')
+
+    fake_generator.responses = {'/api/generate': (200, ANSWER)}
+    assert client.generate('doc.txt', io.BytesIO(b'x')) == ANSWER
+    assert client.endpoint.endswith('/api/generate')
+
+    fake_generator.responses = {}
+    assert client.generate('doc.txt', io.BytesIO(b'x')) is None
+    assert client.endpoint is None
+
+
+def test_budget_covers_every_retry_of_every_candidate(fake_generator):
+    client = GeneratorClient(fake_generator.url, timeout=30, connect_timeout=5, retries=2, backoff=0.5)
+    assert client.attempt_budget() == 3 * 35 + 2
+    assert client.budget() == 3 * client.attempt_budget()
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from django.test import Client
+
+from django_backend.ontologies import graph_store, normalization
+from django_backend.ontologies.models import GraphEdge, Ontology
+
+
+def _merge(payloads):
+    """Reference: the per-request merge aggregated_graph used to do."""
+    node_map, relation_set, relations = {}, set(), []
+    for data in payloads:
+        for n in data.get('nodes') or data.get('entities') or []:
+            nn = normalization.normalize_node(n)
+            if nn and nn.get('id') and nn['id'] not in node_map:
+                node_map[nn['id']] = nn
+        for r in data.get('relations') or data.get('edges') or []:
+            rr = normalization.normalize_relation(r)
+            if not rr or not rr.get('source') or not rr.get('target'):
+                continue
+            key = (rr['source'], rr['target'], rr['relation'])
+            if key not in relation_set:
+                relation_set.add(key)
+                relations.append(rr)
+    return {'nodes': list(node_map.values()), 'relations': relations}
+
+
+def _graph():
+    return Client().get('/api/graph/').json()
+
+
+def _expected():
+    return _merge(o.json for o in Ontology.objects.order_by('id'))
+
+
+@pytest.mark.django_db
+def test_store_matches_full_merge_through_updates_and_deletes():
+    a = Ontology.objects.create(json={'nodes': [{'id': 'A', 'label': 'Alpha'}, 'B'],
+                                      'relations': [{'source': 'A', 'target': 'B', 'relation': 'knows'}]})
+    b = Ontology.objects.create(json={'entities': [{'id': 'A', 'label': 'Other A'}, 'C'],
+                                      'edges': [{'from': 'A', 'to': 'B', 'label': 'knows'},
+                                                {'from': 'B', 'to': 'C'}]})
+    assert _graph() == _expected()
+
+    a.json = {'nodes': ['B', 'D'], 'relations': [{'source': 'B', 'target': 'D'}]}
+    a.save()
+    assert _graph() == _expected()
+
+    b.delete()
+    assert _graph() == _expected()
+
+
+@pytest.mark.django_db
+def test_delete_keeps_edges_still_asserted_elsewhere():
+    edge = {'source': 'A', 'target': 'B', 'relation': 'knows'}
+    first = Ontology.objects.create(json={'nodes': ['A', 'B'], 'relations': [edge]})
+    Ontology.objects.create(json={'nodes': ['A', 'B'], 'relations': [edge]})
+    assert GraphEdge.objects.get().ref_count == 2
+    first.delete()
+    assert GraphEdge.objects.get().ref_count == 1
+    assert _graph()['relations'] == [edge]
+
+
+@pytest.mark.django_db
+def test_streamed_graph_matches_buffered_response():
+    Ontology.objects.create(json={'nodes': ['A', 'B'], 'relations': [{'source': 'A', 'target': 'B'}]})
+    Ontology.objects.create(json={'nodes': ['B', 'C'], 'relations': [{'source': 'A', 'target': 'B'}]})
+    resp = Client().get('/api/graph/', {'stream': '1'})
+    streamed = json.loads(b''.join(resp.streaming_content))
+    assert streamed == _graph()
+
+    resp = Client().get('/api/graph/', {'stream': 'ndjson'})
+    lines = [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+    assert lines == [{'node': n} for n in streamed['nodes']] + [{'relation': r} for r in streamed['relations']]
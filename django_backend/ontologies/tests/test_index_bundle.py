@@ -0,0 +1,80 @@
+import os
+
+import pytest
+from django.test import override_settings
+
+from django_backend.ontologies import index_bundle
+
+faiss = pytest.importorskip('faiss')
+np = pytest.importorskip('numpy')
+
+
+def _index(ids, dim=4):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((len(ids), dim), dtype=np.float32)
+    index = faiss.IndexIDMap(faiss.IndexFlatL2(dim))
+    index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    return index, vectors
+
+
+def test_published_bundle_loads_memory_mapped_with_its_id_map(tmp_path):
+    with override_settings(FAISS_INDEX_DIR=str(tmp_path), FAISS_BUNDLE_KEEP=2):
+        assert index_bundle.load('documents') is None
+        index, vectors = _index([7, 3, 11])
+        version = index_bundle.publish('documents', index, {'ids': np.asarray([7, 3, 11])}, model='m', generation=4)
+        assert index_bundle.current_version('documents') == version
+
+        bundle = index_bundle.load('documents', verify_checksum=True)
+        assert bundle.version == version
+        assert bundle.manifest['model'] == 'm'
+        assert bundle.manifest['dimension'] == 4
+        assert bundle.manifest['generation'] == 4
+        assert list(bundle.ids) == [7, 3, 11]
+        _, found = bundle.index.search(vectors[1:2], 1)
+        assert found[0][0] == 3
+
+        for gen in (5, 6):
+            index_bundle.publish('documents', index, {'ids': np.asarray([7, 3, 11])}, model='m', generation=gen)
+        versions = [d for d in os.listdir(index_bundle.root_dir('documents')) if d.startswith('v')]
+        assert len(versions) == 2
+
+
+
+def test_prune_keeps_the_latest_published_bundles_of_a_generation(tmp_path):
+    with override_settings(FAISS_INDEX_DIR=str(tmp_path), FAISS_BUNDLE_KEEP=2):
+        index, _ = _index([1, 2])
+        root = index_bundle.root_dir('documents')
+        os.makedirs(os.path.join(root, 'v000000000003-ffffffff'))  # older naming scheme
+        published = [index_bundle.publish('documents', index, {'ids': np.asarray([1, 2])}, model='m', generation=3)
+                     for _ in range(5)]
+        assert len(set(published)) == 5
+        assert sorted(d for d in os.listdir(root) if d.startswith('v')) == published[-2:]
+        assert index_bundle.current_version('documents') == published[-1]
+        assert index_bundle.load('documents').manifest['version'] == published[-1]
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason='needs /proc')
+def test_flat_index_is_mapped_not_copied(tmp_path):
+    with override_settings(FAISS_INDEX_DIR=str(tmp_path)):
+        index, vectors = _index(list(range(2000)), dim=64)
+        version = index_bundle.publish('documents', index, {'ids': np.arange(2000)}, model='m', generation=1)
+        bundle = index_bundle.load('documents')
+        path = os.path.join(index_bundle.root_dir('documents'), version, index_bundle.INDEX_FILE)
+        with open('/proc/self/maps') as fh:
+            assert any(line.rstrip().endswith(path) for line in fh)
+        assert bundle.mmapped
+        _, found = bundle.index.search(vectors[5:6], 1)
+        assert found[0][0] == 5
+
+
+def test_corrupted_bundle_is_rejected(tmp_path):
+    with override_settings(FAISS_INDEX_DIR=str(tmp_path)):
+        index, _ = _index([1, 2])
+        version = index_bundle.publish('documents', index, {'ids': np.asarray([1, 2])}, model='m', generation=1)
+        path = os.path.join(index_bundle.root_dir('documents'), version, index_bundle.INDEX_FILE)
+        with open(path, 'r+b') as fh:
+            fh.seek(-1, os.SEEK_END)
+            last = fh.read(1)
+            fh.seek(-1, os.SEEK_END)
+            fh.write(bytes([last[0] ^ 0xFF]))
+        assert index_bundle.load('documents', verify_checksum=False) is not None
+        assert index_bundle.load('documents', verify_checksum=True) is None
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_backend.ontologies import faiss_index, index_jobs
+from django_backend.ontologies.models import IndexJob, Ontology
+
+
+def _doc(label):
+    return {'nodes': [{'id': label, 'label': label}], 'relations': []}
+
+
+@pytest.mark.django_db
+def test_saves_enqueue_one_coalesced_job_per_ontology():
+    a = Ontology.objects.create(json=_doc('a'))
+    b = Ontology.objects.create(json=_doc('b'))
+    ids = sorted([a.id, b.id])
+    a.json = _doc('a2')
+    a.save()
+    b.delete()
+    assert sorted(IndexJob.objects.values_list('ontology_id', flat=True)) == ids
+
+
+@pytest.mark.django_db
+def test_job_reenqueued_while_claimed_survives_completion():
+    a = Ontology.objects.create(json=_doc('a'))
+    b = Ontology.objects.create(json=_doc('b'))
+    jobs = index_jobs.claim(10, 'w1')
+    assert len(jobs) == 2
+    # claimed jobs are not handed to another worker
+    assert index_jobs.claim(10, 'w2') == []
+
+    later = timezone.now() + timedelta(seconds=1)
+    IndexJob.objects.filter(ontology_id=b.id).update(enqueued_at=later)
+    index_jobs.complete(jobs, 'w1')
+    job = IndexJob.objects.get()
+    assert job.ontology_id == b.id and job.claimed_at is None
+    assert [j.ontology_id for j in index_jobs.claim(10, 'w2')] == [b.id]
+    assert a.id not in IndexJob.objects.values_list('ontology_id', flat=True)
+
+
+@pytest.mark.django_db
+def test_worker_drains_queue_and_backs_off_failures(monkeypatch):
+    a = Ontology.objects.create(json=_doc('a'))
+    applied = []
+    monkeypatch.setattr(faiss_index, 'apply_changes', applied.extend)
+    call_command('index_worker', '--once')
+    assert applied == [a.id]
+    assert not IndexJob.objects.exists()
+
+    def broken(ids):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(faiss_index, 'apply_changes', broken)
+    index_jobs.enqueue(a.id)
+    call_command('index_worker', '--once')
+    job = IndexJob.objects.get()
+    assert job.attempts == 1 and 'disk full' in job.last_error
+    assert job.claimed_at is None and job.not_before > timezone.now()
+    assert index_jobs.stats()['failing'] == 1
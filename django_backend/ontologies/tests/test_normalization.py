@@ -0,0 +1,82 @@
+import io
+import json
+
+import pytest
+from django.test import Client
+
+from django_backend.ontologies import bulk_import, generation, normalization
+from django_backend.ontologies.models import Entity, GraphNode, IndexJob, Ontology
+
+DOC = {
+    'entities': ['A', {'name': 'B', 'class': 'Thing'}, 42, {'note': 'no id'}],
+    'edges': [{'from': 'A', 'to': 'B'}, {'source': 'A'}, None],
+}
+
+
+def test_canonical_keeps_valid_entries_with_their_positions():
+    assert normalization.canonical(DOC) == {
+        'nodes': [[0, {'id': 'A', 'label': 'A', 'type': 'Entity'}],
+                  [1, {'id': 'B', 'label': 'B', 'type': 'Thing'}]],
+        'relations': [[0, {'source': 'A', 'target': 'B', 'relation': 'related_to'}]],
+    }
+    assert normalization.canonical(None) == {'nodes': [], 'relations': []}
+
+
+@pytest.mark.django_db
+def test_form_is_stored_on_save_and_bulk_import():
+    o = Ontology.objects.create(json=DOC)
+    o.refresh_from_db()
+    assert o.normalized == json.loads(json.dumps(normalization.canonical(DOC)))
+    assert o.normalized_version == normalization.VERSION
+
+    o.json = {'nodes': ['C']}
+    o.save()
+    assert Ontology.objects.values_list('normalized', flat=True).get(pk=o.pk)['nodes'] == [
+        [0, {'id': 'C', 'label': 'C', 'type': 'Entity'}]]
+    assert list(GraphNode.objects.values_list('data__id', flat=True)) == ['C']
+
+    stream = io.BytesIO(b'{"ontology": {"nodes": ["D"]}}\n')
+    bulk_import.load(stream)
+    imported = Ontology.objects.exclude(pk=o.pk).get()
+    assert imported.normalized_version == normalization.VERSION
+    assert imported.normalized['nodes'] == [[0, {'id': 'D', 'label': 'D', 'type': 'Entity'}]]
+    assert not normalization.stale().exists()
+
+
+@pytest.mark.django_db
+def test_rules_change_renormalizes_stale_rows(monkeypatch):
+    o = Ontology.objects.create(json={'nodes': ['a', 'b'], 'relations': [{'source': 'a', 'target': 'b'}]})
+    IndexJob.objects.all().delete()
+    before = generation.current()
+
+    original = normalization.normalize_node
+
+    def prefixed(n):
+        nn = original(n)
+        return dict(nn, id='x:' + nn['id']) if nn else nn
+
+    monkeypatch.setattr(normalization, 'normalize_node', prefixed)
+    monkeypatch.setattr(normalization, 'VERSION', normalization.VERSION + 1)
+
+    assert list(normalization.stale()) == [o]
+    assert normalization.renormalize() == 1
+    assert not normalization.stale().exists()
+    assert list(Entity.objects.values_list('entity_id', flat=True)) == ['x:a', 'x:b']
+    graph = Client().get('/api/graph/').json()
+    assert [n['id'] for n in graph['nodes']] == ['x:a', 'x:b']
+    assert generation.current() > before
+    assert list(IndexJob.objects.values_list('ontology_id', flat=True)) == [o.id]
+
+    # nothing left to do: no rebuild, no bump
+    assert normalization.renormalize() == 0
+    assert generation.current() == before + 1
+
+
+@pytest.mark.django_db
+def test_rows_without_a_stored_form_are_picked_up():
+    o = Ontology.objects.create(json={'nodes': ['a']})
+    Ontology.objects.filter(pk=o.pk).update(normalized=None, normalized_version=0)
+    assert normalization.renormalize() == 1
+    o.refresh_from_db()
+    assert o.normalized['nodes'] == [[0, {'id': 'a', 'label': 'a', 'type': 'Entity'}]]
+    assert list(Entity.objects.values_list('entity_id', flat=True)) == ['a']
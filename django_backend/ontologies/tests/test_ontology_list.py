@@ -0,0 +1,32 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from django_backend.ontologies.models import Ontology
+
+
+@pytest.mark.django_db
+def test_list_projection_never_selects_json():
+    o = Ontology.objects.create(filename='a.json', json={'nodes': ['A']})
+    with CaptureQueriesContext(connection) as ctx:
+        data = Client().get('/api/ontologies/', {'fields': 'id,filename,created_at'}).json()
+    assert data == [{'id': o.id, 'filename': 'a.json', 'created_at': data[0]['created_at']}]
+    assert not any('"json"' in q['sql'] for q in ctx.captured_queries)
+
+    data = Client().get('/api/ontologies/', {'exclude': 'json'}).json()
+    assert set(data[0]) == {'id', 'filename', 'source', 'created_at'}
+    assert Client().get(f'/api/ontologies/{o.id}/', {'exclude': 'json'}).json()['json'] == {'nodes': ['A']}
+    assert Client().get('/api/ontologies/', {'fields': 'nope'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_walks_every_row_once():
+    ids = {Ontology.objects.create(filename=f'{i}.json', json={}).id for i in range(5)}
+    seen = []
+    url, params = '/api/ontologies/', {'page_size': 2, 'exclude': 'json'}
+    while url:
+        page = Client().get(url, params).json()
+        seen.extend(item['id'] for item in page['results'])
+        url, params = page['next'], None
+    assert sorted(seen) == sorted(ids)
@@ -0,0 +1,44 @@
+import pytest
+from django.core.management import call_command
+from django.test import Client, override_settings
+
+from django_backend.ontologies import payload_codec
+from django_backend.ontologies.models import Ontology
+
+DOC = {'nodes': [{'id': 'a', 'label': 'Ä'}, 'b'], 'relations': [{'source': 'a', 'target': 'b', 'relation': 'r'}]}
+
+
+def test_blobs_are_self_describing():
+    for codec in ['zlib'] + (['zstd'] if payload_codec._ensure_zstd() else []):
+        blob = payload_codec.encode(DOC, codec, 'json')
+        assert blob.startswith(payload_codec.MAGIC)
+        assert payload_codec.decode(memoryview(blob)) == DOC
+    with pytest.raises(ValueError):
+        payload_codec.decode(b'{"nodes": []}')
+
+
+@pytest.mark.django_db
+def test_compressed_rows_read_as_the_same_dicts():
+    plain = Ontology.objects.create(filename='plain', json=DOC)
+    with override_settings(ONTOLOGY_PAYLOAD_STORAGE='compressed'):
+        packed = Ontology.objects.create(filename='packed', json=DOC)
+        stored = dict(Ontology.objects.values_list('filename', 'json'))
+        assert stored == {'plain': DOC, 'packed': None}
+
+        row = Ontology.objects.get(pk=packed.pk)
+        # nothing is decoded until the payload is read
+        assert row.__dict__['json'] is None and row.__dict__['payload'] is not None
+        assert row.json == DOC
+        assert Ontology.objects.only('id').get(pk=packed.pk).json == DOC
+
+        listed = Client().get('/api/ontologies/').json()
+        assert [o['json'] for o in listed] == [DOC, DOC]
+        assert Client().get(f'/api/ontologies/{packed.pk}/').json()['json'] == DOC
+        assert len(Client().get('/api/graph/').json()['nodes']) == 2
+
+        call_command('convert_payloads')
+        assert set(Ontology.objects.values_list('json', flat=True)) == {None}
+
+    call_command('convert_payloads', '--to', 'json')
+    assert list(Ontology.objects.values_list('json', 'payload')) == [(DOC, None), (DOC, None)]
+    assert plain.json == DOC
@@ -0,0 +1,86 @@
+import pytest
+from django.test import Client, override_settings
+
+from django_backend.ontologies import entity_index, index_bundle, query_cache
+from django_backend.ontologies.faiss_index import BundledIndex
+from django_backend.ontologies.models import Ontology
+
+
+@pytest.mark.django_db
+def test_query_results_are_cached_until_the_corpus_changes():
+    c = Client()
+    Ontology.objects.create(json={'nodes': ['alpha', 'beta'], 'relations': [{'source': 'alpha', 'target': 'beta'}]})
+
+    first = c.post('/api/query/', {'query': 'Alpha ', 'k': 3}, content_type='application/json')
+    assert first['X-Query-Cache'] == 'miss'
+    again = c.post('/api/query/', {'query': 'alpha', 'k': 3}, content_type='application/json')
+    assert again['X-Query-Cache'] == 'hit'
+    assert again.json() == first.json()
+    assert c.post('/api/query/', {'query': 'alpha', 'k': 4}, content_type='application/json')['X-Query-Cache'] == 'miss'
+
+    graph = c.get('/api/search_graph/', {'q': 'alpha', 'hops': '2'})
+    assert graph['X-Query-Cache'] == 'miss'
+    assert c.get('/api/search_graph/', {'q': 'alpha', 'hops': '2'})['X-Query-Cache'] == 'hit'
+    assert c.get('/api/search_graph/', {'q': 'alpha', 'hops': '1'})['X-Query-Cache'] == 'miss'
+
+    Ontology.objects.create(json={'nodes': ['alpha', 'gamma']})
+    fresh = c.post('/api/query/', {'query': 'alpha', 'k': 3}, content_type='application/json')
+    assert fresh['X-Query-Cache'] == 'miss'
+    assert fresh.json()['raw_hits'] != first.json()['raw_hits']
+
+    stats = c.get('/api/query_cache/').json()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 5
+
+
+@pytest.mark.django_db
+def test_only_staff_can_clear_the_cache(django_user_model):
+    c = Client()
+    Ontology.objects.create(json={'nodes': ['alpha']})
+    c.post('/api/query/', {'query': 'alpha', 'k': 3}, content_type='application/json')
+
+    assert c.delete('/api/query_cache/').status_code == 403
+    assert c.post('/api/query/', {'query': 'alpha', 'k': 3}, content_type='application/json')['X-Query-Cache'] == 'hit'
+
+    c.force_login(django_user_model.objects.create_user('ops', is_staff=True))
+    cleared = c.delete('/api/query_cache/')
+    assert cleared.status_code == 200 and cleared.json()['entries'] == 0
+
+
+@pytest.mark.django_db
+@override_settings(QUERY_CACHE_MAX_ENTRIES=2)
+def test_least_recently_used_entries_are_evicted():
+    keys = [query_cache.make_key('query', f'q{i}', k=5) for i in range(3)]
+    query_cache.put(keys[0], {'n': 0})
+    query_cache.put(keys[1], {'n': 1})
+    assert query_cache.get(keys[0]) == {'n': 0}
+    query_cache.put(keys[2], {'n': 2})
+    assert query_cache.get(keys[1]) is None
+    assert query_cache.get(keys[0]) == {'n': 0}
+    assert query_cache.stats()['entries'] == 2
+
+
+@pytest.mark.django_db
+def test_byte_bound_evicts_oldest_entries():
+    big = {'payload': 'x' * 1000}
+    with override_settings(QUERY_CACHE_MAX_BYTES=2500):
+        keys = [query_cache.make_key('query', f'q{i}') for i in range(3)]
+        for key in keys:
+            query_cache.put(key, big)
+        assert query_cache.get(keys[0]) is None
+        assert query_cache.stats()['bytes'] <= 2500
+
+
+@pytest.mark.django_db
+def test_publishing_an_index_bundle_changes_the_key(tmp_path, monkeypatch):
+    faiss = pytest.importorskip('faiss')
+    np = pytest.importorskip('numpy')
+    monkeypatch.setattr(entity_index, '_entities', BundledIndex('entities'))
+    with override_settings(FAISS_INDEX_DIR=str(tmp_path)):
+        before = query_cache.make_key('search_graph', 'alpha', k=5)
+        index = faiss.IndexIDMap(faiss.IndexFlatIP(4))
+        index.add_with_ids(np.eye(4, dtype='float32')[:2], np.asarray([1, 2]))
+        index_bundle.publish('entities', index, {'ids': np.asarray([1, 2])}, model='m', generation=0)
+        after = query_cache.make_key('search_graph', 'alpha', k=5)
+        assert after != before
+        assert query_cache.make_key('search_graph', 'alpha', k=5) == after
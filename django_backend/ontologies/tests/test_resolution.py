@@ -0,0 +1,95 @@
+import pytest
+from django.db import IntegrityError
+from django.test import Client, override_settings
+
+from django_backend.ontologies import components, normalization, resolution
+from django_backend.ontologies.models import Entity, EntityAlias, Ontology
+
+
+def test_blocking_keys():
+    keys = resolution.Keys.of('Open AI, Inc.')
+    assert keys.label == 'openai' and keys.tokens == 'ai open'
+    assert resolution.similarity(keys, resolution.Keys.of('OPENAI')) == 1.0
+    # the same words in another order are only a candidate, compared on 3-grams
+    assert resolution.similarity(resolution.Keys.of('Dog bites man'), resolution.Keys.of('Man bites dog')) < 0.8
+    assert resolution.similarity(resolution.Keys.of('GPT-3 model family'), resolution.Keys.of('GPT-4 model family')) == 0.0
+
+
+def test_cluster_merges_variants_only():
+    names = ['OpenAI', 'Microsoft', 'openai', 'Open-AI LLC', 'Massachusetts Institute of Technology',
+             'Massachusets Institute of Technology', 'GPT-3', 'GPT-4']
+    labels, report = resolution.cluster(names)
+    assert labels == [0, 1, 0, 0, 4, 4, 6, 7]
+    assert report.clusters == 5 and report.sizes == {1: 3, 2: 1, 3: 1}
+    assert report.largest[0] == ['OpenAI', 'openai', 'Open-AI LLC']
+
+
+def test_symbols_and_word_order_keep_entities_apart():
+    assert [resolution.Keys.of(n).label for n in ('C', 'C++', 'C#', '.NET', 'NET', 'ASP.NET', 'Node.js')] == [
+        'c', 'c++', 'c#', '.net', 'net', 'aspnet', 'nodejs']
+    names = ['C', 'C++', 'C#', '.NET', 'NET', 'Dog bites man', 'Man bites dog', 'c++', 'Node.js', 'NodeJS']
+    labels, _ = resolution.cluster(names)
+    assert labels == [0, 1, 2, 3, 4, 5, 6, 1, 8, 8]
+
+
+@pytest.mark.django_db
+def test_distinct_symbol_names_are_not_merged_at_ingest():
+    Ontology.objects.create(json={'nodes': ['C', 'C++', 'C#', '.NET', 'NET', 'Dog bites man', 'Man bites dog']})
+    assert set(EntityAlias.objects.values_list('alias', 'canonical')) == {
+        (n, n) for n in ('C', 'C++', 'C#', '.NET', 'NET', 'Dog bites man', 'Man bites dog')}
+
+
+@pytest.mark.django_db
+def test_ids_resolve_to_the_first_seen_entity_across_documents():
+    Ontology.objects.create(json={'nodes': ['OpenAI', 'GPT'], 'relations': [{'source': 'OpenAI', 'target': 'GPT'}]})
+    Ontology.objects.create(json={'nodes': [{'id': 'openai', 'label': 'openai'}, 'Microsoft'],
+                                  'relations': [{'source': 'Microsoft', 'target': 'openai', 'relation': 'funds'}]})
+    Ontology.objects.create(json={'nodes': ['Open AI', 'Massachusetts Institute of Technology']})
+    Ontology.objects.create(json={'nodes': ['Massachusets Institute of Technology']})
+
+    assert dict(EntityAlias.objects.values_list('alias', 'canonical')) == {
+        'OpenAI': 'OpenAI', 'GPT': 'GPT', 'openai': 'OpenAI', 'Microsoft': 'Microsoft', 'Open AI': 'OpenAI',
+        'Massachusetts Institute of Technology': 'Massachusetts Institute of Technology',
+        'Massachusets Institute of Technology': 'Massachusetts Institute of Technology',
+    }
+    graph = Client().get('/api/graph/').json()
+    assert [n['id'] for n in graph['nodes']] == ['OpenAI', 'GPT', 'Microsoft', 'Massachusetts Institute of Technology']
+    assert {(r['source'], r['target']) for r in graph['relations']} == {('OpenAI', 'GPT'), ('Microsoft', 'OpenAI')}
+    assert Entity.objects.filter(entity_id='OpenAI').count() == 3
+    index = components.get()
+    assert index.component('Microsoft') == index.component('GPT')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_aliases_are_only_recorded_by_saves_that_commit():
+    o = Ontology.objects.create(json={'nodes': ['OpenAI']})
+    with pytest.raises(IntegrityError):
+        Ontology(pk=o.pk, json={'nodes': ['Microsoft']}).save(force_insert=True)
+    assert list(EntityAlias.objects.values_list('alias', flat=True)) == ['OpenAI']
+
+    Ontology.objects.filter(pk=o.pk).update(normalized=None, normalized_version=0)
+    stored = Ontology.objects.get(pk=o.pk)
+    stored.json = {'nodes': ['openai', 'Microsoft']}
+    assert [nn['id'] for _, nn in normalization.of(stored)['nodes']] == ['OpenAI', 'Microsoft']
+    assert list(EntityAlias.objects.values_list('alias', flat=True)) == ['OpenAI']
+
+
+@pytest.mark.django_db
+def test_recluster_apply_renormalizes_the_corpus():
+    with override_settings(ENTITY_RESOLUTION_THRESHOLD=1.01):
+        Ontology.objects.create(json={'nodes': ['Massachusetts Institute of Technology']})
+        Ontology.objects.create(json={'nodes': ['Massachusets Institute of Technology']})
+    assert Entity.objects.values('entity_id').distinct().count() == 2
+
+    report = resolution.recluster(apply=True)
+    assert report.applied == 1 and report.clusters == 1
+    assert normalization.renormalize() == 2
+    assert set(Entity.objects.values_list('entity_id', flat=True)) == {'Massachusetts Institute of Technology'}
+
+
+@pytest.mark.django_db
+@override_settings(ENTITY_RESOLUTION=False)
+def test_resolution_can_be_turned_off():
+    Ontology.objects.create(json={'nodes': ['OpenAI', 'openai']})
+    assert not EntityAlias.objects.exists()
+    assert len(Client().get('/api/graph/').json()['nodes']) == 2
@@ -0,0 +1,28 @@
+import pytest
+from django.test import Client
+
+from django_backend.ontologies import scoring, search_index
+from django_backend.ontologies.models import Ontology
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', ['bm25', 'tfidf'])
+def test_sparse_scorers_discount_common_tokens(name):
+    for i in range(5):
+        Ontology.objects.create(filename=f'common{i}.json', json={'label': 'the entity', 'description': f'filler {i}'})
+    rare = Ontology.objects.create(filename='rare.json', json={'label': 'the quasar'})
+    results = scoring.query('the quasar', k=3, scorer=name)
+    assert results[0]['id'] == rare.id
+    assert results[0]['ontology'] == {'label': 'the quasar'}
+
+
+@pytest.mark.django_db
+def test_legacy_scorer_is_the_inverted_index():
+    Ontology.objects.create(filename='a.json', json={'label': 'alpha beta'})
+    assert scoring.query('alpha', scorer='legacy') == search_index.query('alpha')
+
+
+@pytest.mark.django_db
+def test_unknown_scorer_is_rejected():
+    resp = Client().post('/api/query/', {'query': 'alpha', 'scorer': 'nope'}, content_type='application/json')
+    assert resp.status_code == 400
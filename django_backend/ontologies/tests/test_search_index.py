@@ -0,0 +1,35 @@
+import pytest
+
+from django_backend.ontologies import search_index
+from django_backend.ontologies.lexical import _score_query_against_doc
+from django_backend.ontologies.models import Ontology, TokenPosting
+
+DOCS = [
+    {'nodes': [{'id': 'OpenAI', 'label': 'OpenAI', 'type': 'Organization'},
+               {'id': 'GPT', 'label': 'GPT model', 'description': 'a language model'}],
+     'relations': [{'source': 'OpenAI', 'target': 'GPT', 'relation': 'develops'}]},
+    {'nodes': ['Paris', 'France'], 'relations': [{'from': 'Paris', 'to': 'France', 'label': 'capital_of'}]},
+    {'title': 'The entity graph', 'summary': 'language of the graph', 'count': 3},
+]
+
+
+@pytest.mark.django_db
+def test_index_scores_match_legacy_scorer():
+    objs = [Ontology.objects.create(filename=f'd{i}.json', json=d) for i, d in enumerate(DOCS)]
+    for q in ('language model', 'paris capital', 'the graph', 'nothing here'):
+        scores = search_index.score_documents(q)
+        for o in objs:
+            legacy = _score_query_against_doc(q, o.json)
+            assert scores.get(o.id, 0.0) == legacy
+
+
+@pytest.mark.django_db
+def test_index_follows_updates_and_deletes():
+    o = Ontology.objects.create(filename='a.json', json={'label': 'alpha'})
+    assert [r['id'] for r in search_index.query('alpha')] == [o.id]
+    o.json = {'label': 'beta'}
+    o.save()
+    assert search_index.query('alpha') == []
+    o.delete()
+    assert search_index.query('beta') == []
+    assert not TokenPosting.objects.exists()
@@ -0,0 +1,132 @@
+import io
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from django_backend.ontologies import uploads
+from django_backend.ontologies.models import Ontology, UploadJob
+
+
+def _wait(c, url):
+    # join the background jobs first rather than polling while they write
+    uploads.shutdown()
+    return c.get(url).json()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_is_accepted_at_once_and_saved_in_the_background(fake_generator, tmp_path):
+    fake_generator.delay = 0.2
+    fake_generator.responses = {'/api/generate': (200, {'ontology': {'nodes': ['apple'], 'relations': []}})}
+    c = Client()
+    with override_settings(HF_ONTOLOGY_GENERATOR_URL=fake_generator.url, UPLOAD_SPOOL_DIR=str(tmp_path)):
+        started = time.monotonic()
+        resp = c.post('/api/upload/', {'file': SimpleUploadedFile('doc.txt', b'apples grow on trees')})
+        assert resp.status_code == 202
+        assert time.monotonic() - started < fake_generator.delay
+        job = resp.json()
+        assert job['status'] in (UploadJob.QUEUED, UploadJob.RUNNING)
+        assert resp['Location'] == job['status_url'] == f"/api/upload/{job['id']}/"
+
+        done = _wait(c, job['status_url'])
+    assert done['status'] == UploadJob.SUCCEEDED
+    assert done['ontology']['json'] == {'nodes': ['apple'], 'relations': []}
+    assert Ontology.objects.get().filename == 'doc.txt'
+    # every candidate got the whole file, not an exhausted stream
+    assert [path for path, _ in fake_generator.requests] == ['/generate', '/api/generate']
+    assert all(b'apples grow on trees' in body for _, body in fake_generator.requests)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_generation_is_reported_on_the_status_url(fake_generator, tmp_path):
+    fake_generator.responses = {}
+    c = Client()
+    with override_settings(HF_ONTOLOGY_GENERATOR_URL=fake_generator.url, UPLOAD_SPOOL_DIR=str(tmp_path)):
+        job = c.post('/api/upload/', {'file': SimpleUploadedFile('doc.txt', b'x')}).json()
+        done = _wait(c, job['status_url'])
+    assert done['status'] == UploadJob.FAILED
+    assert 'Ontology-Generator' in done['detail']
+    assert not Ontology.objects.exists()
+    assert c.get('/api/upload/00000000-0000-0000-0000-000000000000/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_upload_without_a_file_or_over_the_queue_bound_is_rejected(monkeypatch):
+    c = Client()
+    assert c.post('/api/upload/').status_code == 400
+
+    def busy(f):
+        raise uploads.Busy()
+
+    monkeypatch.setattr(uploads, 'submit', busy)
+    resp = c.post('/api/upload/', {'file': SimpleUploadedFile('doc.txt', b'x')})
+    assert resp.status_code == 503
+    assert resp['Retry-After']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_repeat_upload_reuses_the_record_without_calling_the_generator(fake_generator, tmp_path):
+    c = Client()
+    with override_settings(HF_ONTOLOGY_GENERATOR_URL=fake_generator.url, UPLOAD_SPOOL_DIR=str(tmp_path)):
+        first = c.post('/api/upload/', {'file': SimpleUploadedFile('a.pdf', b'%PDF same bytes')})
+        assert first['X-Dedup'] == 'miss'
+        done = _wait(c, first.json()['status_url'])
+        calls = len(fake_generator.requests)
+
+        again = c.post('/api/upload/', {'file': SimpleUploadedFile('copy.pdf', b'%PDF same bytes')})
+        assert again.status_code == 200
+        assert again['X-Dedup'] == 'hit'
+        assert again.json()['ontology']['id'] == done['ontology']['id']
+        assert len(fake_generator.requests) == calls
+
+        other = c.post('/api/upload/', {'file': SimpleUploadedFile('b.pdf', b'%PDF other bytes')})
+        assert other['X-Dedup'] == 'miss'
+        _wait(c, other.json()['status_url'])
+    assert Ontology.objects.count() == 2
+    assert Ontology.objects.filter(content_digest__isnull=False).exclude(content_digest='').count() == 2
+
+
+@pytest.mark.django_db
+def test_only_jobs_that_cannot_still_be_alive_are_expired(fake_generator):
+    def aged(status, seconds):
+        job = UploadJob.objects.create(filename='doc.txt', status=status)
+        UploadJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=seconds))
+        return uploads.expire_stale(UploadJob.objects.get(pk=job.pk))
+
+    with override_settings(HF_ONTOLOGY_GENERATOR_URL=fake_generator.url, GENERATOR_TIMEOUT=30,
+                           GENERATOR_CONNECT_TIMEOUT=5, GENERATOR_RETRIES=2, UPLOAD_JOB_TIMEOUT=0):
+        # waiting behind busy workers is not a failure
+        assert aged(UploadJob.QUEUED, 600).status == UploadJob.QUEUED
+        assert aged(UploadJob.QUEUED, uploads.queue_timeout() + 1).status == UploadJob.FAILED
+        # a running job refreshes updated_at per generator endpoint it tries
+        assert uploads.stall_timeout() > 3 * 35
+        assert aged(UploadJob.RUNNING, 60).status == UploadJob.RUNNING
+        assert aged(UploadJob.RUNNING, 600).status == UploadJob.FAILED
+
+        # a job reported failed is not started (or finished) later
+        expired = aged(UploadJob.QUEUED, uploads.queue_timeout() + 1)
+        uploads.process(expired.pk, io.BytesIO(b'late'))
+    assert fake_generator.requests == []
+    assert UploadJob.objects.get(pk=expired.pk).status == UploadJob.FAILED
+
+
+@pytest.mark.django_db
+def test_ontology_is_not_kept_when_the_job_cannot_record_its_success(fake_generator, monkeypatch):
+    fake_generator.responses = {'/generate': (200, {'ontology': {'nodes': ['kiwi']}})}
+    finish = uploads._finish
+
+    def failing(job_id, **fields):
+        if fields['status'] == UploadJob.SUCCEEDED:
+            raise RuntimeError('database is locked')
+        return finish(job_id, **fields)
+
+    monkeypatch.setattr(uploads, '_finish', failing)
+    job = UploadJob.objects.create(filename='doc.txt', digest='d' * 64)
+    with override_settings(HF_ONTOLOGY_GENERATOR_URL=fake_generator.url):
+        uploads.process(job.pk, io.BytesIO(b'kiwi'))
+    assert UploadJob.objects.get(pk=job.pk).status == UploadJob.FAILED
+    assert not Ontology.objects.exists()
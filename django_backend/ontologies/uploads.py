@@ -0,0 +1,236 @@
+"""Asynchronous upload pipeline (see `models.UploadJob`).
+
+`upload_document` used to forward the file to the Ontology-Generator inline,
+holding a web worker for up to three 30 s attempts. Now `submit()` spools the
+file once (in memory up to `UPLOAD_SPOOL_MAX_MEMORY` bytes, then in
+`UPLOAD_SPOOL_DIR`), records an `UploadJob` and hands it to a process-wide
+thread pool of `UPLOAD_WORKERS` threads once the request's transaction
+commits; the view answers `202 Accepted` straight away and
+clients poll `/api/upload/<id>/`. Jobs talk to the generator through the
+shared `generator_client`.
+
+Every upload is hashed (SHA-256) while it is spooled. If an Ontology was
+already generated from the same bytes, or a job for them is still in
+flight, `submit()` returns a job linked to that record (or that job) and the
+generator is not called again.
+
+At most `UPLOAD_MAX_PENDING` jobs are queued or running per process; beyond
+that `submit()` raises `Busy` and the view answers 503. A job whose process
+went away (recycled, say) is reported as failed once it cannot be alive any
+more: a running job refreshes `updated_at` before each generator endpoint it
+tries, so it is stale when that is older than one endpoint's retry budget
+(or `UPLOAD_JOB_TIMEOUT`, if set); a queued job when it has waited longer
+than the jobs ahead of it could possibly take. A job only starts if it is
+still queued, and only a running job records an outcome, so a job reported
+failed stays failed.
+"""
+import hashlib
+import logging
+import math
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import generator_client
+from .models import Ontology, UploadJob
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+# headroom over the generator budget for spooling, saving and bookkeeping
+_SLACK = 30.0
+
+
+class Busy(Exception):
+    """Too many uploads are already queued in this process."""
+
+
+def spool_dir() -> str:
+    base = getattr(settings, 'UPLOAD_SPOOL_DIR', None) or os.path.join(tempfile.gettempdir(), 'ontology-uploads')
+    os.makedirs(base, exist_ok=True)
+    return base
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(int(getattr(settings, 'UPLOAD_WORKERS', 2)), 1),
+                                           thread_name_prefix='upload')
+            _slots = threading.BoundedSemaphore(max(int(getattr(settings, 'UPLOAD_MAX_PENDING', 32)), 1))
+        return _executor, _slots
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop this process's pool, by default after its jobs finished; the next
+    `submit()` starts a new one."""
+    global _executor, _slots
+    with _lock:
+        executor, _executor, _slots = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _push_remote(o: Ontology, ont) -> dict:
+    """Push a new ontology to the remote Query-chat index, if one is configured."""
+    remote_result = {}
+    try:
+        from .remote_index import ingest as remote_ingest, build_remote
+    except Exception:
+        return remote_result
+    try:
+        remote_result['ingest'] = remote_ingest([{'id': o.id, 'ontology': ont}])
+    except Exception as e:
+        remote_result['ingest_error'] = str(e)
+    try:
+        remote_result['build'] = build_remote()
+    except Exception as e:
+        remote_result['build_error'] = str(e)
+    return remote_result
+
+
+def _finish(job_id, **fields) -> int:
+    return UploadJob.objects.filter(pk=job_id, status=UploadJob.RUNNING).update(
+        finished_at=timezone.now(), updated_at=timezone.now(), **fields)
+
+
+def _touch(job_id) -> None:
+    UploadJob.objects.filter(pk=job_id, status=UploadJob.RUNNING).update(updated_at=timezone.now())
+
+
+def process(job_id, spooled) -> None:
+    """Run one job: call the generator, save the ontology, record the outcome."""
+    try:
+        if not UploadJob.objects.filter(pk=job_id, status=UploadJob.QUEUED).update(
+                status=UploadJob.RUNNING, updated_at=timezone.now()):
+            logger.warning('upload job %s is no longer queued; not starting it', job_id)
+            return
+        job = UploadJob.objects.get(pk=job_id)
+        resp_json = generator_client.client().generate(job.filename, spooled, on_attempt=lambda url: _touch(job_id))
+        if not resp_json:
+            _finish(job_id, status=UploadJob.FAILED, error='Failed to reach Ontology-Generator space')
+            return
+        ont = resp_json.get('ontology') if isinstance(resp_json, dict) and 'ontology' in resp_json else resp_json
+        existing = _known(job.digest)
+        if existing is not None:
+            # the same file finished through another job meanwhile
+            _finish(job_id, status=UploadJob.SUCCEEDED, ontology=existing)
+            return
+        # the record and the job's success commit together: a saved ontology is
+        # never left behind a failed job (repeat uploads dedup to it)
+        with transaction.atomic():
+            o = Ontology.objects.create(filename=job.filename, source='hf_space', json=ont, content_digest=job.digest)
+            if not _finish(job_id, status=UploadJob.SUCCEEDED, ontology=o):
+                logger.warning('upload job %s was reported failed meanwhile; not saving its ontology', job_id)
+                transaction.set_rollback(True)
+                return
+    except Exception as exc:
+        logger.exception('upload job %s failed', job_id)
+        try:
+            _finish(job_id, status=UploadJob.FAILED, error=f'Failed to save ontology: {exc}')
+        except Exception:
+            logger.exception('could not record the failure of upload job %s', job_id)
+        return
+    finally:
+        spooled.close()
+    # best effort, after the job succeeded: a remote failure is only reported
+    try:
+        UploadJob.objects.filter(pk=job_id).update(remote=_push_remote(o, ont))
+    except Exception:
+        logger.exception('could not record the remote index result of upload job %s', job_id)
+
+
+def _run(job_id, spooled, slots) -> None:
+    try:
+        process(job_id, spooled)
+    finally:
+        slots.release()
+        close_old_connections()
+
+
+def _known(digest: str):
+    if not digest:
+        return None
+    return Ontology.objects.filter(content_digest=digest).order_by('id').first()
+
+
+def submit(uploaded_file) -> Tuple[UploadJob, bool]:
+    """Spool and hash `uploaded_file`; returns `(job, dedup_hit)`.
+
+    On a hit the job is either an already succeeded one linked to the
+    existing Ontology, or the job still working on the same bytes. Otherwise
+    a queued job is recorded and scheduled after commit.
+    """
+    spooled = tempfile.SpooledTemporaryFile(
+        max_size=int(getattr(settings, 'UPLOAD_SPOOL_MAX_MEMORY', 4 * 1024 * 1024)),
+        prefix='upload-', dir=spool_dir())
+    sha = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        sha.update(chunk)
+        spooled.write(chunk)
+    digest = sha.hexdigest()
+    filename = uploaded_file.name or ''
+
+    existing = _known(digest)
+    if existing is not None:
+        spooled.close()
+        now = timezone.now()
+        job = UploadJob.objects.create(filename=filename, digest=digest, status=UploadJob.SUCCEEDED,
+                                       ontology=existing, finished_at=now)
+        return job, True
+    in_flight = (UploadJob.objects.filter(digest=digest, status__in=(UploadJob.QUEUED, UploadJob.RUNNING))
+                 .order_by('created_at').first())
+    if in_flight is not None:
+        spooled.close()
+        return in_flight, True
+
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        spooled.close()
+        raise Busy()
+    try:
+        job = UploadJob.objects.create(filename=filename, digest=digest)
+    except Exception:
+        slots.release()
+        spooled.close()
+        raise
+    transaction.on_commit(lambda: executor.submit(_run, job.pk, spooled, slots))
+    return job, False
+
+
+def stall_timeout() -> float:
+    """Seconds a running job may go without refreshing `updated_at`."""
+    configured = float(getattr(settings, 'UPLOAD_JOB_TIMEOUT', 0) or 0)
+    return configured or generator_client.client().attempt_budget() + _SLACK
+
+
+def queue_timeout() -> float:
+    """Seconds a job may stay queued: every pending job ahead of it taking its whole budget."""
+    workers = max(int(getattr(settings, 'UPLOAD_WORKERS', 2)), 1)
+    pending = max(int(getattr(settings, 'UPLOAD_MAX_PENDING', 32)), 1)
+    return math.ceil(pending / workers) * (generator_client.client().budget() + _SLACK)
+
+
+def expire_stale(job: UploadJob) -> UploadJob:
+    """Mark `job` failed if it cannot still be queued or running (see the module docstring)."""
+    if job.status == UploadJob.RUNNING:
+        timeout = stall_timeout()
+    elif job.status == UploadJob.QUEUED:
+        timeout = queue_timeout()
+    else:
+        return job
+    if job.updated_at < timezone.now() - timedelta(seconds=timeout):
+        UploadJob.objects.filter(pk=job.pk, status=job.status, updated_at=job.updated_at).update(
+            status=UploadJob.FAILED, error='Upload was interrupted before it finished',
+            finished_at=timezone.now())
+        job.refresh_from_db()
+    return job
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from django_backend.ontologies.views import OntologyViewSet, aggregated_graph, search_graph, upload_document, remote_query
+from django_backend.ontologies.views import OntologyViewSet, aggregated_graph, search_graph, upload_document, upload_status, remote_query, query_cache_stats
 from django.http import JsonResponse
 
 
@@ -14,7 +14,9 @@ urlpatterns = [
     path('', include(router.urls)),
     path('graph/', aggregated_graph, name='aggregated_graph'),
     path('upload/', upload_document, name='upload_document'),
+    path('upload/<uuid:job_id>/', upload_status, name='upload_status'),
     path('query/', remote_query, name='remote_query'),
     path('search_graph/', search_graph, name='search_graph'),
+    path('query_cache/', query_cache_stats, name='query_cache_stats'),
     path('health/', health, name='health'),
 ]
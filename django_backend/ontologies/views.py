@@ -1,96 +1,127 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from .models import Ontology
+from rest_framework.pagination import CursorPagination
+from rest_framework.exceptions import ValidationError
+from .models import Ontology, UploadJob
 from .serializers import OntologySerializer
 from .faiss_index import query_top_k, build_index
 from django.views.decorators.csrf import csrf_exempt
-import re
-from typing import List, Tuple
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import http_date, parse_etags
+import hashlib
+import json
 import logging
 
-# --- Lightweight local semantic helpers (dependency-free) ---
-_token_re = re.compile(r"\w+", re.UNICODE)
-
-def _tokens(text: str):
-    return _token_re.findall((text or '').lower())
-
-def _collect_text(obj, depth: int = 0) -> List[Tuple[str, float]]:
-    texts: List[Tuple[str, float]] = []
-    if obj is None:
-        return texts
-    if isinstance(obj, str):
-        texts.append((obj, max(1.0, 3.0 - depth * 0.3)))
-        return texts
-    if isinstance(obj, (int, float, bool)):
-        texts.append((str(obj), 1.0))
-        return texts
-    if isinstance(obj, list):
-        for item in obj:
-            texts.extend(_collect_text(item, depth + 1))
-        return texts
-    if isinstance(obj, dict):
-        for k, v in obj.items():
-            key_low = str(k).lower()
-            key_weight = 1.0
-            if any(x in key_low for x in ('label', 'name', 'title', 'desc', 'summary')):
-                key_weight = 2.5
-            if isinstance(v, (str, int, float, bool)):
-                texts.append((str(v), key_weight))
-            else:
-                for t, w in _collect_text(v, depth + 1):
-                    texts.append((t, w * key_weight))
-        return texts
-    try:
-        s = str(obj)
-        texts.append((s, 1.0))
-    except Exception:
-        pass
-    return texts
-
-def _score_query_against_doc(query: str, doc_obj: dict) -> float:
-    q_tokens = set(_tokens(query))
-    if not q_tokens:
-        return 0.0
-    collected = _collect_text(doc_obj)
-    if not collected:
-        return 0.0
-    token_weights = {}
-    for text, weight in collected:
-        for t in _tokens(text):
-            token_weights[t] = token_weights.get(t, 0.0) + float(weight)
-    if not token_weights:
-        return 0.0
-    intersect = 0.0
-    doc_sum = 0.0
-    for t, w in token_weights.items():
-        doc_sum += w
-        if t in q_tokens:
-            intersect += w
-    if doc_sum <= 0:
-        return 0.0
-    score = intersect / (doc_sum + len(q_tokens))
-    return float(score)
-
-def query_top_k_local(text: str, k: int = 5):
-    results = []
-    for o in Ontology.objects.all():
-        ont = o.json or {}
-        s = _score_query_against_doc(text, ont)
-        if s > 0:
-            results.append({'id': o.id, 'score': float(s), 'ontology': ont})
-    results.sort(key=lambda x: x.get('score', 0.0), reverse=True)
-    return results[:k]
+# --- Lightweight local semantic helpers (see lexical.py / search_index.py) ---
+from .lexical import _tokens, _collect_text, _score_query_against_doc
+from . import scoring
+from . import graph_store
+from . import generation
+from . import compact_graph
+from . import components
+from . import query_cache
+from . import entity_index
+from . import uploads
+from . import bulk_import
+from . import centrality
+from .entities import for_ontologies as normalized_rows
+
+
+def query_top_k_local(text: str, k: int = 5, scorer: str = None):
+    """Lexical top-k over stored ontologies.
+
+    `scorer` picks the engine ('legacy', 'bm25', 'tfidf'); defaults to the
+    LEXICAL_SCORER setting.
+    """
+    return scoring.query(text, k=k, scorer=scorer)
 
 # --- end helpers ---
 
+
+def _search_effort(params):
+    """`(nprobe, ef_search)` from query params/payload; ValueError if not positive ints."""
+    effort = []
+    for name in ('nprobe', 'ef_search'):
+        value = params.get(name)
+        if value in (None, ''):
+            effort.append(None)
+            continue
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            value = 0
+        if value <= 0:
+            raise ValueError(f'{name} must be a positive integer')
+        effort.append(value)
+    return tuple(effort)
+
+
+def _ranking(params):
+    """`(top, rank)` from `?top=N&rank=...`, `(None, None)` without `top`; ValueError if invalid."""
+    top = params.get('top')
+    if top in (None, ''):
+        return None, None
+    try:
+        top = int(top)
+    except (TypeError, ValueError):
+        top = 0
+    if top <= 0:
+        raise ValueError('top must be a positive integer')
+    rank = params.get('rank') or 'pagerank'
+    if rank not in centrality.RANKS:
+        raise ValueError(f"rank must be one of {', '.join(centrality.RANKS)}")
+    return top, rank
+
+
+def _rank_info(rank: str, top: int, total: int) -> dict:
+    scores = centrality.state()
+    return {'by': rank, 'top': top, 'total_nodes': total,
+            'generation': scores.generation if scores else None,
+            'computed_at': scores.computed_at if scores else None}
+
+
+def _corpus_etag(request, scope: str) -> str:
+    """Strong ETag for a corpus-wide response: generation + scope + query params."""
+    params = '&'.join(f'{k}={v}' for k, values in sorted(request.GET.lists()) for v in values)
+    digest = hashlib.sha1(f'{scope}?{params}'.encode('utf-8')).hexdigest()[:16]
+    return f'"{generation.current()}-{digest}"'
+
+
+def _not_modified(request, etag: str):
+    """Return a 304 response if the client's If-None-Match already holds `etag`."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return None
+    tags = parse_etags(if_none_match)
+    if '*' in tags or etag in tags:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return None
+
+
+def _with_validators(response, etag: str):
+    response['ETag'] = etag
+    modified = generation.last_modified()
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified.timestamp())
+    return response
+
 import os
-import networkx as nx
-from collections import deque
-import requests
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-import threading
+
+
+class OntologyCursorPagination(CursorPagination):
+    """Keyset pagination over `(-created_at, id)`.
+
+    Opt-in: the list stays a plain array unless `?page_size=` is given, so
+    existing clients keep working.
+    """
+    ordering = ('-created_at', 'id')
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 500
 
 
 class OntologyViewSet(viewsets.ModelViewSet):
@@ -98,8 +129,61 @@ class OntologyViewSet(viewsets.ModelViewSet):
     frontend payload format. Frontend sends { filename, source, ontology }
     so we map `ontology` -> `json` before saving.
     """
-    queryset = Ontology.objects.all().order_by('-created_at')
+    queryset = Ontology.objects.all().order_by('-created_at', 'id')
     serializer_class = OntologySerializer
+    pagination_class = OntologyCursorPagination
+
+    def _list_fields(self):
+        """Fields requested for list views via `?fields=` and `?exclude=`."""
+        allowed = OntologySerializer.Meta.fields
+        params = self.request.query_params
+        requested = [f.strip() for f in params.get('fields', '').split(',') if f.strip()]
+        excluded = [f.strip() for f in params.get('exclude', '').split(',') if f.strip()]
+        unknown = [f for f in requested + excluded if f not in allowed]
+        if unknown:
+            raise ValidationError({'detail': f"Unknown field(s): {', '.join(unknown)}"})
+        return [f for f in (requested or allowed) if f not in excluded]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == 'list':
+            # never load or decode the JSON column unless it was asked for;
+            # created_at is always loaded because the cursor is built from it
+            fields = set(self._list_fields()) | {'id', 'created_at'}
+            if 'json' in fields:
+                # compressed rows keep the payload in its own column
+                fields.add('payload')
+            qs = qs.only(*fields)
+        return qs
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list':
+            kwargs.setdefault('fields', self._list_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        etag = _corpus_etag(request, 'ontologies')
+        cached = _not_modified(request, etag)
+        if cached is not None:
+            return cached
+        return _with_validators(super().list(request, *args, **kwargs), etag)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """Import NDJSON or a JSON array of `{filename, source, ontology}` records.
+
+        The body is read as a stream (see `bulk_import`). It is taken as NDJSON
+        when sent as `application/x-ndjson`, otherwise the format is detected.
+        Answers with the import report.
+        """
+        content_type = request.content_type.split(';')[0].strip().lower()
+        fmt = 'ndjson' if content_type in ('application/x-ndjson', 'application/jsonl') else 'auto'
+        # read the raw body, never `request.data`, so it is not buffered and parsed at once
+        report = bulk_import.load(request._request, fmt=fmt, source=request.query_params.get('source', ''))
+        code = status.HTTP_201_CREATED if report.created else status.HTTP_200_OK
+        if report.rejected and not report.created:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response(report.as_dict(), status=code)
 
     def create(self, request, *args, **kwargs):
         payload = request.data.copy()
@@ -123,61 +207,79 @@ class OntologyViewSet(viewsets.ModelViewSet):
 logger = logging.getLogger(__name__)
 
 
-@api_view(['GET','HEAD'])
-def aggregated_graph(request):
-    logger.info('aggregated_graph called: method=%s path=%s', request.method, request.get_full_path())
-    print(f"[aggregated_graph] method={request.method} path={request.get_full_path()}")
+GRAPH_STREAM_CHUNK_SIZE = 2000
 
-    node_map = {}  # id -> node object
-    relation_set = set()  # set of tuples (source, target, relation)
-    relations = []
 
-    def normalize_node(n):
- 
-        if isinstance(n, str):
-            return {'id': n, 'label': n, 'type': 'Entity'}
-        if isinstance(n, dict):
-            nid = n.get('id') or n.get('label') or n.get('name')
-            label = n.get('label') or n.get('name') or nid
-            ntype = n.get('type') or n.get('class') or n.get('label') or 'Entity'
-            return {'id': nid, 'label': label, 'type': ntype}
-        return None
+def _stream_graph(fmt: str):
+    """Yield the aggregated graph piece by piece with constant memory.
 
-    def normalize_relation(r):
-        if not r:
-            return None
-        if isinstance(r, dict):
-            s = r.get('source') or r.get('from') or r.get('s')
-            t = r.get('target') or r.get('to') or r.get('t')
-            rel = r.get('relation') or r.get('label') or r.get('type') or 'related_to'
-            return {'source': s, 'target': t, 'relation': rel}
-        return None
-
-    for o in Ontology.objects.all():
-        data = o.json or {}
-        nodes = data.get('nodes') or data.get('entities') or []
-        rels = data.get('relations') or data.get('edges') or []
+    Rows are read from the materialized store with `.iterator()`, which is
+    already deduplicated, and flushed every GRAPH_STREAM_CHUNK_SIZE items.
+    `json` produces the same `{"nodes": [...], "relations": [...]}` document
+    as the buffered response; `ndjson` emits one `{"node": ...}` or
+    `{"relation": ...}` object per line.
+    """
+    def batched(rows, kind):
+        buf = []
+        first = True
+        for row in rows:
+            if fmt == 'ndjson':
+                buf.append(json.dumps({kind: row}) + '\n')
+            else:
+                buf.append(json.dumps(row) if first else ', ' + json.dumps(row))
+                first = False
+            if len(buf) >= GRAPH_STREAM_CHUNK_SIZE:
+                yield ''.join(buf)
+                buf = []
+        if buf:
+            yield ''.join(buf)
+
+    if fmt == 'json':
+        yield '{"nodes": ['
+    yield from batched(graph_store.nodes(chunk_size=GRAPH_STREAM_CHUNK_SIZE), 'node')
+    if fmt == 'json':
+        yield '], "relations": ['
+    yield from batched(graph_store.relations(chunk_size=GRAPH_STREAM_CHUNK_SIZE), 'relation')
+    if fmt == 'json':
+        yield ']}'
 
-        for n in nodes:
-            nn = normalize_node(n)
-            if not nn or not nn.get('id'):
-                continue
-            nid = nn['id']
-            if nid not in node_map:
-                node_map[nid] = nn
 
-        for r in rels:
-            rr = normalize_relation(r)
-            if not rr or not rr.get('source') or not rr.get('target'):
-                continue
-            key = (rr['source'], rr['target'], rr['relation'])
-            if key in relation_set:
-                continue
-            relation_set.add(key)
-            relations.append(rr)
+@api_view(['GET','HEAD'])
+def aggregated_graph(request):
+    logger.info('aggregated_graph called: method=%s path=%s', request.method, request.get_full_path())
+    print(f"[aggregated_graph] method={request.method} path={request.get_full_path()}")
 
-    nodes_out = list(node_map.values())
-    return Response({'nodes': nodes_out, 'relations': relations})
+    try:
+        top, rank = _ranking(request.GET)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # ranked responses change when the scores are refreshed, not only on writes
+    etag = _corpus_etag(request, f'graph:{centrality.stamp()}' if top else 'graph')
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    if top:
+        # only the most important nodes and the edges among them, for clients
+        # (like the D3 view) that cannot lay out the whole corpus
+        nodes_out, relations = centrality.top_subgraph(rank, top)
+        body = {'nodes': nodes_out, 'relations': relations,
+                'rank': _rank_info(rank, top, graph_store.node_count())}
+        return _with_validators(Response(body), etag)
+
+    # ?stream=1 (or json) streams the JSON document, ?stream=ndjson one object per line
+    stream = request.GET.get('stream', '').lower()
+    if stream and stream not in ('0', 'false', 'no'):
+        fmt = 'ndjson' if stream == 'ndjson' else 'json'
+        content_type = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        return _with_validators(StreamingHttpResponse(_stream_graph(fmt), content_type=content_type), etag)
+
+    # merged nodes and deduplicated relations are materialized on write by
+    # graph_store, so this is a straight read of the store
+    nodes_out = list(graph_store.nodes())
+    relations = list(graph_store.relations())
+    return _with_validators(Response({'nodes': nodes_out, 'relations': relations}), etag)
 
 
 @api_view(['GET','HEAD'])
@@ -189,7 +291,20 @@ def search_graph(request):
     print(f"[search_graph] q={q} k={k} method={request.method} path={request.get_full_path()}")
     if not q:
         # fallback to aggregated
-        return aggregated_graph(request)
+        return aggregated_graph(request._request)
+
+    try:
+        top, rank = _ranking(request.GET)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    stamp = centrality.stamp() if top else None
+
+    # semantic seeds come from the index bundles, published after the generation bump
+    scope = f'search_graph:{query_cache.index_versions()}'
+    etag = _corpus_etag(request, f'{scope}:{stamp}' if top else scope)
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
 
     # ensure index is available; schedule background build if missing to avoid blocking
     try:
@@ -199,101 +314,87 @@ def search_graph(request):
         # fallback: proceed without blocking
         pass
 
-    results = query_top_k(q, k=k)
+    try:
+        scorer = scoring.resolve_scorer_name(request.GET.get('scorer'))
+        nprobe, ef_search = _search_effort(request.GET)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # hops param controls graph traversal depth (default 1)
+    try:
+        hops = int(request.GET.get('hops', 1))
+    except Exception:
+        hops = 1
 
-    # merge nodes/relations from results
+    cache_key = query_cache.make_key('search_graph', q, k=k, hops=hops, scorer=scorer,
+                                     lexical=bool(request.GET.get('scorer')), nprobe=nprobe, ef_search=ef_search,
+                                     top=top, rank=rank, scores=stamp)
+    body = query_cache.get(cache_key)
+    if body is not None:
+        return _with_validators(Response(body, headers={'X-Query-Cache': 'hit'}), etag)
+
+    # an explicit scorer= asks for the lexical engine; otherwise prefer the
+    # semantic index and fall back to the lexical scorer when it is empty
+    results = [] if request.GET.get('scorer') else query_top_k(q, k=k, nprobe=nprobe, ef_search=ef_search)
+    if not results:
+        results = query_top_k_local(q, k=k, scorer=scorer)
+
+    # merge nodes/relations from results using the normalized Entity/Relation
+    # rows of the hit ontologies (indexed by ontology) instead of their JSON
     node_map = {}
     relations = []
     relation_set = set()
+    entity_rows, relation_rows = normalized_rows([hit.get('id') for hit in results])
 
-    def normalize_node(n):
-        if isinstance(n, str):
-            return {'id': n, 'label': n, 'type': 'Entity'}
-        if isinstance(n, dict):
-            nid = n.get('id') or n.get('label') or n.get('name')
-            label = n.get('label') or n.get('name') or nid
-            ntype = n.get('type') or n.get('class') or 'Entity'
-            return {'id': nid, 'label': label, 'type': ntype}
-        return None
-
-    def normalize_relation(r):
-        if not r:
-            return None
-        if isinstance(r, dict):
-            s = r.get('source') or r.get('from')
-            t = r.get('target') or r.get('to')
-            rel = r.get('relation') or r.get('label') or 'related_to'
-            return {'source': s, 'target': t, 'relation': rel}
-        return None
-
-    # Collect matched node ids per hit (simple substring match on id/label) to avoid sending full ontology JSON
+    # Seed nodes come from the entity-level vector index when it is available;
+    # otherwise matched node ids are found by substring on id/label
+    vector_seeds = entity_index.seeds_by_ontology(entity_index.query(q, nprobe=nprobe, ef_search=ef_search))
+    qlow = q.strip().lower()
     hit_snippets = []
     for hit in results:
-        ont = hit.get('ontology') or {}
-        nodes = ont.get('nodes') or ont.get('entities') or []
-        rels = ont.get('relations') or ont.get('edges') or []
-
-        # normalize and merge into global node map/relations
-        for n in nodes:
-            nn = normalize_node(n)
-            if not nn or not nn.get('id'):
-                continue
-            nid = nn['id']
+        hit_entities = entity_rows.get(hit.get('id'), [])
+        hit_relations = relation_rows.get(hit.get('id'), [])
+
+        for e in hit_entities:
+            nid = e.data['id']
             if nid not in node_map:
-                node_map[nid] = nn
+                node_map[nid] = e.data
 
-        for r in rels:
-            rr = normalize_relation(r)
-            if not rr or not rr.get('source') or not rr.get('target'):
-                continue
+        for r in hit_relations:
+            rr = r.data
             key = (rr['source'], rr['target'], rr['relation'])
             if key in relation_set:
                 continue
             relation_set.add(key)
             relations.append(rr)
 
-        # find matched nodes inside this ontology using query substring (cheap heuristic)
-        qlow = q.strip().lower()
-        matched_ids = []
-        if qlow:
-            for n in nodes:
-                nid = None
-                label = None
-                if isinstance(n, dict):
-                    nid = (n.get('id') or '')
-                    label = (n.get('label') or '')
-                else:
-                    nid = str(n)
-                    label = str(n)
-                if qlow in str(nid).lower() or qlow in str(label).lower():
-                    matched_ids.append(nid)
+        # find matched nodes inside this ontology: its nearest entities first,
+        # else the query substring (cheap heuristic) -- the entity index may
+        # have no hits here, e.g. for a lexical hit or one not yet indexed
+        present = {e.data['id'] for e in hit_entities}
+        matched_ids = [nid for nid in vector_seeds.get(hit.get('id'), []) if nid in present]
+        if not matched_ids and qlow:
+            for e in hit_entities:
+                if qlow in str(e.data['id']).lower() or qlow in str(e.data['label']).lower():
+                    matched_ids.append(e.data['id'])
 
         # create a compact snippet for this hit (ids + relations among matched nodes)
         snippet_nodes = []
         snippet_relations = []
         if matched_ids:
             mid_set = set(matched_ids)
-            for n in nodes:
-                nid = n.get('id') if isinstance(n, dict) else n
-                if nid in mid_set:
-                    nn = normalize_node(n)
-                    if nn:
-                        snippet_nodes.append(nn)
-            for r in rels:
-                rr = normalize_relation(r)
-                if rr and rr.get('source') in mid_set and rr.get('target') in mid_set:
-                    snippet_relations.append(rr)
+            snippet_nodes = [e.data for e in hit_entities if e.data['id'] in mid_set]
+            snippet_relations = [r.data for r in hit_relations if r.data['source'] in mid_set and r.data['target'] in mid_set]
 
         hit_snippets.append({'id': hit.get('id'), 'score': hit.get('score'), 'matched_ids': matched_ids, 'snippet': {'nodes': snippet_nodes, 'relations': snippet_relations}})
 
-    # Build graph for traversal (use node ids and directed edges)
-    G = nx.DiGraph()
-    for n in node_map.values():
-        G.add_node(n['id'], label=n.get('label'), type=n.get('type'))
+    # Directed edges of this request's subgraph, as a DiGraph would hold them:
+    # one relation per (source, target) pair (the last one seen), and only
+    # between nodes that were merged above
+    edge_relations = {}
     for r in relations:
-        # only add edges where both nodes exist in node_map
         if r['source'] in node_map and r['target'] in node_map:
-            G.add_edge(r['source'], r['target'], relation=r.get('relation'))
+            edge_relations[(r['source'], r['target'])] = r.get('relation')
 
     # Determine seed node ids from semantic hits: prefer node ids found by substring match in hit_snippets
     seed_ids = set()
@@ -307,33 +408,13 @@ def search_graph(request):
             if hit.get('id'):
                 seed_ids.add(str(hit.get('id')))
 
-    # hops param controls graph traversal depth (default 1)
-    try:
-        hops = int(request.GET.get('hops', 1))
-    except Exception:
-        hops = 1
-
-    # BFS from seed nodes to collect neighbors up to `hops`
+    # BFS from seed nodes to collect neighbors up to `hops`, over the shared
+    # compact graph restricted to this request's subgraph
     traversed_nodes = set()
     traversed_edges = set()
-    if G.number_of_nodes() > 0 and seed_ids:
-        q = deque()
-        for s in seed_ids:
-            if s in G:
-                q.append((s, 0))
-                traversed_nodes.add(s)
-        while q:
-            node_id, depth = q.popleft()
-            if depth >= hops:
-                continue
-            for nbr in G.successors(node_id):
-                traversed_nodes.add(nbr)
-                traversed_edges.add((node_id, nbr, G.edges[node_id, nbr].get('relation')))
-                q.append((nbr, depth + 1))
-            for nbr in G.predecessors(node_id):
-                traversed_nodes.add(nbr)
-                traversed_edges.add((nbr, node_id, G.edges[nbr, node_id].get('relation')))
-                q.append((nbr, depth + 1))
+    if node_map and seed_ids:
+        traversed_nodes, traversed_edges = compact_graph.expand(
+            compact_graph.get(), [s for s in seed_ids if s in node_map], hops, edge_relations)
 
     # assemble final nodes/relations: include both semantic-match merged content and traversal expansions
     # mark nodes that were seeds/matched for frontend highlighting
@@ -352,91 +433,76 @@ def search_graph(request):
     else:
         final_relations = relations
 
+    # ?top=N keeps the N best-ranked nodes (stored scores) and the edges among them
+    rank_info = None
+    if top:
+        scores = centrality.scores_of(final_node_map, rank)
+        kept = sorted(final_node_map, key=lambda nid: -scores[nid])[:top]
+        rank_info = _rank_info(rank, top, len(final_node_map))
+        final_node_map = {nid: dict(final_node_map[nid], **{rank: scores[nid]}) for nid in kept}
+        final_relations = [r for r in final_relations
+                           if r['source'] in final_node_map and r['target'] in final_node_map]
+
     # return compact matches/snippets rather than full ontology payloads
-    return Response({'nodes': list(final_node_map.values()), 'relations': final_relations, 'matches': hit_snippets, 'traversal': {'seeds': list(seed_ids), 'hops': hops}})
+    body = {'nodes': list(final_node_map.values()), 'relations': final_relations, 'matches': hit_snippets, 'traversal': {'seeds': list(seed_ids), 'hops': hops}}
+    if rank_info is not None:
+        body['rank'] = rank_info
+    query_cache.put(cache_key, body)
+    return _with_validators(Response(body, headers={'X-Query-Cache': 'miss'}), etag)
 
 
 
 @api_view(['POST'])
 @csrf_exempt
 def upload_document(request):
-    """Accept file uploads from the frontend, forward them to the
-    external Ontology-Generator HF Space, save returned ontology JSON
-    into the Ontology model, and return the saved record.
+    """Accept a file upload from the frontend and queue it for the external
+    Ontology-Generator HF Space (see `uploads`).
+
+    Answers `202 Accepted` with the job id and its status URL; the job saves
+    the returned ontology JSON into the Ontology model in the background.
+    A file whose SHA-256 is already known is not sent again: the answer
+    links the existing record (`200`, or `202` with the job still working on
+    it) and carries `X-Dedup: hit` instead of `miss`.
     """
     f = request.FILES.get('file')
     if not f:
         return Response({'detail': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
-
-    hf_url = getattr(settings, 'HF_ONTOLOGY_GENERATOR_URL', 'https://huggingface.co/spaces/VivanRajath/Ontology-Generator')
-    candidates = [
-        hf_url.rstrip('/') + '/generate',
-        hf_url.rstrip('/') + '/api/generate',
-        hf_url.rstrip('/'),
-    ]
-
-    resp_json = None
-    for url in candidates:
-        try:
-            files = {'file': (f.name, f.read())}
-            r = requests.post(url, files=files, timeout=30)
-            if r.status_code == 200:
-                try:
-                    resp_json = r.json()
-                except Exception:
-                    resp_json = {'ontology': r.text}
-                break
-        except Exception:
-            continue
-
-    if not resp_json:
-        return Response({'detail': 'Failed to reach Ontology-Generator space'}, status=status.HTTP_502_BAD_GATEWAY)
-
-    ont = resp_json.get('ontology') if isinstance(resp_json, dict) and 'ontology' in resp_json else resp_json
-
     try:
-        o = Ontology.objects.create(filename=f.name, source='hf_space', json=ont)
-        remote_result = {}
-        # attempt to push the newly saved ontology to the remote Query-chat index
-        remote_result = {}
-        try:
-            try:
-                from .remote_index import ingest as remote_ingest, build_remote
-            except Exception:
-                try:
-                    from .remote_index import ingest as remote_ingest, build_remote
-                except Exception:
-                    remote_ingest = None
-                    build_remote = None
-
-            if remote_ingest:
-                try:
-                    ingest_resp = remote_ingest([{'id': o.id, 'ontology': ont}])
-                    remote_result['ingest'] = ingest_resp
-                except Exception as e:
-                    remote_result['ingest_error'] = str(e)
-
-            if build_remote:
-                def _build():
-                    try:
-                        b = build_remote()
-                        if settings.DEBUG:
-                            print('remote build response:', b)
-                        remote_result['build'] = b
-                    except Exception as e:
-                        remote_result['build_error'] = str(e)
-                t = threading.Thread(target=_build, daemon=True)
-                t.start()
-        except Exception as e:
-            # swallow any errors communicating with remote index helper
-            remote_result['remote_error'] = str(e)
-
-        serializer = OntologySerializer(o)
-        resp = serializer.data
-        resp['_remote'] = remote_result
-        return Response(resp, status=status.HTTP_201_CREATED)
-    except Exception as exc:
-        return Response({'detail': 'Failed to save ontology', 'error': str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        job, hit = uploads.submit(f)
+    except uploads.Busy:
+        return Response({'detail': 'Too many uploads in progress, retry later'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '30', 'X-Dedup': 'miss'})
+    status_url = reverse('upload_status', kwargs={'job_id': job.pk})
+    code = status.HTTP_200_OK if job.status == UploadJob.SUCCEEDED else status.HTTP_202_ACCEPTED
+    return Response(_upload_job_body(job, status_url), status=code,
+                    headers={'Location': status_url, 'X-Dedup': 'hit' if hit else 'miss'})
+
+
+def _upload_job_body(job, status_url):
+    body = {
+        'id': str(job.pk),
+        'status': job.status,
+        'filename': job.filename,
+        'status_url': status_url,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == UploadJob.FAILED:
+        body['detail'] = job.error
+    if job.status == UploadJob.SUCCEEDED and job.ontology is not None:
+        body['ontology'] = OntologySerializer(job.ontology).data
+        body['ontology']['_remote'] = job.remote or {}
+    return body
+
+
+@api_view(['GET'])
+def upload_status(request, job_id):
+    """Status of an upload queued by `upload_document`."""
+    job = UploadJob.objects.select_related('ontology').filter(pk=job_id).first()
+    if job is None:
+        return Response({'detail': 'Unknown upload job'}, status=status.HTTP_404_NOT_FOUND)
+    job = uploads.expire_stale(job)
+    return Response(_upload_job_body(job, request.path))
 
 
 @api_view(['POST'])
@@ -448,7 +514,8 @@ def remote_query(request):
     lightweight semantic score across stored Ontology.json payloads and
     returns entities/relationships suitable for the frontend visualization.
 
-    Accepts JSON {query: str, k: int}
+    Accepts JSON {query: str, k: int, scorer: str (optional),
+    nprobe/ef_search: int (optional ANN search effort)}
     """
     payload = request.data or {}
     logger.info('remote_query called: payload keys=%s method=%s path=%s', list(payload.keys()), request.method, request.get_full_path())
@@ -465,13 +532,24 @@ def remote_query(request):
         print('[remote_query] missing query in payload')
         return Response({'detail': 'Missing query'}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        scorer = scoring.resolve_scorer_name(payload.get('scorer') or request.GET.get('scorer'))
+        nprobe, ef_search = _search_effort(payload)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    cache_key = query_cache.make_key('query', q, k=k, scorer=scorer, nprobe=nprobe, ef_search=ef_search)
+    body = query_cache.get(cache_key)
+    if body is not None:
+        return Response(body, headers={'X-Query-Cache': 'hit'})
+
     # Prefer local fast scorer; fallback to query_top_k if available and local
     try:
-        results = query_top_k_local(q, k=k)
+        results = query_top_k_local(q, k=k, scorer=scorer)
         # if no results and a local index function exists, try it
         if not results:
             try:
-                alt = query_top_k(q, k=k)
+                alt = query_top_k(q, k=k, nprobe=nprobe, ef_search=ef_search)
                 if alt:
                     results = alt
             except Exception:
@@ -485,69 +563,66 @@ def remote_query(request):
     seen_entities = set()
     seen_relationships = set()
 
+    # read the normalized rows of the hit ontologies rather than their JSON
+    entity_rows, relation_rows = normalized_rows([result.get('id') for result in results])
     for result in results:
-        ontology = result.get('ontology', {})
-
-        nodes = ontology.get('nodes', []) or ontology.get('entities', [])
-        for node in nodes:
-            if isinstance(node, str):
-                node_id = node
-                node_data = {'id': node, 'label': node, 'type': 'Entity'}
-            else:
-                node_id = node.get('id') or node.get('label') or node.get('name')
-                node_data = {
-                    'id': node_id,
-                    'label': node.get('label') or node.get('name') or node_id,
-                    'type': node.get('type') or node.get('class') or 'Entity',
-                    'properties': node
-                }
-            if node_id and node_id not in seen_entities:
-                seen_entities.add(node_id)
-                entities.append(node_data)
-
-        rels = ontology.get('relations', []) or ontology.get('edges', [])
-        for rel in rels:
-            if isinstance(rel, dict):
-                source = rel.get('source') or rel.get('from')
-                target = rel.get('target') or rel.get('to')
-                rel_type = rel.get('relation') or rel.get('label') or rel.get('type') or 'related_to'
-                if source and target:
-                    rel_key = (source, target, rel_type)
-                    if rel_key not in seen_relationships:
-                        seen_relationships.add(rel_key)
-                        relationships.append({
-                            'source': source,
-                            'target': target,
-                            'type': rel_type,
-                            'properties': rel
-                        })
-
-    # Build graph and find connected entities (small BFS)
-    G = nx.DiGraph()
-    for e in entities:
-        G.add_node(e['id'], **e)
-    for r in relationships:
-        G.add_edge(r['source'], r['target'], **r)
-
-    connected_entities = set()
-    for e in entities:
-        queue = deque([e['id']])
-        while queue:
-            node = queue.popleft()
-            if node not in connected_entities:
-                connected_entities.add(node)
-                if node in G:
-                    queue.extend(list(G.neighbors(node)))
-
-    final_entities = [e for e in entities if e['id'] in connected_entities]
-    final_relationships = [r for r in relationships if r['source'] in connected_entities and r['target'] in connected_entities]
+        for e in entity_rows.get(result.get('id'), []):
+            node_id = e.data['id']
+            if node_id in seen_entities:
+                continue
+            seen_entities.add(node_id)
+            node_data = dict(e.data)
+            if e.properties is not None:
+                node_data['properties'] = e.properties
+            entities.append(node_data)
+
+        for r in relation_rows.get(result.get('id'), []):
+            source, target, rel_type = r.data['source'], r.data['target'], r.data['relation']
+            rel_key = (source, target, rel_type)
+            if rel_key in seen_relationships:
+                continue
+            seen_relationships.add(rel_key)
+            relationships.append({
+                'source': source,
+                'target': target,
+                'type': rel_type,
+                'properties': r.properties
+            })
+
+    # Expand to connected entities by weakly connected component: one
+    # union-find lookup per entity and relationship instead of a BFS per entity.
+    # With the entity-level vector index the expansion starts from the nearest
+    # entities only, not from every entity of the hit documents.
+    index = components.get()
+    seeds = [nid for nodes in entity_index.seeds_by_ontology(entity_index.query(q, nprobe=nprobe, ef_search=ef_search)).values()
+             for nid in nodes if nid in seen_entities]
+    hit_components = components.components_of(index, seeds or (e['id'] for e in entities))
+    final_entities = entities
+    if seeds:
+        final_entities = [e for e in entities if index.component(e['id']) in hit_components]
+    final_relationships = [r for r in relationships
+                           if index.component(r['source']) in hit_components
+                           and index.component(r['target']) in hit_components]
 
     logger.info('remote_query: returning %s entities and %s relationships', len(final_entities), len(final_relationships))
     print(f"[remote_query] returning {len(final_entities)} entities and {len(final_relationships)} relationships")
-    return Response({
+    body = {
         'query': q,
         'entities': final_entities,
         'relationships': final_relationships,
         'total_matches': len(final_entities),
         'raw_hits': results,
-    })
+    }
+    query_cache.put(cache_key, body)
+    return Response(body, headers={'X-Query-Cache': 'miss'})
+
+
+@api_view(['GET', 'DELETE'])
+def query_cache_stats(request):
+    """Hit/miss counters and size of the query result cache; DELETE (staff only) clears it."""
+    if request.method == 'DELETE':
+        # clearing forces every query to be recomputed; not for anonymous clients
+        if not request.user.is_staff:
+            return Response({'detail': 'Only staff users can clear the query cache'}, status=status.HTTP_403_FORBIDDEN)
+        query_cache.clear()
+    return Response(query_cache.stats())
@@ -86,8 +86,14 @@
         appendChat('user', `Uploading ${f.name}...`)
         try{
     const res = await fetch('/api/upload/',{method:'POST',body:fd})
-          const json = await res.json()
-          appendChat('bot', json?.message || 'Uploaded')
+          let job = await res.json()
+          if(res.status !== 202 && res.status !== 200) return appendChat('bot', job?.detail || 'Upload failed')
+          // the generator runs in the background; poll the job until it settles
+          while(job.status === 'queued' || job.status === 'running'){
+            await new Promise(r => setTimeout(r, 1500))
+            job = await (await fetch(job.status_url)).json()
+          }
+          appendChat('bot', job.status === 'succeeded' ? `Indexed ${f.name}` : (job.detail || 'Upload failed'))
         }catch(err){
           appendChat('bot', 'Upload failed (placeholder)')
         }
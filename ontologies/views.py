@@ -470,18 +470,22 @@ def query_chat(request):
     for rel in relationships:
         G.add_edge(rel['source'], rel['target'], **rel)
     
-    # Find connected components starting from matched entities
+    # Find connected components starting from matched entities: one BFS
+    # seeded with every entity, sharing the visited set, so each node is
+    # expanded and enqueued once
     connected_entities = set()
+    queue = deque()
     for entity in entities:
-        # Do BFS traversal
-        queue = deque([entity['id']])
-        while queue:
-            node = queue.popleft()
-            if node not in connected_entities:
-                connected_entities.add(node)
-                # Add neighbors
-                if node in G:
-                    queue.extend(list(G.neighbors(node)))
+        if entity['id'] not in connected_entities:
+            connected_entities.add(entity['id'])
+            queue.append(entity['id'])
+    while queue:
+        node = queue.popleft()
+        if node in G:
+            for nbr in G.neighbors(node):
+                if nbr not in connected_entities:
+                    connected_entities.add(nbr)
+                    queue.append(nbr)
     
     # Filter to only include connected entities and their relationships
     final_entities = [e for e in entities if e['id'] in connected_entities]